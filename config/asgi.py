@@ -3,6 +3,11 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+SSE-поток live-статистики (/api/live/stream/) держит соединение открытым,
+поэтому его нужно обслуживать через ASGI, например:
+    gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker
+Под WSGI эндпоинт отдаёт один снимок и клиент переподключается (retry).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -89,6 +89,8 @@ if not DEBUG:
     MIDDLEWARE.append("whitenoise.middleware.WhiteNoiseMiddleware")
 
 MIDDLEWARE += [
+    # Замеры SQL/шаблонов/времени по имени URL — только при POLLS_METRICS_ENABLED
+    "polls.middleware.RequestMetricsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -131,14 +133,53 @@ WSGI_APPLICATION = "config.wsgi.application"
 # Database
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Профиль SQLite для продакшена (DJANGO_SQLITE_TUNED=1), против «database is locked» на пиках:
+# - WAL: читатели не ждут писателя; synchronous=NORMAL — fsync на чекпоинте, а не на каждом COMMIT;
+# - timeout — сколько ждать чужую блокировку записи (busy timeout), секунды;
+# - BEGIN IMMEDIATE: транзакция сразу берёт блокировку записи и ждёт её по timeout,
+#   а не падает при попытке перейти от чтения к записи посреди транзакции;
+# - mmap_size/cache_size/temp_store — чтение через mmap, кэш страниц в КиБ, временные таблицы в памяти.
+SQLITE_READ_PRAGMAS = [
+    f"PRAGMA mmap_size={int(os.getenv('DJANGO_SQLITE_MMAP_SIZE', str(128 * 1024 * 1024)))}",
+    f"PRAGMA cache_size=-{int(os.getenv('DJANGO_SQLITE_CACHE_SIZE_KB', '65536'))}",
+    "PRAGMA temp_store=MEMORY",
+]
+SQLITE_TUNED_OPTIONS = {
+    "timeout": float(os.getenv("DJANGO_SQLITE_BUSY_TIMEOUT", "20")),
+    "transaction_mode": "IMMEDIATE",
+    "init_command": "; ".join(["PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL", *SQLITE_READ_PRAGMAS]),
+}
+# Реплика только читает: журнал и BEGIN IMMEDIATE — дело писателя, оставляем настройки чтения
+SQLITE_REPLICA_OPTIONS = {
+    "timeout": SQLITE_TUNED_OPTIONS["timeout"],
+    "init_command": "; ".join(SQLITE_READ_PRAGMAS),
+}
+
+# Пул соединений Postgres (DJANGO_DB_POOL=1, Django 5.1+, нужен psycopg[pool]): один пул на процесс
+# вместо соединения на поток; с пулом постоянные соединения (CONN_MAX_AGE) не используются.
+DJANGO_DB_POOL = env_bool("DJANGO_DB_POOL", default=False)
+
+
+def postgres_database(url: str) -> dict:
+    database = dj_database_url.parse(
+        url,
+        conn_max_age=0 if DJANGO_DB_POOL else int(os.getenv("DJANGO_DB_CONN_MAX_AGE", "60")),
+        ssl_require=env_bool("DJANGO_DB_SSL_REQUIRE", default=True),
+    )
+    if DJANGO_DB_POOL and database["ENGINE"] == "django.db.backends.postgresql":
+        database.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": int(os.getenv("DJANGO_DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.getenv("DJANGO_DB_POOL_MAX_SIZE", "10")),
+            "timeout": float(os.getenv("DJANGO_DB_POOL_TIMEOUT", "10")),
+        }
+    return database
+
+
 if DATABASE_URL and dj_database_url:
-    DATABASES = {
-        "default": dj_database_url.parse(
-            DATABASE_URL,
-            conn_max_age=int(os.getenv("DJANGO_DB_CONN_MAX_AGE", "60")),
-            ssl_require=env_bool("DJANGO_DB_SSL_REQUIRE", default=True),
-        )
-    }
+    DATABASES = {"default": postgres_database(DATABASE_URL)}
+    # Реплика только для чтения — статистика, ответы, выгрузка, live (polls/routers.py)
+    if os.getenv("DATABASE_REPLICA_URL"):
+        DATABASES["replica"] = postgres_database(os.environ["DATABASE_REPLICA_URL"])
 else:
     DATABASES = {
         "default": {
@@ -146,6 +187,52 @@ else:
             "NAME": BASE_DIR / "db.sqlite3",
         }
     }
+    if env_bool("DJANGO_SQLITE_TUNED", default=False):
+        DATABASES["default"]["OPTIONS"] = SQLITE_TUNED_OPTIONS
+    # Копия базы для чтения (LiteFS/Litestream и т. п.) — как DATABASE_REPLICA_URL для Postgres
+    if os.getenv("DJANGO_SQLITE_REPLICA_PATH"):
+        DATABASES["replica"] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ["DJANGO_SQLITE_REPLICA_PATH"],
+        }
+        if env_bool("DJANGO_SQLITE_TUNED", default=False):
+            DATABASES["replica"]["OPTIONS"] = SQLITE_REPLICA_OPTIONS
+
+POLLS_READ_DATABASE = "replica" if "replica" in DATABASES else None
+DATABASE_ROUTERS = ["polls.routers.ReadReplicaRouter"]
+
+# Cache
+# REDIS_URL — общий кэш для всех воркеров (рекомендуется в prod);
+# DJANGO_CACHE_DIR — файловый кэш (несколько воркеров на одной машине без Redis);
+# иначе — локальная память процесса.
+REDIS_URL = os.getenv("REDIS_URL")
+DJANGO_CACHE_DIR = os.getenv("DJANGO_CACHE_DIR")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "polls",
+        }
+    }
+elif DJANGO_CACHE_DIR:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": DJANGO_CACHE_DIR,
+            "KEY_PREFIX": "polls",
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "polls",
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    }
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -188,6 +275,11 @@ STORAGES = {
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Сессии нужны только вошедшим пользователям (анонимные участники опросов — подписанная cookie,
+# см. polls/services/participants.py). Можно разгрузить БД:
+# django.contrib.sessions.backends.cached_db или django.contrib.sessions.backends.signed_cookies
+SESSION_ENGINE = os.getenv("DJANGO_SESSION_ENGINE", "django.contrib.sessions.backends.db")
+
 # HTTPS и reverse-proxy (только в prod)
 if not DEBUG:
     USE_X_FORWARDED_HOST = env_bool("DJANGO_USE_X_FORWARDED_HOST", default=True)
@@ -204,4 +296,36 @@ if not DEBUG:
 
 # Auth redirects
 LOGIN_REDIRECT_URL = "/dashboard/project/"
-LOGOUT_REDIRECT_URL = "/"
\ No newline at end of file
+LOGOUT_REDIRECT_URL = "/"
+
+# Таблица ответов: размер страницы (отправок) при потоковой отдаче
+POLLS_RESPONSES_PAGE_SIZE = int(os.getenv("POLLS_RESPONSES_PAGE_SIZE", "200"))
+
+# Live-статистика (SSE): как часто канал опроса сверяет счётчик отправок
+# и как часто слать heartbeat клиентам, секунды
+POLLS_LIVE_POLL_INTERVAL = float(os.getenv("POLLS_LIVE_POLL_INTERVAL", "1.0"))
+POLLS_LIVE_HEARTBEAT = float(os.getenv("POLLS_LIVE_HEARTBEAT", "15"))
+# Сколько секунд снимок live_vote_count считается свежим (общий для всех клиентов)
+POLLS_LIVE_SNAPSHOT_TTL = float(os.getenv("POLLS_LIVE_SNAPSHOT_TTL", "2"))
+# Кэш отрендеренной разметки вопросов публичной страницы, секунды (0 — не кэшировать)
+POLLS_PUBLIC_FRAGMENT_CACHE_TIMEOUT = int(os.getenv("POLLS_PUBLIC_FRAGMENT_CACHE_TIMEOUT", "3600"))
+# Кэш готовых QR-кодов: лимит памяти процесса (байты) и необязательный общий каталог на диске
+POLLS_QR_CACHE_BYTES = int(os.getenv("POLLS_QR_CACHE_BYTES", str(8 * 1024 * 1024)))
+POLLS_QR_CACHE_DIR = os.getenv("POLLS_QR_CACHE_DIR") or None
+# Подписанная cookie анонимного участника: ID и старт таймеров (без записей в БД)
+POLLS_PARTICIPANT_COOKIE = os.getenv("POLLS_PARTICIPANT_COOKIE", "polls_participant")
+POLLS_PARTICIPANT_COOKIE_AGE = int(os.getenv("POLLS_PARTICIPANT_COOKIE_AGE", str(365 * 24 * 60 * 60)))
+# Метрики запросов (polls/middleware.py): /dashboard/metrics для Prometheus, Server-Timing,
+# лог запросов с числом SQL не меньше порога (0 — не логировать)
+POLLS_METRICS_ENABLED = env_bool("POLLS_METRICS_ENABLED", False)
+POLLS_METRICS_SERVER_TIMING = env_bool("POLLS_METRICS_SERVER_TIMING", DEBUG)
+POLLS_METRICS_QUERY_THRESHOLD = int(os.getenv("POLLS_METRICS_QUERY_THRESHOLD", "50"))
+POLLS_METRICS_TOKEN = os.getenv("POLLS_METRICS_TOKEN", "")
+# Очередь приёма отправок для пиков: POST только пишет строку в журнал,
+# запись делает `manage.py drain_submissions --loop` (polls/services/ingest.py)
+POLLS_SUBMISSION_QUEUE = env_bool("POLLS_SUBMISSION_QUEUE", False)
+
+# Групповая фиксация: параллельные POST одного процесса пишутся одной транзакцией.
+# Окно ожидания пачки в мс (0 — выключено) и её предельный размер (polls/services/batcher.py)
+POLLS_SUBMISSION_BATCH_WINDOW_MS = float(os.getenv("POLLS_SUBMISSION_BATCH_WINDOW_MS", "0"))
+POLLS_SUBMISSION_BATCH_SIZE = int(os.getenv("POLLS_SUBMISSION_BATCH_SIZE", "50"))
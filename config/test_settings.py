@@ -0,0 +1,28 @@
+"""
+Настройки для тестов: manage.py test берёт их по умолчанию,
+другим раннерам — DJANGO_SETTINGS_MODULE=config.test_settings.
+"""
+
+import os
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, STORAGES
+
+# Без collectstatic: манифест хэшированных имён в тестах не нужен
+STORAGES = {
+    **STORAGES,
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+# Тестовая SQLite — файл, а не память: in-memory БД блокирует таблицу целиком,
+# и параллельные запросы (SingleEntryConstraintTests) не пишут одновременно
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    DATABASES["default"]["TEST"] = {
+        "NAME": os.path.join(tempfile.gettempdir(), f"polls-test-{os.getpid()}.sqlite3"),
+    }
+
+# Без настоящей реплики — алиас-зеркало основной тестовой БД: маршрутизация чтений
+# проверяется в обычном прогоне (ReadReplicaRoutingTests; включают её сами тесты)
+if "replica" not in DATABASES:
+    DATABASES["replica"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
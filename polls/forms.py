@@ -1,5 +1,6 @@
 from django import forms
 from .models import Poll, Question, Choice
+from .services.bank import BankError, check_kind_change
 
 
 class PollForm(forms.ModelForm):
@@ -79,6 +80,23 @@ class QuestionForm(forms.ModelForm):
             "kind": "Выберите тип ответа: текст, один выбор или несколько.",
         }
 
+    def clean(self):
+        """
+        Тип и признак тестового вопроса нельзя менять, если на вопрос (или на копии
+        записи банка) уже отвечали — см. services.bank.check_kind_change.
+        """
+        cleaned_data = super().clean()
+        kind = cleaned_data.get("kind")
+        if self.instance.pk and kind:
+            try:
+                check_kind_change(
+                    self.instance, kind=kind,
+                    is_test_question=cleaned_data.get("is_test_question", False),
+                )
+            except BankError as exc:
+                raise forms.ValidationError(str(exc))
+        return cleaned_data
+
 
 
 
@@ -150,4 +168,21 @@ class ChoiceForm(forms.ModelForm):
         choice.question = self.question
         if commit:
             choice.save()
-        return choice
\ No newline at end of file
+        return choice
+
+class PollImportForm(forms.Form):
+    """Загрузка опроса из JSON-файла (формат выгрузки services/transfer.py)."""
+
+    MAX_SIZE = 2 * 1024 * 1024
+
+    file = forms.FileField(
+        label="JSON-файл опроса",
+        help_text="Файл, выгруженный кнопкой «Экспорт JSON» на странице опроса.",
+        widget=forms.ClearableFileInput(attrs={"accept": "application/json,.json"}),
+    )
+
+    def clean_file(self):
+        uploaded = self.cleaned_data["file"]
+        if uploaded.size > self.MAX_SIZE:
+            raise forms.ValidationError("Файл больше 2 МБ")
+        return uploaded
@@ -0,0 +1,50 @@
+"""
+Замер скорости потоковой выгрузки отправок.
+
+    python manage.py benchmark_export --poll 5 --format csv
+    python manage.py benchmark_export --poll 5 --format xlsx --chunk-size 5000
+
+Генератор выгрузки прогоняется целиком (байты никуда не пишутся),
+печатаются строки/сек, объём и пик памяти Python (tracemalloc).
+"""
+
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.models import Poll
+from polls.services.export import EXPORT_CHUNK_SIZE, FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = "Замеряет скорость потоковой выгрузки отправок опроса (строк в секунду)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll", type=int, required=True, help="ID опроса")
+        parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, poll, format, chunk_size, **options):
+        try:
+            poll_obj = Poll.objects.get(id=poll)
+        except Poll.DoesNotExist:
+            raise CommandError(f"Опрос {poll} не найден")
+        questions = list(poll_obj.questions.prefetch_related("choices").order_by("order", "id"))
+
+        rows = poll_obj.submissions.count()
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        size = 0
+        for chunk in stream_export(poll_obj, questions, format, chunk_size=chunk_size):
+            size += len(chunk)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        rate = rows / elapsed if elapsed else 0.0
+        self.stdout.write(
+            f"{format}: {rows} строк за {elapsed:.2f} с — {rate:,.0f} строк/с, "
+            f"{size / 1024 / 1024:.1f} МБ, пик памяти {peak / 1024 / 1024:.1f} МБ"
+        )
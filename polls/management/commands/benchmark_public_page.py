@@ -0,0 +1,79 @@
+"""
+Замер рендеринга публичной страницы опроса с кэшем разметки вопросов и без него.
+
+    python manage.py benchmark_public_page --questions 40 --choices 4 --requests 300
+
+Создаёт временный опрос (в транзакции, которая в конце откатывается),
+прогоняет GET /p/<code>/ тестовым клиентом в двух режимах —
+POLLS_PUBLIC_FRAGMENT_CACHE_TIMEOUT=0 (без кэша) и с кэшем — и печатает запросы/сек.
+Каждый режим идёт на своём пустом locmem-кэше: настроенный кэш проекта
+(сессии, кэши структуры и снимков) не трогается.
+"""
+
+import time
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+
+from polls.models import Choice, Poll, Question
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Сравнивает запросы/сек публичной страницы опроса без кэша разметки и с ним."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--questions", type=int, default=40)
+        parser.add_argument("--choices", type=int, default=4)
+        parser.add_argument("--requests", type=int, default=300)
+
+    def handle(self, *args, questions, choices, requests, **options):
+        try:
+            with transaction.atomic():
+                poll = self._make_poll(questions, choices)
+                results = {}
+                for label, timeout in (("без кэша", 0), ("с кэшем", 3600)):
+                    results[label] = self._run(poll.access_code, timeout, requests)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        base = results["без кэша"]
+        for label, rps in results.items():
+            self.stdout.write(f"{label:>10}: {rps:8.1f} запросов/с  (×{rps / base:.2f})")
+
+    def _make_poll(self, n_questions: int, n_choices: int) -> Poll:
+        poll = Poll.objects.create(title="Benchmark")
+        kinds = [Question.Kind.SINGLE, Question.Kind.MULTI, Question.Kind.TEXT]
+        for i in range(n_questions):
+            q = Question.objects.create(poll=poll, text=f"Вопрос {i + 1}", kind=kinds[i % 3], order=i + 1)
+            if q.kind != Question.Kind.TEXT:
+                Choice.objects.bulk_create(
+                    Choice(question=q, text=f"Вариант {j + 1}") for j in range(n_choices)
+                )
+        return poll
+
+    def _run(self, code: str, fragment_timeout: int, n_requests: int) -> float:
+        url = f"/p/{code}/"
+        with override_settings(
+            CACHES={"default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": f"benchmark-public-page-{fragment_timeout}",
+            }},
+            ALLOWED_HOSTS=["*"],
+            POLLS_PUBLIC_FRAGMENT_CACHE_TIMEOUT=fragment_timeout,
+        ):
+            caches["default"].clear()  # только изолированный кэш прогона
+            client = Client()
+            client.get(url)  # прогрев: сессия, кэш структуры, шаблоны
+            started = time.perf_counter()
+            for _ in range(n_requests):
+                response = client.get(url)
+                assert response.status_code == 200, response.status_code
+            elapsed = time.perf_counter() - started
+        return n_requests / elapsed
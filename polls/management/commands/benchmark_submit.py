@@ -0,0 +1,274 @@
+"""
+Нагрузочный прогон публичного сценария: участники открывают и отправляют опрос,
+организатор параллельно смотрит live-счётчик и статистику.
+
+    python manage.py benchmark_submit --questions 20 --choices 4 --participants 200 --concurrency 8
+    python manage.py benchmark_submit --output bench/$(git rev-parse --short HEAD).json
+
+Работает с той БД, что настроена (SQLite по умолчанию, Postgres через DATABASE_URL).
+Создаёт временного организатора и опрос и удаляет их в конце (--keep — оставить).
+Запросы идут через тестовый клиент Django в потоках — замеряется приложение
+и БД без сетевого стека. На каждый запрос пишутся время и число SQL-запросов;
+итог — p50/p95/p99, запросы/сек и SQL на запрос по каждой точке, плюс JSON
+для сравнения между коммитами.
+"""
+
+import json
+import platform
+import queue
+import random
+import secrets
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Choice, Poll, Question
+from polls.services.ingest import drain
+
+KINDS = [Question.Kind.SINGLE, Question.Kind.MULTI, Question.Kind.TEXT]
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Перцентиль по ближайшему рангу (значения уже отсортированы)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    """Потокобезопасный сборщик замеров: метка → [(секунды, SQL-запросов)]."""
+
+    def __init__(self):
+        self.samples: dict[str, list[tuple[float, int]]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def call(self, label: str, request, expected: tuple[int, ...] = (200,)):
+        response = None
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            try:
+                response = request()
+            except DatabaseError:
+                # «database is locked» и т. п. — считаем ошибкой, поток продолжает работу
+                pass
+            elapsed = time.perf_counter() - started
+        with self._lock:
+            self.samples[label].append((elapsed, len(ctx.captured_queries)))
+            if response is None or response.status_code not in expected:
+                self.errors[label] += 1
+        return response
+
+    def summary(self, wall_seconds: float) -> dict:
+        result = {}
+        for label, samples in sorted(self.samples.items()):
+            latencies = sorted(s for s, _ in samples)
+            queries = [q for _, q in samples]
+            result[label] = {
+                "requests": len(samples),
+                "errors": self.errors.get(label, 0),
+                "rps": round(len(samples) / wall_seconds, 2) if wall_seconds else 0.0,
+                "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+                "max_ms": round(latencies[-1] * 1000, 2),
+                "queries_per_request": round(sum(queries) / len(queries), 2),
+                "max_queries": max(queries),
+            }
+        return result
+
+
+class Command(BaseCommand):
+    help = "Нагрузочный прогон: GET+POST участников опроса, live_vote_count и project_stats; p50/p95/p99, JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--questions", type=int, default=20)
+        parser.add_argument("--choices", type=int, default=4)
+        parser.add_argument("--participants", type=int, default=100)
+        parser.add_argument("--concurrency", type=int, default=8, help="Число потоков (1 — без потоков)")
+        parser.add_argument(
+            "--read-every", type=int, default=5,
+            help="После каждых N участников — запрос live_vote_count и project_stats (0 — не читать)",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--output", help="Куда записать JSON с результатами")
+        parser.add_argument("--keep", action="store_true", help="Не удалять созданный опрос")
+        parser.add_argument(
+            "--queue", action="store_true",
+            help="Режим очереди приёма (POLLS_SUBMISSION_QUEUE): после прогона очередь разбирается и замеряется отдельно",
+        )
+        parser.add_argument(
+            "--batch-window", type=float, default=None, metavar="MS",
+            help="Групповая фиксация отправок (POLLS_SUBMISSION_BATCH_WINDOW_MS); по умолчанию — из настроек",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        owner = get_user_model().objects.create_user(f"bench-{secrets.token_hex(4)}")
+        poll = self._make_poll(owner, options["questions"], options["choices"])
+        plan = self._make_plan(poll, rng, options["participants"], options["read_every"])
+
+        recorder = Recorder()
+        drain_seconds = None
+        try:
+            batch_window = options["batch_window"]
+            if batch_window is None:
+                batch_window = getattr(settings, "POLLS_SUBMISSION_BATCH_WINDOW_MS", 0)
+            with override_settings(
+                ALLOWED_HOSTS=["*"],
+                POLLS_SUBMISSION_QUEUE=options["queue"],
+                POLLS_SUBMISSION_BATCH_WINDOW_MS=batch_window,
+            ):
+                started = time.perf_counter()
+                self._run(plan, poll, owner, recorder, options["concurrency"])
+                wall = time.perf_counter() - started
+            if options["queue"]:
+                started = time.perf_counter()
+                drain()
+                drain_seconds = round(time.perf_counter() - started, 3)
+        finally:
+            if not options["keep"]:
+                poll.delete()
+                owner.delete()
+
+        report = {
+            "meta": {
+                "timestamp": timezone.now().isoformat(),
+                "commit": self._git_commit(),
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "questions": options["questions"],
+                "choices": options["choices"],
+                "participants": options["participants"],
+                "concurrency": options["concurrency"],
+                "read_every": options["read_every"],
+                "queue": options["queue"],
+                "batch_window_ms": batch_window,
+                "wall_seconds": round(wall, 3),
+                "drain_seconds": drain_seconds,
+            },
+            "endpoints": recorder.summary(wall),
+        }
+        self._print(report)
+        if options["output"]:
+            path = Path(options["output"])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+            self.stdout.write(f"JSON: {path}")
+
+    # ───── подготовка ─────
+
+    def _make_poll(self, owner, n_questions: int, n_choices: int) -> Poll:
+        poll = Poll.objects.create(title="Benchmark", owner=owner)
+        questions = Question.objects.bulk_create(
+            Question(poll=poll, text=f"Вопрос {i + 1}", kind=KINDS[i % len(KINDS)], order=i + 1)
+            for i in range(n_questions)
+        )
+        Choice.objects.bulk_create(
+            Choice(question=q, text=f"Вариант {j + 1}", is_correct=j == 0)
+            for q in questions if q.kind != Question.Kind.TEXT
+            for j in range(n_choices)
+        )
+        return poll
+
+    def _make_plan(self, poll: Poll, rng: random.Random, participants: int, read_every: int) -> list:
+        """Список задач: ("submit", POST-данные) и ("read", None) — порядок фиксирован seed'ом."""
+        questions = list(poll.questions.prefetch_related("choices"))
+        plan = []
+        for i in range(participants):
+            data = {}
+            for q in questions:
+                ids = [str(c.id) for c in q.choices.all()]
+                if q.kind == Question.Kind.TEXT:
+                    data[f"q_{q.id}"] = f"ответ {i}"
+                elif q.kind == Question.Kind.MULTI:
+                    data[f"q_{q.id}"] = rng.sample(ids, rng.randint(1, len(ids)))
+                else:
+                    data[f"q_{q.id}"] = rng.choice(ids)
+            plan.append(("submit", data))
+            if read_every and (i + 1) % read_every == 0:
+                plan.append(("read", None))
+        return plan
+
+    # ───── прогон ─────
+
+    def _run(self, plan: list, poll: Poll, owner, recorder: Recorder, concurrency: int) -> None:
+        public_url = reverse("polls:poll_public", kwargs={"access_code": poll.access_code})
+        live_url = reverse("polls:live_vote_count")
+        stats_url = reverse("polls:project_stats", kwargs={"poll_id": poll.id})
+
+        def worker(tasks: queue.Queue) -> None:
+            organizer = Client()
+            organizer.force_login(owner)
+            try:
+                while True:
+                    try:
+                        kind, data = tasks.get_nowait()
+                    except queue.Empty:
+                        return
+                    if kind == "submit":
+                        participant = Client()  # новый участник — новая cookie
+                        recorder.call("GET /p/<code>/", lambda: participant.get(public_url))
+                        recorder.call(
+                            "POST /p/<code>/", lambda: participant.post(public_url, data=data), expected=(302,)
+                        )
+                    else:
+                        recorder.call("live_vote_count", lambda: organizer.get(live_url, {"code": poll.access_code}))
+                        recorder.call("project_stats", lambda: organizer.get(stats_url))
+            finally:
+                if threading.current_thread() is not threading.main_thread():
+                    connections.close_all()
+
+        tasks: queue.Queue = queue.Queue()
+        for task in plan:
+            tasks.put(task)
+
+        if concurrency <= 1:
+            worker(tasks)
+            return
+        threads = [threading.Thread(target=worker, args=(tasks,)) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    # ───── вывод ─────
+
+    def _git_commit(self) -> str | None:
+        try:
+            out = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+            )
+        except (OSError, subprocess.SubprocessError):
+            return None
+        return out.stdout.strip() or None
+
+    def _print(self, report: dict) -> None:
+        meta = report["meta"]
+        self.stdout.write(
+            f"{meta['database']}, {meta['questions']}×{meta['choices']}, "
+            f"{meta['participants']} участников, {meta['concurrency']} потоков, {meta['wall_seconds']} с"
+            + (f", очередь разобрана за {meta['drain_seconds']} с" if meta["queue"] else "")
+            + (f", групповая фиксация {meta['batch_window_ms']:g} мс" if meta["batch_window_ms"] else "")
+        )
+        self.stdout.write(
+            f"{'точка':<18}{'запросов':>9}{'ошибок':>8}{'rps':>9}{'p50 мс':>9}{'p95 мс':>9}{'p99 мс':>9}{'SQL/запр':>10}"
+        )
+        for label, row in report["endpoints"].items():
+            self.stdout.write(
+                f"{label:<18}{row['requests']:>9}{row['errors']:>8}{row['rps']:>9}"
+                f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}{row['queries_per_request']:>10}"
+            )
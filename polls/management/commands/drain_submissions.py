@@ -0,0 +1,41 @@
+"""
+Перенос очереди приёма (PendingSubmission) в отправки.
+
+    python manage.py drain_submissions                # один проход до пустой очереди
+    python manage.py drain_submissions --loop         # фоновый воркер
+    python manage.py drain_submissions --loop --batch-size 500 --interval 0.2
+
+Нужен, только если включён POLLS_SUBMISSION_QUEUE (см. polls/services/ingest.py).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.services.ingest import DRAIN_BATCH_SIZE, drain, drain_once
+
+
+class Command(BaseCommand):
+    help = "Переносит принятые отправки из очереди в Submission/Answer пачками."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DRAIN_BATCH_SIZE)
+        parser.add_argument("--loop", action="store_true", help="Работать постоянно")
+        parser.add_argument("--interval", type=float, default=0.5, help="Пауза при пустой очереди, секунды")
+
+    def handle(self, *args, batch_size, loop, interval, **options):
+        if not loop:
+            taken, written = drain(batch_size)
+            self.stdout.write(f"Взято из очереди: {taken}, записано: {written}")
+            return
+
+        self.stdout.write("Воркер очереди запущен (Ctrl+C — остановить)")
+        try:
+            while True:
+                taken, written = drain_once(batch_size)
+                if taken:
+                    self.stdout.write(f"Пачка: взято {taken}, записано {written}")
+                else:
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write("Остановлен")
@@ -0,0 +1,59 @@
+"""
+Пересчёт и проверка денормализованных счётчиков голосов (VoteCounter).
+
+    python manage.py rebuild_vote_counters            # пересчитать все опросы
+    python manage.py rebuild_vote_counters --poll 5   # только опрос 5
+    python manage.py rebuild_vote_counters --check    # только сверить с сырыми данными
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from polls.models import Poll
+from polls.services.counters import diff_counts, rebuild_counts
+
+
+class Command(BaseCommand):
+    help = "Пересобирает счётчики голосов по сырым ответам и сверяет их с исходными данными."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--poll",
+            type=int,
+            action="append",
+            dest="poll_ids",
+            help="ID опроса (можно указать несколько раз). По умолчанию — все опросы.",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Ничего не менять, только сообщить о расхождениях (код выхода 1, если они есть).",
+        )
+
+    def handle(self, *args, poll_ids=None, check=False, **options):
+        polls = Poll.objects.order_by("id")
+        if poll_ids:
+            polls = polls.filter(id__in=poll_ids)
+        ids = list(polls.values_list("id", flat=True))
+
+        mismatched = 0
+        for poll_id in ids:
+            if not check:
+                with transaction.atomic():
+                    rows = rebuild_counts(poll_id)
+                self.stdout.write(f"Опрос {poll_id}: пересчитано счётчиков — {rows}")
+
+            diffs = diff_counts(poll_id)
+            if diffs:
+                mismatched += 1
+                for (question_id, choice_id), (have, want) in sorted(
+                    diffs.items(), key=lambda item: (item[0][0] or 0, item[0][1] or 0)
+                ):
+                    self.stdout.write(self.style.WARNING(
+                        f"Опрос {poll_id}: question={question_id} choice={choice_id}: "
+                        f"счётчик {have}, по данным {want}"
+                    ))
+
+        if mismatched:
+            raise CommandError(f"Счётчики расходятся с данными в опросах: {mismatched} из {len(ids)}")
+        self.stdout.write(self.style.SUCCESS(f"Счётчики совпадают с данными ({len(ids)} опрос(ов))."))
@@ -0,0 +1,201 @@
+"""
+Генератор синтетических данных для проверки на больших объёмах.
+
+    python manage.py seed_polls --polls 2 --questions 200 --submissions 100000
+    python manage.py seed_polls --questions 30 --choices 5 --submissions 20000 --seed 7 --owner admin
+
+Создаёт опросы, вопросы, варианты, отправки, ответы и строки AnswerChoice
+пакетами через bulk_create (каждый пакет отправок — своя транзакция) и в конце
+пересобирает счётчики голосов. Распределения похожи на живые:
+- популярность вариантов — по закону Ципфа со случайным порядком по вопросу;
+- в MULTI чаще выбирают 1–2 варианта, реже больше;
+- правильный вариант в тестовых вопросах выбирают чаще остальных;
+- текстовые ответы — короткие фразы разной длины.
+
+При одинаковом --seed данные (коды доступа, ответы, баллы) совпадают.
+"""
+
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from polls.models import Answer, Choice, Poll, Question, Submission
+from polls.services.access_codes import reserve_access_codes
+from polls.services.counters import rebuild_counts
+from polls.services.scoring import AnswerKey
+
+AnswerChoice = Answer.selected_choices.through
+
+KIND_WEIGHTS = {Question.Kind.SINGLE: 5, Question.Kind.MULTI: 3, Question.Kind.TEXT: 2}
+WORDS = (
+    "да нет нравится удобно быстро медленно интересно сложно понятно скучно "
+    "хорошо отлично плохо материал задания преподаватель время вопросы пример"
+).split()
+
+
+class Command(BaseCommand):
+    help = "Генерирует большие опросы с отправками (bulk_create пакетами, детерминированно по --seed)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--polls", type=int, default=1)
+        parser.add_argument("--questions", type=int, default=20, help="Вопросов в опросе")
+        parser.add_argument("--choices", type=int, default=4, help="Вариантов в вопросе с выбором")
+        parser.add_argument("--submissions", type=int, default=10000, help="Отправок в опрос")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Отправок в одной транзакции")
+        parser.add_argument("--test-share", type=float, default=0.5, help="Доля тестовых вопросов с выбором")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--owner", help="username владельца опросов")
+
+    def handle(self, *args, **options):
+        if options["choices"] < 2:
+            raise CommandError("--choices должно быть не меньше 2")
+        owner = None
+        if options["owner"]:
+            try:
+                owner = get_user_model().objects.get(username=options["owner"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Пользователь {options['owner']} не найден")
+
+        rng = random.Random(options["seed"])
+        totals = {"Poll": 0, "Question": 0, "Choice": 0, "Submission": 0, "Answer": 0, "AnswerChoice": 0}
+        started = time.perf_counter()
+
+        # Все коды — одним запросом и воспроизводимо по --seed
+        codes = reserve_access_codes(options["polls"], rng=rng)
+        for n, code in enumerate(codes):
+            poll_started = time.perf_counter()
+            poll, questions = self._create_poll(rng, n, code, owner, options, totals)
+            self._create_submissions(rng, poll, questions, options, totals)
+            with transaction.atomic():
+                rebuild_counts(poll.id)
+
+            rows = options["submissions"]
+            self.stdout.write(
+                f"{poll.access_code}: {rows} отправок за {time.perf_counter() - poll_started:.1f} с"
+            )
+
+        elapsed = time.perf_counter() - started
+        total_rows = sum(totals.values())
+        self.stdout.write(", ".join(f"{name}: {count}" for name, count in totals.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f"{total_rows} строк за {elapsed:.1f} с — {total_rows / elapsed:,.0f} строк/с".replace(",", " ")
+        ))
+
+    # ───── структура ─────
+
+    def _create_poll(self, rng, n, code, owner, options, totals):
+        with transaction.atomic():
+            poll = Poll.objects.create(
+                title=f"Синтетический опрос {n + 1} (seed {options['seed']})",
+                owner=owner,
+                access_code=code,
+                allow_multiple_submissions=True,
+            )
+            kinds = rng.choices(list(KIND_WEIGHTS), weights=list(KIND_WEIGHTS.values()), k=options["questions"])
+            questions = Question.objects.bulk_create(
+                Question(
+                    poll=poll,
+                    text=f"Вопрос {i + 1}",
+                    kind=kind,
+                    order=i + 1,
+                    is_test_question=kind != Question.Kind.TEXT and rng.random() < options["test_share"],
+                )
+                for i, kind in enumerate(kinds)
+            )
+            choices = []
+            for q in questions:
+                if q.kind == Question.Kind.TEXT:
+                    continue
+                correct = rng.randrange(options["choices"]) if q.is_test_question else None
+                choices += [
+                    Choice(question=q, text=f"Вариант {j + 1}", is_correct=j == correct)
+                    for j in range(options["choices"])
+                ]
+            Choice.objects.bulk_create(choices, batch_size=1000)
+
+        totals["Poll"] += 1
+        totals["Question"] += len(questions)
+        totals["Choice"] += len(choices)
+
+        by_question: dict[int, list[Choice]] = {}
+        for c in choices:
+            by_question.setdefault(c.question_id, []).append(c)
+        plan = []
+        for q in questions:
+            variants = by_question.get(q.id, [])
+            # Ципф: вес варианта ~ 1/ранг, ранги перемешаны; правильный вариант в 2 раза популярнее
+            ranks = list(range(1, len(variants) + 1))
+            rng.shuffle(ranks)
+            weights = [(2.0 if c.is_correct else 1.0) / r for c, r in zip(variants, ranks)]
+            correct_ids = frozenset(c.id for c in variants if c.is_correct)
+            plan.append((q, [c.id for c in variants], weights, correct_ids))
+        return poll, plan
+
+    # ───── отправки ─────
+
+    def _create_submissions(self, rng, poll, questions, options, totals):
+        # Ключ ответов строим из того, что только что создали, — без запросов
+        answer_key = AnswerKey({q.id: correct for q, _, _, correct in questions if q.is_test_question})
+
+        remaining = options["submissions"]
+        while remaining > 0:
+            size = min(options["batch_size"], remaining)
+            remaining -= size
+            self._create_batch(rng, poll, questions, answer_key, size, totals)
+
+    def _create_batch(self, rng, poll, questions, answer_key, size, totals):
+        sheets = [self._fill_sheet(rng, questions) for _ in range(size)]
+        with transaction.atomic():
+            submissions = Submission.objects.bulk_create([
+                Submission(
+                    poll=poll,
+                    session_key=f"{rng.getrandbits(128):032x}",
+                    **self._score(answer_key, sheet),
+                )
+                for sheet in sheets
+            ])
+            answers = Answer.objects.bulk_create(
+                [
+                    Answer(submission_id=submission.id, question_id=qid, text_value=text)
+                    for submission, sheet in zip(submissions, sheets)
+                    for qid, text, _ in sheet
+                ],
+                batch_size=5000,
+            )
+            links = [
+                AnswerChoice(answer_id=answer.id, choice_id=cid)
+                for answer, (_, _, choice_ids) in zip(answers, (row for sheet in sheets for row in sheet))
+                for cid in choice_ids
+            ]
+            AnswerChoice.objects.bulk_create(links, batch_size=5000)
+
+        totals["Submission"] += len(submissions)
+        totals["Answer"] += len(answers)
+        totals["AnswerChoice"] += len(links)
+
+    def _fill_sheet(self, rng, questions) -> list[tuple[int, str, list[int]]]:
+        """Одна анкета: [(question_id, текст, [choice_id, ...])]."""
+        sheet = []
+        for q, ids, weights, _ in questions:
+            if q.kind == Question.Kind.TEXT:
+                sheet.append((q.id, " ".join(rng.choices(WORDS, k=rng.randint(1, 12))), []))
+            elif q.kind == Question.Kind.SINGLE:
+                sheet.append((q.id, "", rng.choices(ids, weights=weights)))
+            else:
+                # Геометрическое число выбранных: чаще 1–2
+                k = 1
+                while k < len(ids) and rng.random() < 0.4:
+                    k += 1
+                picked = set()
+                while len(picked) < k:
+                    picked.add(rng.choices(ids, weights=weights)[0])
+                sheet.append((q.id, "", sorted(picked)))
+        return sheet
+
+    @staticmethod
+    def _score(answer_key: AnswerKey, sheet) -> dict:
+        result = answer_key.score((qid, choice_ids) for qid, _, choice_ids in sheet)
+        return {"score": result.score, "total": result.total}
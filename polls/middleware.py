@@ -0,0 +1,114 @@
+"""
+Необязательный middleware замеров: SQL-запросы, время в БД и шаблонах, полное время.
+
+Включается POLLS_METRICS_ENABLED. На каждый запрос:
+- SQL перехватывается connection.execute_wrapper() на всех подключениях;
+- время шаблонов — обёрткой django.template.base.Template.render
+  (считается только внешний шаблон: include/extends внутри не суммируются дважды);
+- итог по имени URL копится в services/metrics.py и отдаётся /dashboard/metrics;
+- при POLLS_METRICS_SERVER_TIMING — заголовок Server-Timing;
+- запрос с числом SQL ≥ POLLS_METRICS_QUERY_THRESHOLD пишется в лог polls.metrics
+  вместе с повторяющимися шаблонами SQL (N+1).
+
+У потоковых ответов (выгрузка, таблица ответов) запросы, сделанные уже во время
+отдачи тела, в замер не попадают.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template import base as template_base
+
+from .services.metrics import RequestSample, registry
+
+logger = logging.getLogger("polls.metrics")
+
+_current: contextvars.ContextVar[RequestSample | None] = contextvars.ContextVar("polls_metrics_sample", default=None)
+_template_depth: contextvars.ContextVar[int] = contextvars.ContextVar("polls_metrics_template_depth", default=0)
+
+
+def _install_template_timer() -> None:
+    render = template_base.Template.render
+    if getattr(render, "_polls_metrics", False):
+        return
+
+    @functools.wraps(render)
+    def timed_render(self, context):
+        sample = _current.get()
+        if sample is None:
+            return render(self, context)
+        depth = _template_depth.get()
+        token = _template_depth.set(depth + 1)
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            _template_depth.reset(token)
+            if depth == 0:
+                sample.template_time += time.perf_counter() - started
+
+    timed_render._polls_metrics = True
+    template_base.Template.render = timed_render
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "POLLS_METRICS_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = getattr(settings, "POLLS_METRICS_SERVER_TIMING", False)
+        self.query_threshold = getattr(settings, "POLLS_METRICS_QUERY_THRESHOLD", 50)
+        _install_template_timer()
+
+    def __call__(self, request):
+        sample = RequestSample(view="", total=0.0)
+
+        def wrapper(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                sample.db_time += time.perf_counter() - started
+                sample.queries.append(sql)
+
+        token = _current.set(sample)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(wrapper))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        sample.total = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        sample.view = (match.view_name if match else None) or "<unresolved>"
+        registry.record(sample)
+
+        if self.server_timing:
+            response["Server-Timing"] = sample.server_timing()
+        if self.query_threshold and sample.query_count >= self.query_threshold:
+            self._log_heavy(request, sample)
+        return response
+
+    def _log_heavy(self, request, sample: RequestSample) -> None:
+        duplicated = sample.duplicated_queries()
+        logger.warning(
+            "%s %s (%s): %d SQL за %.1f мс, БД %.1f мс; повторы: %s",
+            request.method,
+            request.path,
+            sample.view,
+            sample.query_count,
+            sample.total * 1000,
+            sample.db_time * 1000,
+            "; ".join(f"{n}× {pattern}" for pattern, n in duplicated[:5]) or "нет",
+        )
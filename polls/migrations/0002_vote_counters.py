@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_vote_counters(apps, schema_editor):
+    """Заполняет счётчики по уже накопленным отправкам."""
+    Answer = apps.get_model("polls", "Answer")
+    Submission = apps.get_model("polls", "Submission")
+    VoteCounter = apps.get_model("polls", "VoteCounter")
+    AnswerChoice = Answer.selected_choices.through
+
+    counters = [
+        VoteCounter(poll_id=row["poll_id"], value=row["n"])
+        for row in Submission.objects.values("poll_id").annotate(n=Count("id"))
+    ]
+    counters += [
+        VoteCounter(poll_id=row["submission__poll_id"], question_id=row["question_id"], value=row["n"])
+        for row in (
+            Answer.objects.exclude(text_value="")
+            .values("submission__poll_id", "question_id")
+            .annotate(n=Count("id"))
+        )
+    ]
+    counters += [
+        VoteCounter(
+            poll_id=row["answer__submission__poll_id"],
+            question_id=row["answer__question_id"],
+            choice_id=row["choice_id"],
+            value=row["n"],
+        )
+        for row in (
+            AnswerChoice.objects
+            .values("answer__submission__poll_id", "answer__question_id", "choice_id")
+            .annotate(n=Count("id"))
+        )
+    ]
+    VoteCounter.objects.bulk_create(counters, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Значение')),
+                ('choice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='vote_counters', to='polls.choice', verbose_name='Вариант ответа')),
+                ('poll', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vote_counters', to='polls.poll', verbose_name='Опрос')),
+                ('question', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='vote_counters', to='polls.question', verbose_name='Вопрос')),
+            ],
+            options={
+                'verbose_name': 'Счётчик голосов',
+                'verbose_name_plural': 'Счётчики голосов',
+                'constraints': [models.UniqueConstraint(condition=models.Q(('choice__isnull', False)), fields=('choice',), name='unique_vote_counter_choice'), models.UniqueConstraint(condition=models.Q(('choice__isnull', True), ('question__isnull', False)), fields=('question',), name='unique_vote_counter_question'), models.UniqueConstraint(condition=models.Q(('question__isnull', True)), fields=('poll',), name='unique_vote_counter_poll')],
+            },
+        ),
+        migrations.RunPython(backfill_vote_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:48
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def mark_single_entries(apps, schema_editor):
+    """В опросах без повторного прохождения помечает последнюю отправку каждого участника."""
+    Submission = apps.get_model("polls", "Submission")
+    single = Submission.objects.filter(poll__allow_multiple_submissions=False)
+
+    latest_ids = list(
+        single.filter(user__isnull=False)
+        .values("poll_id", "user_id")
+        .annotate(last=Max("id"))
+        .values_list("last", flat=True)
+    )
+    latest_ids += list(
+        single.filter(user__isnull=True, session_key__isnull=False)
+        .values("poll_id", "session_key")
+        .annotate(last=Max("id"))
+        .values_list("last", flat=True)
+    )
+    for start in range(0, len(latest_ids), 500):
+        Submission.objects.filter(id__in=latest_ids[start:start + 500]).update(single_entry=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0002_vote_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='single_entry',
+            field=models.BooleanField(default=False, verbose_name='Единственная отправка участника'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['poll', 'user', '-created_at'], name='submission_poll_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['poll', 'session_key', '-created_at'], name='submission_poll_session_idx'),
+        ),
+        migrations.RunPython(mark_single_entries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='submission',
+            constraint=models.UniqueConstraint(condition=models.Q(('single_entry', True), ('user__isnull', False)), fields=('poll', 'user'), name='unique_single_entry_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='submission',
+            constraint=models.UniqueConstraint(condition=models.Q(('single_entry', True), ('user__isnull', True)), fields=('poll', 'session_key'), name='unique_single_entry_session'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0003_submission_single_entry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingSubmission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_key', models.CharField(blank=True, max_length=40, null=True, verbose_name='Ключ участника')),
+                ('payload', models.JSONField(verbose_name='Ответы')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Принята')),
+                ('poll', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_submissions', to='polls.poll', verbose_name='Опрос')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Отправка в очереди',
+                'verbose_name_plural': 'Отправки в очереди',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['poll', 'session_key'], name='pending_poll_session_idx'), models.Index(fields=['poll', 'user'], name='pending_poll_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0004_pending_submissions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='copies', to='polls.choice', verbose_name='Вариант из банка'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='bank_owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='bank_questions', to=settings.AUTH_USER_MODEL, verbose_name='Владелец банка'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='copies', to='polls.question', verbose_name='Вопрос из банка'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='poll',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='questions', to='polls.poll', verbose_name='Опрос'),
+        ),
+        migrations.AddConstraint(
+            model_name='question',
+            constraint=models.UniqueConstraint(condition=models.Q(('source__isnull', False)), fields=('poll', 'source'), name='unique_bank_question_per_poll'),
+        ),
+        migrations.AddConstraint(
+            model_name='question',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('bank_owner__isnull', False), ('poll__isnull', True)), models.Q(('bank_owner__isnull', True), ('poll__isnull', False)), _connector='OR'), name='question_in_poll_or_bank'),
+        ),
+    ]
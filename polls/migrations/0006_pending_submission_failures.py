@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0005_question_bank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingsubmission',
+            name='error',
+            field=models.TextField(blank=True, verbose_name='Ошибка переноса'),
+        ),
+        migrations.AddField(
+            model_name='pendingsubmission',
+            name='failed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Не перенесена'),
+        ),
+    ]
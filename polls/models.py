@@ -8,16 +8,32 @@ import string
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.db.models import Max
 
+ACCESS_CODE_CHARS = string.ascii_uppercase + string.digits
+ACCESS_CODE_LENGTH = 8
+# Сколько раз Poll.save() пробует новый код при совпадении (36^8 кодов — совпадение почти невероятно)
+ACCESS_CODE_ATTEMPTS = 5
+
+
+class GeneratedAccessCode(str):
+    """Код, выданный по умолчанию, а не заданный явно: при совпадении его можно заменить."""
+
+
+def random_access_code(rng=None) -> str:
+    choice = rng.choice if rng is not None else secrets.choice
+    return "".join(choice(ACCESS_CODE_CHARS) for _ in range(ACCESS_CODE_LENGTH))
+
+
 def generate_access_code():
-    chars = string.ascii_uppercase + string.digits
-    while True:
-        code = "".join(secrets.choice(chars) for _ in range(8))
-        if not Poll.objects.filter(access_code=code).exists():
-            return code
+    """
+    Код по умолчанию — без запросов к БД. Уникальность обеспечивает UNIQUE-индекс,
+    совпадение перехватывает Poll.save(); для пачек — services/access_codes.py.
+    """
+    return GeneratedAccessCode(random_access_code())
+
 
 class Poll(models.Model):
     title = models.CharField(_("Название"), max_length=200)
@@ -77,6 +93,21 @@ class Poll(models.Model):
     def __repr__(self) -> str:
         return f"<Poll id={self.id} title='{self.title}' access_code='{self.access_code}'>"
 
+    def save(self, *args, **kwargs):
+        if not (self._state.adding and isinstance(self.access_code, GeneratedAccessCode)):
+            return super().save(*args, **kwargs)
+
+        # Код выдан по умолчанию: при совпадении с чужим — новый код и ещё одна попытка
+        for attempt in range(ACCESS_CODE_ATTEMPTS):
+            try:
+                with transaction.atomic(using=kwargs.get("using")):
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                taken = Poll.objects.filter(access_code=self.access_code).exists()
+                if not taken or attempt == ACCESS_CODE_ATTEMPTS - 1:
+                    raise
+                self.access_code = generate_access_code()
+
 
 
 class Question(models.Model):
@@ -85,12 +116,32 @@ class Question(models.Model):
         SINGLE = "SINGLE", _("Одиночный выбор")
         MULTI = "MULTI", _("Множественный выбор")
 
+    # Вопрос без опроса — запись банка вопросов владельца (bank_owner);
+    # вопрос опроса со ссылкой source — копия записи банка (services/bank.py)
     poll = models.ForeignKey(
         Poll,
         on_delete=models.CASCADE,
+        null=True,
+        blank=True,
         related_name="questions",
         verbose_name=_("Опрос"),
     )
+    bank_owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="bank_questions",
+        verbose_name=_("Владелец банка"),
+    )
+    source = models.ForeignKey(
+        "self",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="copies",
+        verbose_name=_("Вопрос из банка"),
+    )
     text = models.CharField(
         _("Текст вопроса"),
         max_length=500,
@@ -121,8 +172,23 @@ class Question(models.Model):
             models.UniqueConstraint(
                 fields=["poll", "order"],
                 name="unique_order_per_poll"
-            )
+            ),
+            models.UniqueConstraint(
+                fields=["poll", "source"],
+                condition=models.Q(source__isnull=False),
+                name="unique_bank_question_per_poll",
+            ),
+            models.CheckConstraint(
+                condition=models.Q(poll__isnull=True, bank_owner__isnull=False)
+                | models.Q(poll__isnull=False, bank_owner__isnull=True),
+                name="question_in_poll_or_bank",
+            ),
         ]
+
+    @property
+    def in_bank(self) -> bool:
+        return self.poll_id is None
+
     def clean(self):
         super().clean()
         if self.kind == Question.Kind.TEXT and self.is_test_question:
@@ -158,6 +224,14 @@ class Choice(models.Model):
         related_name="choices",
         verbose_name=_("Вопрос"),
     )
+    source = models.ForeignKey(
+        "self",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="copies",
+        verbose_name=_("Вариант из банка"),
+    )
     text = models.CharField(_("Текст варианта"), max_length=200)
     is_correct = models.BooleanField(
         _("Правильный ответ"),
@@ -221,29 +295,44 @@ class Submission(models.Model):
         db_index=True,
         verbose_name=_("Ключ сессии"),
     )
+    # Отправка в опрос без повторного прохождения: на такие строки действует
+    # частичный уникальный индекс (poll, user) / (poll, session_key)
+    single_entry = models.BooleanField(_("Единственная отправка участника"), default=False)
 
     class Meta:
         verbose_name = _("Ответ участника")
         verbose_name_plural = _("Ответы участников")
         ordering = ["-created_at"]
+        indexes = [
+            # Проверка повторного прохождения и последняя отправка для poll_thanks
+            models.Index(fields=["poll", "user", "-created_at"], name="submission_poll_user_idx"),
+            models.Index(fields=["poll", "session_key", "-created_at"], name="submission_poll_session_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["poll", "user"],
+                condition=models.Q(single_entry=True, user__isnull=False),
+                name="unique_single_entry_user",
+            ),
+            models.UniqueConstraint(
+                fields=["poll", "session_key"],
+                condition=models.Q(single_entry=True, user__isnull=True),
+                name="unique_single_entry_session",
+            ),
+        ]
 
     def calculate_score(self):
-        """Пересчитывает и сохраняет количество правильных ответов."""
-        correct = 0
-        total = 0
-
-        for answer in self.answers.select_related("question").prefetch_related("selected_choices"):
-            if not answer.question.is_test_question:
-                continue
-            if answer.question.kind == Question.Kind.TEXT:
-                continue
-
-            total += 1
-            if answer.is_correct is True:
-                correct += 1
-
-        self.score = correct
-        self.total = total
+        """Пересчитывает и сохраняет количество правильных ответов (по ключу ответов опроса)."""
+        from .services.scoring import get_answer_key
+
+        answers = self.answers.prefetch_related("selected_choices")
+        result = get_answer_key(self.poll_id).score(
+            (answer.question_id, [c.id for c in answer.selected_choices.all()])
+            for answer in answers
+        )
+
+        self.score = result.score
+        self.total = result.total
         self.save(update_fields=["score", "total"])
 
     def __str__(self) -> str:
@@ -294,22 +383,12 @@ class Answer(models.Model):
             - False — если неправильный
             - None — если вопрос не подлежит проверке
         """
-        if not self.question.is_test_question:
-            return None
-        if self.question.kind == Question.Kind.TEXT:
-            return None
-
-        if self.question.kind == Question.Kind.SINGLE:
-            selected = self.selected_choices.first()
-            correct = self.question.choices.filter(is_correct=True).first()
-            return selected == correct
-
-        if self.question.kind == Question.Kind.MULTI:
-            selected_ids = set(self.selected_choices.values_list("id", flat=True))
-            correct_ids = set(self.question.choices.filter(is_correct=True).values_list("id", flat=True))
-            return selected_ids == correct_ids and bool(correct_ids)
+        from .services.scoring import get_answer_key
 
-        return None
+        answer_key = get_answer_key(self.submission.poll_id)
+        if self.question_id not in answer_key:
+            return None
+        return answer_key.is_correct(self.question_id, [c.id for c in self.selected_choices.all()])
 
     def __str__(self) -> str:
         q = self.question.text[:40]
@@ -320,3 +399,109 @@ class Answer(models.Model):
 
     def __repr__(self) -> str:
         return f"<Answer id={self.id} submission_id={self.submission_id} question_id={self.question_id}>"
+
+
+class VoteCounter(models.Model):
+    """
+    Денормализованные счётчики голосов опроса.
+    Одна таблица, три вида строк:
+        - (poll, —, —)               — количество отправок опроса;
+        - (poll, question, —)        — количество непустых текстовых ответов на вопрос;
+        - (poll, question, choice)   — сколько раз выбран вариант.
+    Обновляются в той же транзакции, что и запись/удаление отправки
+    (см. polls/services/counters.py). Пересчёт с нуля: manage.py rebuild_vote_counters.
+    """
+
+    poll = models.ForeignKey(
+        Poll,
+        on_delete=models.CASCADE,
+        related_name="vote_counters",
+        verbose_name=_("Опрос"),
+    )
+    question = models.ForeignKey(
+        Question,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="vote_counters",
+        verbose_name=_("Вопрос"),
+    )
+    choice = models.ForeignKey(
+        Choice,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="vote_counters",
+        verbose_name=_("Вариант ответа"),
+    )
+    value = models.BigIntegerField(_("Значение"), default=0)
+
+    class Meta:
+        verbose_name = _("Счётчик голосов")
+        verbose_name_plural = _("Счётчики голосов")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["choice"],
+                condition=models.Q(choice__isnull=False),
+                name="unique_vote_counter_choice",
+            ),
+            models.UniqueConstraint(
+                fields=["question"],
+                condition=models.Q(question__isnull=False, choice__isnull=True),
+                name="unique_vote_counter_question",
+            ),
+            models.UniqueConstraint(
+                fields=["poll"],
+                condition=models.Q(question__isnull=True),
+                name="unique_vote_counter_poll",
+            ),
+        ]
+
+    def __repr__(self) -> str:
+        return (
+            f"<VoteCounter poll_id={self.poll_id} question_id={self.question_id} "
+            f"choice_id={self.choice_id} value={self.value}>"
+        )
+
+
+class PendingSubmission(models.Model):
+    """
+    Журнал принятых, но ещё не записанных отправок (режим POLLS_SUBMISSION_QUEUE).
+    poll_public только валидирует ответы и добавляет сюда одну строку;
+    manage.py drain_submissions переносит их пачками в Submission/Answer.
+    """
+
+    poll = models.ForeignKey(
+        Poll,
+        on_delete=models.CASCADE,
+        related_name="pending_submissions",
+        verbose_name=_("Опрос"),
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name=_("Пользователь"),
+    )
+    session_key = models.CharField(_("Ключ участника"), max_length=40, blank=True, null=True)
+    # {"single_entry": bool, "answers": [[question_id, text_value, [choice_id, ...]], ...]}
+    payload = models.JSONField(_("Ответы"))
+    created_at = models.DateTimeField(_("Принята"), auto_now_add=True)
+    # Строка, которую не удалось перенести (битый payload и т. п.): drain её пропускает,
+    # остальной журнал переносится дальше; разбор — вручную по error
+    failed_at = models.DateTimeField(_("Не перенесена"), null=True, blank=True)
+    error = models.TextField(_("Ошибка переноса"), blank=True)
+
+    class Meta:
+        verbose_name = _("Отправка в очереди")
+        verbose_name_plural = _("Отправки в очереди")
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["poll", "session_key"], name="pending_poll_session_idx"),
+            models.Index(fields=["poll", "user"], name="pending_poll_user_idx"),
+        ]
+
+    def __repr__(self) -> str:
+        return f"<PendingSubmission id={self.id} poll_id={self.poll_id}>"
@@ -0,0 +1,92 @@
+"""
+Чтение с реплики для тяжёлых страниц (POLLS_READ_DATABASE).
+
+На реплику уходят не все чтения, а только сделанные внутри области
+replica_reads(). Этой областью помечены (декоратор reads_from_replica)
+статистика, таблица ответов, выгрузка и live_vote_count. Остальное читает
+с основной БД. Это касается и страницы «Спасибо»: участник должен увидеть
+свою отправку сразу, без отставания реплики.
+
+Запись всегда идёт на основную БД, даже для объектов, прочитанных с реплики.
+Долгоживущие кэши (структура опроса, ключ ответов) собираются в области
+primary_reads(), чтобы отставшая реплика не попала в кэш на часы.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_use_replica: contextvars.ContextVar[bool] = contextvars.ContextVar("polls_use_replica", default=False)
+
+
+def read_alias() -> str | None:
+    """Алиас реплики для чтения; None — реплика не настроена."""
+    alias = getattr(settings, "POLLS_READ_DATABASE", None)
+    if alias and alias in settings.DATABASES:
+        return alias
+    return None
+
+
+@contextmanager
+def replica_reads():
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def _iter_on_replica(chunks):
+    # Тело потокового ответа читается уже после выхода из вьюхи — входим в область на каждый кусок
+    iterator = iter(chunks)
+    while True:
+        with replica_reads():
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+        yield chunk
+
+
+def reads_from_replica(view):
+    """Чтения вьюхи (и тела её потокового ответа) — с реплики, если она настроена."""
+
+    @functools.wraps(view)
+    def wrapped(request, *args, **kwargs):
+        with replica_reads():
+            response = view(request, *args, **kwargs)
+        if response.streaming and not response.is_async:
+            response.streaming_content = _iter_on_replica(response.streaming_content)
+        return response
+
+    return wrapped
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get():
+            return read_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, read_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
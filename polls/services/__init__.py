@@ -0,0 +1,5 @@
+"""
+Сервисный слой приложения опросов.
+Здесь живёт логика, которую используют сразу несколько вьюх: запись отправок,
+подсчёт баллов, агрегаты статистики и т.п.
+"""
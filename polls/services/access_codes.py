@@ -0,0 +1,68 @@
+"""
+Коды доступа для массового создания опросов (импорт, шаблоны, seed).
+
+Poll.save() сам по себе обходится без запросов: случайный код, а совпадение
+ловит UNIQUE-индекс. Для пачки опросов это значило бы по SAVEPOINT на опрос,
+поэтому коды резервируются пачкой:
+- reserve_access_codes(n) — n свободных кодов, один SELECT … IN на пачку кандидатов;
+- bulk_create_polls(polls) — раздаёт коды опросам без явного кода и вставляет
+  их одним bulk_create. Если между проверкой и вставкой код успели занять
+  (IntegrityError), коды резервируются заново и вставка повторяется.
+"""
+
+from __future__ import annotations
+
+from django.db import IntegrityError, transaction
+
+from ..models import ACCESS_CODE_ATTEMPTS, GeneratedAccessCode, Poll, random_access_code
+
+# Кандидатов в пачке с запасом: часть может оказаться занята
+RESERVE_HEADROOM = 1.1
+
+
+def reserve_access_codes(count: int, *, rng=None, exclude: set[str] = frozenset()) -> list[str]:
+    """
+    `count` разных кодов, которых нет в БД и в `exclude`. Обычно — один запрос.
+    С `rng` (random.Random) коды воспроизводимы — для seed-данных.
+    """
+    codes: list[str] = []
+    seen = set(exclude)
+    while len(codes) < count:
+        wanted = count - len(codes)
+        candidates = set()
+        while len(candidates) < int(wanted * RESERVE_HEADROOM) + 1:
+            code = random_access_code(rng)
+            if code not in seen:
+                candidates.add(code)
+        taken = set(Poll.objects.filter(access_code__in=candidates).values_list("access_code", flat=True))
+        # sorted — чтобы с одним rng получались одни и те же коды
+        free = sorted(candidates - taken)[:wanted]
+        codes.extend(free)
+        seen |= candidates
+    return codes
+
+
+def bulk_create_polls(polls: list[Poll], *, rng=None, batch_size: int | None = None) -> list[Poll]:
+    """
+    Вставляет опросы одним bulk_create. Код выдаётся тем, у кого он по умолчанию
+    (GeneratedAccessCode); явно заданные коды не меняются — их совпадение остаётся ошибкой.
+    """
+    polls = list(polls)
+    generated = [poll for poll in polls if isinstance(poll.access_code, GeneratedAccessCode)]
+    explicit = {poll.access_code for poll in polls if not isinstance(poll.access_code, GeneratedAccessCode)}
+
+    for attempt in range(ACCESS_CODE_ATTEMPTS):
+        codes = reserve_access_codes(len(generated), rng=rng, exclude=explicit)
+        for poll, code in zip(generated, codes):
+            poll.access_code = GeneratedAccessCode(code)
+        try:
+            with transaction.atomic():
+                return Poll.objects.bulk_create(polls, batch_size=batch_size)
+        except IntegrityError:
+            # Выданный код заняли параллельно — пробуем новые; совпавший явный код повтором не лечится
+            if (
+                attempt == ACCESS_CODE_ATTEMPTS - 1
+                or not generated
+                or Poll.objects.filter(access_code__in=explicit).exists()
+            ):
+                raise
@@ -0,0 +1,385 @@
+"""
+Банк вопросов: одно определение вопроса на много опросов.
+
+Запись банка — обычный Question без опроса (poll=NULL, bank_owner) со своими Choice.
+В опрос попадает копия записи: Question/Choice со ссылкой source на банк. Строки
+копий остаются, чтобы всё «по опросу» работало как прежде: порядок, отправки,
+счётчики VoteCounter, кэши структуры и ключа ответов. Правится только запись
+банка; sync_copies() переносит правку во все копии фиксированным числом запросов,
+сколько бы опросов её ни использовали:
+    UPDATE вопросов-копий, один UPDATE … CASE вариантов, INSERT недостающих.
+Только варианты, удалённые из банка, удаляются из копий обычным delete() —
+с каскадом на счётчики, по строке на копию; это редкая операция. Вариант,
+который уже выбирали в каком-нибудь опросе, удалить нельзя (check_choice_removal):
+каскад переписал бы сохранённые ответы. Тип и признак тестового вопроса меняются,
+только пока на вопрос и его копии не отвечали (check_kind_change, его вызывает
+QuestionForm — и для вопросов опросов, и для записей банка): баллы отправок
+и счётчики посчитаны по прежним.
+
+Определение записи (текст, тип, варианты, правильные варианты) кэшируется одно
+на все опросы: get_definitions() — cache.get_many и один запрос на промахи.
+Из него создаются копии (add_to_poll) и подписывается сводная статистика
+по всем опросам (item_stats), которая считается сгруппированными запросами
+по копиям, их ответам и счётчикам. Сброс определения — сигналы на Question/Choice банка.
+
+bulk_create/update() сигналов не шлют — кэши опросов с изменёнными копиями
+сбрасываются здесь же, после фиксации транзакции.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable, NamedTuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BooleanField, Case, CharField, Count, Q, Sum, Value, When
+
+from ..models import Answer, Choice, Poll, Question, VoteCounter
+from ..routers import primary_reads
+from .scoring import invalidate_answer_key
+from .stats import ChoiceStats, QuestionStats
+from .structure import ChoiceData, ChoiceList, bump_structure_version
+
+DEFINITION_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class BankError(ValueError):
+    """Операция с банком невозможна; текст — для показа владельцу."""
+
+
+class QuestionDefinition(NamedTuple):
+    id: int
+    text: str
+    kind: str
+    is_test_question: bool
+    choices: ChoiceList
+
+    @property
+    def correct_ids(self) -> frozenset[int]:
+        """Ключ ответа записи: id правильных вариантов банка (пусто — не проверяется)."""
+        if not self.is_test_question or self.kind == Question.Kind.TEXT:
+            return frozenset()
+        return frozenset(c.id for c in self.choices if c.is_correct)
+
+
+@dataclass(slots=True)
+class ItemStats:
+    """Сводка по записи банка во всех опросах; id в `question` — id записи и вариантов банка."""
+
+    question: QuestionStats
+    polls: int = 0
+    submissions: int = 0
+
+
+# ───── определения ─────
+
+def definition_cache_key(question_id: int) -> str:
+    return f"polls:bank_question:{question_id}"
+
+
+def invalidate_definition(question_id: int) -> None:
+    cache.delete(definition_cache_key(question_id))
+
+
+def _build_definitions(question_ids: Iterable[int]) -> dict[int, QuestionDefinition]:
+    """Один запрос: записи банка LEFT JOIN варианты."""
+    rows = (
+        Question.objects
+        .filter(id__in=question_ids, poll__isnull=True)
+        .order_by("id", "choices__text", "choices__id")
+        .values_list(
+            "id", "text", "kind", "is_test_question",
+            "choices__id", "choices__text", "choices__is_correct",
+        )
+    )
+    entries: dict[int, tuple[tuple, list[ChoiceData]]] = {}
+    for qid, text, kind, is_test, choice_id, choice_text, is_correct in rows:
+        entry = entries.setdefault(qid, ((qid, text, kind, is_test), []))
+        if choice_id is not None:
+            entry[1].append(ChoiceData(choice_id, choice_text, is_correct))
+    return {
+        qid: QuestionDefinition(*fields, choices=ChoiceList(choices))
+        for qid, (fields, choices) in entries.items()
+    }
+
+
+def get_definitions(question_ids: Iterable[int]) -> dict[int, QuestionDefinition]:
+    """Определения записей банка из общего кэша; нет в результате — записи нет."""
+    keys = {definition_cache_key(qid): qid for qid in set(question_ids)}
+    definitions = {keys[key]: value for key, value in cache.get_many(keys).items()}
+    missing = set(keys.values()) - definitions.keys()
+    if missing:
+        with primary_reads():
+            built = _build_definitions(missing)
+        cache.set_many(
+            {definition_cache_key(qid): definition for qid, definition in built.items()},
+            DEFINITION_CACHE_TIMEOUT,
+        )
+        definitions.update(built)
+    return definitions
+
+
+# ───── копии в опросах ─────
+
+def _polls_changed(poll_refs: Iterable[tuple[int, str]]) -> None:
+    poll_refs = set(poll_refs)
+
+    def reset():
+        for poll_id, access_code in poll_refs:
+            invalidate_answer_key(poll_id)
+            bump_structure_version(access_code)
+
+    transaction.on_commit(reset)
+
+
+@transaction.atomic
+def add_to_poll(poll: Poll, question_ids: Iterable[int], *, owner) -> list[Question]:
+    """
+    Копирует записи банка `owner` в конец опроса (в порядке `question_ids`).
+    Записи, которые уже есть в опросе, пропускаются. Возвращает созданные копии.
+    """
+    question_ids = list(dict.fromkeys(question_ids))
+    owned = set(
+        Question.objects
+        .filter(id__in=question_ids, poll__isnull=True, bank_owner=owner)
+        .values_list("id", flat=True)
+    )
+    if owned != set(question_ids):
+        raise BankError("Вопрос не найден в вашем банке")
+    present = set(poll.questions.filter(source_id__in=question_ids).values_list("source_id", flat=True))
+    definitions = get_definitions(question_ids)
+
+    first_order = Question.next_order_for_poll(poll)
+    copies = []
+    for qid in question_ids:
+        if qid in present:
+            continue
+        definition = definitions[qid]
+        copies.append(Question(
+            poll=poll,
+            source_id=qid,
+            text=definition.text,
+            kind=definition.kind,
+            is_test_question=definition.is_test_question,
+            order=first_order + len(copies),
+        ))
+    if not copies:
+        return []
+
+    Question.objects.bulk_create(copies)
+    Choice.objects.bulk_create([
+        Choice(question=copy, source_id=choice.id, text=choice.text, is_correct=choice.is_correct)
+        for copy in copies
+        for choice in definitions[copy.source_id].choices
+    ])
+    _polls_changed([(poll.id, poll.access_code)])
+    return copies
+
+
+def check_kind_change(question: Question, *, kind: str, is_test_question: bool) -> None:
+    """
+    BankError, если правка меняет тип или признак тестового вопроса, а на сам вопрос
+    или (для записи банка) на его копии уже отвечали: пересчитывать баллы и счётчики некому.
+    """
+    changed = (
+        Question.objects
+        .filter(Q(id=question.id) | Q(source_id=question.id), answer__isnull=False)
+        .exclude(kind=kind, is_test_question=is_test_question)
+    )
+    if changed.exists():
+        raise BankError(
+            "На этот вопрос уже отвечали — тип и признак тестового вопроса менять нельзя. "
+            "Создайте новый вопрос."
+        )
+
+
+def check_choice_removal(choice: Choice) -> None:
+    """BankError, если вариант записи банка уже выбирали в каком-нибудь опросе."""
+    if Choice.objects.filter(source_id=choice.id, answers__isnull=False).exists():
+        raise BankError(
+            "Этот вариант уже выбирали в опросах — удалить его нельзя, ответы участников изменились бы. "
+            "Переименуйте вариант или создайте новый вопрос."
+        )
+
+
+@transaction.atomic
+def sync_copies(question_id: int) -> int:
+    """
+    Переносит текущее определение записи банка во все её копии. Возвращает число копий.
+    Смену типа перед сохранением записи проверяет check_kind_change(), удаление
+    варианта — check_choice_removal(); если удалённый из банка вариант всё же
+    выбирали, BankError и ничего не меняется.
+    """
+    invalidate_definition(question_id)
+    definition = get_definitions([question_id]).get(question_id)
+    if definition is None:
+        return 0
+    copies = list(
+        Question.objects
+        .filter(source_id=question_id)
+        .values_list("id", "poll_id", "poll__access_code")
+    )
+    if not copies:
+        return 0
+    copy_ids = [copy_id for copy_id, _, _ in copies]
+
+    Question.objects.filter(id__in=copy_ids).update(
+        text=definition.text,
+        kind=definition.kind,
+        is_test_question=definition.is_test_question,
+    )
+
+    # Варианты, удалённые из банка (их source уже обнулён), уходят и из копий
+    bank_choice_ids = [choice.id for choice in definition.choices]
+    removed = Choice.objects.filter(question_id__in=copy_ids).exclude(source_id__in=bank_choice_ids)
+    if removed.filter(answers__isnull=False).exists():
+        raise BankError("Удалённый вариант уже выбирали в опросах — ответы участников изменились бы.")
+    removed.delete()
+
+    if definition.choices:
+        linked = Choice.objects.filter(question_id__in=copy_ids, source_id__in=bank_choice_ids)
+        linked.update(
+            text=Case(
+                *(When(source_id=choice.id, then=Value(choice.text)) for choice in definition.choices),
+                output_field=CharField(),
+            ),
+            is_correct=Case(
+                *(When(source_id=choice.id, then=Value(choice.is_correct)) for choice in definition.choices),
+                output_field=BooleanField(),
+            ),
+        )
+        existing = set(linked.values_list("question_id", "source_id"))
+        Choice.objects.bulk_create([
+            Choice(question_id=copy_id, source_id=choice.id, text=choice.text, is_correct=choice.is_correct)
+            for copy_id in copy_ids
+            for choice in definition.choices
+            if (copy_id, choice.id) not in existing
+        ])
+
+    _polls_changed((poll_id, access_code) for _, poll_id, access_code in copies)
+    return len(copies)
+
+
+@transaction.atomic
+def save_to_bank(question: Question, *, owner) -> Question:
+    """
+    Создаёт запись банка `owner` из вопроса опроса; сам вопрос становится её копией.
+    То, что видят участники, не меняется — кэши опроса не сбрасываются.
+    """
+    if question.source_id is not None:
+        raise BankError("Вопрос уже взят из банка")
+    choices = list(question.choices.order_by("id"))
+    entry = Question(
+        bank_owner=owner,
+        text=question.text,
+        kind=question.kind,
+        is_test_question=question.is_test_question,
+    )
+    entry.save()
+    bank_choices = Choice.objects.bulk_create([
+        Choice(question=entry, text=choice.text, is_correct=choice.is_correct)
+        for choice in choices
+    ])
+
+    Question.objects.filter(pk=question.pk).update(source=entry)
+    question.source = entry
+    if choices:
+        Choice.objects.filter(question=question).update(source=Case(
+            *(When(id=choice.id, then=Value(bank_choice.id)) for choice, bank_choice in zip(choices, bank_choices)),
+            default=None,
+        ))
+    return entry
+
+
+def copy_links(original: Poll, clone: Poll) -> None:
+    """
+    Ссылки на банк для копии опроса (clone_poll): вопросы и варианты копии
+    сопоставляются с оригиналом по позиции — тем же порядком, что у export_poll().
+    """
+    question_links = list(original.questions.order_by("order", "id").values_list("source_id", flat=True))
+    if not any(question_links):
+        return
+    choice_links = list(
+        Choice.objects
+        .filter(question__poll=original)
+        .exclude(question__kind=Question.Kind.TEXT)  # в документ не попадают
+        .order_by("question__order", "question_id", "id")
+        .values_list("source_id", flat=True)
+    )
+    clone_questions = list(clone.questions.order_by("order").values_list("id", flat=True))
+    clone_choices = list(
+        Choice.objects
+        .filter(question__poll=clone)
+        .order_by("question__order", "id")
+        .values_list("id", flat=True)
+    )
+    Question.objects.filter(poll=clone).update(source=Case(
+        *(When(id=qid, then=Value(source_id)) for qid, source_id in zip(clone_questions, question_links) if source_id),
+        default=None,
+    ))
+    if any(choice_links):
+        Choice.objects.filter(question__poll=clone).update(source=Case(
+            *(When(id=cid, then=Value(source_id)) for cid, source_id in zip(clone_choices, choice_links) if source_id),
+            default=None,
+        ))
+
+
+# ───── статистика ─────
+
+def item_stats(question_ids: Iterable[int]) -> dict[int, ItemStats]:
+    """
+    Сводка по записям банка во всех опросах, где есть их копии. Подписи —
+    из кэша определений, значения — три сгруппированных запроса, независимо
+    от числа опросов и записей: копии, ответившие на копии отправки
+    (отправки опроса до добавления вопроса не в счёт) и счётчики VoteCounter.
+    """
+    definitions = get_definitions(question_ids)
+    ids = list(definitions)
+    if not ids:
+        return {}
+
+    polls = dict(
+        Question.objects
+        .filter(source_id__in=ids)
+        .values("source_id")
+        .annotate(n=Count("id"))
+        .values_list("source_id", "n")
+    )
+    submissions = dict(
+        Answer.objects
+        .filter(question__source_id__in=ids)
+        .values("question__source_id")
+        .annotate(n=Count("submission_id", distinct=True))
+        .values_list("question__source_id", "n")
+    )
+    # (id записи, id варианта банка или None для текстовых ответов) → сумма по опросам
+    counts = {
+        (qid, choice_id): n
+        for qid, choice_id, n in (
+            VoteCounter.objects
+            .filter(question__source_id__in=ids)
+            .values("question__source_id", "choice__source_id")
+            .annotate(n=Sum("value"))
+            .values_list("question__source_id", "choice__source_id", "n")
+        )
+    }
+
+    result = {}
+    for qid in ids:
+        definition = definitions[qid]
+        stats = QuestionStats(id=qid, kind=definition.kind, text=definition.text)
+        if definition.kind == Question.Kind.TEXT:
+            stats.total_answers = counts.get((qid, None), 0)
+        else:
+            for choice in definition.choices:
+                count = counts.get((qid, choice.id), 0)
+                stats.choices.append(ChoiceStats(
+                    id=choice.id, text=choice.text, is_correct=choice.is_correct, count=count,
+                ))
+                stats.total_answers += count
+            denom = stats.total_answers or 1
+            for choice in stats.choices:
+                choice.percent = round(choice.count / denom * 100)
+        result[qid] = ItemStats(question=stats, polls=polls.get(qid, 0), submissions=submissions.get(qid, 0))
+    return result
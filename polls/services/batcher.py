@@ -0,0 +1,142 @@
+"""
+Групповая фиксация (group commit) отправок из параллельных запросов.
+
+Без неё каждая отправка — своя транзакция: на SQLite это своя блокировка записи
+и свой fsync. При POLLS_SUBMISSION_BATCH_WINDOW_MS > 0 запросы одного процесса
+складывают провалидированные отправки в общую пачку:
+- первый пришедший запрос становится «ведущим»: ждёт окно (несколько мс) или
+  пока пачка не наберёт POLLS_SUBMISSION_BATCH_SIZE отправок;
+- ведущий пишет всю пачку одной транзакцией (services/submissions.save_submissions),
+  остальные запросы ждут и получают каждый свой результат;
+- в записи одновременно только одна пачка процесса: пока она пишется, следующая
+  копится — чем дольше COMMIT, тем крупнее пачки;
+- не поместившиеся в пачку отправки достаются следующему ведущему — одному из их
+  же запросов, так что отдельный фоновый поток не нужен.
+
+Выигрыш есть только там, где один процесс обслуживает запросы параллельно
+(gunicorn --threads, runserver); при синхронных воркерах пачка всегда из одной
+отправки. При окне 0 (по умолчанию) — обычная запись по одной (save_submission).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable
+
+from django.conf import settings
+
+from ..models import Submission
+from .submissions import ParsedAnswer, SubmissionDraft, save_submission, save_submissions
+
+Writer = Callable[[list[SubmissionDraft]], list[Submission | Exception]]
+
+
+class _Slot:
+    """Отправка одного запроса в ожидании записи."""
+
+    __slots__ = ("draft", "done", "finished", "result", "error")
+
+    def __init__(self, draft: SubmissionDraft):
+        self.draft = draft
+        self.done = threading.Event()
+        self.finished = False
+        self.result: Submission | None = None
+        self.error: BaseException | None = None
+
+
+class SubmissionBatcher:
+    def __init__(self, window: float, max_size: int, write: Writer = save_submissions):
+        self.window = window
+        self.max_size = max(1, max_size)
+        self._write = write
+        self._cond = threading.Condition()
+        self._writing = threading.Lock()
+        self._pending: list[_Slot] = []
+        self._leading = False  # инвариант: нет ведущего ⇒ очередь пуста
+
+    def submit(self, draft: SubmissionDraft) -> Submission:
+        """
+        Блокирует до записи пачки; результат — как у save_submissions для этой отправки,
+        причина отказа (DuplicateSubmission, StaleSubmission, IntegrityError) поднимается.
+        """
+        slot = _Slot(draft)
+        with self._cond:
+            self._pending.append(slot)
+            leader = not self._leading
+            if leader:
+                self._leading = True
+            elif len(self._pending) >= self.max_size:
+                self._cond.notify()
+
+        if not leader:
+            slot.done.wait()
+        if not slot.finished:
+            # Мы первые в очереди (или нас назначил предыдущий ведущий) — пишем пачку сами
+            self._lead()
+
+        if slot.error is not None:
+            raise slot.error
+        return slot.result
+
+    def _lead(self) -> None:
+        deadline = time.monotonic() + self.window
+        # Одна пачка в записи на процесс: пока пишется предыдущая, следующая копится
+        with self._writing:
+            with self._cond:
+                while len(self._pending) < self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending[:self.max_size], self._pending[self.max_size:]
+                if self._pending:
+                    # Остаток — следующая пачка; её ведёт первый из ожидающих
+                    self._pending[0].done.set()
+                else:
+                    self._leading = False
+
+            try:
+                results = self._write([slot.draft for slot in batch])
+            except BaseException as exc:
+                for slot in batch:
+                    slot.error = exc
+            else:
+                for slot, result in zip(batch, results):
+                    if isinstance(result, Exception):
+                        slot.error = result
+                    else:
+                        slot.result = result
+        for slot in batch:
+            slot.finished = True
+            slot.done.set()
+
+
+_batcher: SubmissionBatcher | None = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher() -> SubmissionBatcher | None:
+    """Общий на процесс батчер по текущим настройкам; None — групповая фиксация выключена."""
+    global _batcher
+    window = getattr(settings, "POLLS_SUBMISSION_BATCH_WINDOW_MS", 0) / 1000
+    if window <= 0:
+        return None
+    max_size = max(1, getattr(settings, "POLLS_SUBMISSION_BATCH_SIZE", 50))
+    with _batcher_lock:
+        if _batcher is None or (_batcher.window, _batcher.max_size) != (window, max_size):
+            _batcher = SubmissionBatcher(window, max_size)
+        return _batcher
+
+
+def write_submission(poll, answers: list[ParsedAnswer], *, user=None, session_key=None) -> Submission:
+    """
+    Записывает отправку — в общей пачке, если групповая фиксация включена, иначе сразу.
+    DuplicateSubmission — участник уже прошёл опрос без повторного прохождения,
+    StaleSubmission — вопрос или вариант удалили, пока отправка ждала пачку.
+    """
+    batcher = get_batcher()
+    if batcher is None:
+        return save_submission(poll, answers, user=user, session_key=session_key)
+
+    return batcher.submit(SubmissionDraft.from_parsed(poll, answers, user=user, session_key=session_key))
@@ -0,0 +1,176 @@
+"""
+Денормализованные счётчики голосов (модель VoteCounter).
+
+Счётчики — ключи вида (question_id, choice_id):
+    (None, None)       — отправки опроса;
+    (question_id, None) — непустые текстовые ответы на вопрос;
+    (question_id, choice_id) — выборы варианта.
+
+Увеличиваются в транзакции записи отправки (save_submission),
+уменьшаются при удалении отправки (сигнал pre_delete в polls/signals.py).
+"""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+from django.db.models import Count, F, Q
+
+from ..models import Answer, Submission, VoteCounter
+
+AnswerChoice = Answer.selected_choices.through
+
+CounterKey = tuple[int | None, int | None]
+
+
+def apply_submission_delta(
+    poll_id: int,
+    text_question_ids: Iterable[int],
+    choice_pairs: Iterable[tuple[int, int]],
+    delta: int,
+) -> None:
+    """
+    Применяет ±delta ко всем счётчикам одной отправки.
+    `choice_pairs` — пары (question_id, choice_id). Два запроса при delta > 0
+    (гарантируем наличие строк + UPDATE), один — при delta < 0.
+    """
+    text_question_ids = list(text_question_ids)
+    choice_pairs = list(choice_pairs)
+
+    if delta > 0:
+        VoteCounter.objects.bulk_create(
+            [VoteCounter(poll_id=poll_id)]
+            + [VoteCounter(poll_id=poll_id, question_id=qid) for qid in text_question_ids]
+            + [VoteCounter(poll_id=poll_id, question_id=qid, choice_id=cid) for qid, cid in choice_pairs],
+            ignore_conflicts=True,
+        )
+
+    VoteCounter.objects.filter(poll_id=poll_id).filter(
+        Q(question__isnull=True)
+        | Q(question_id__in=text_question_ids, choice__isnull=True)
+        | Q(choice_id__in=[cid for _, cid in choice_pairs])
+    ).update(value=F("value") + delta)
+
+
+def apply_counter_deltas(poll_id: int, deltas: dict[CounterKey, int]) -> None:
+    """
+    Пакетный вариант apply_submission_delta: ключ счётчика → прирост
+    (например, по пачке отправок). Строки создаются одним INSERT,
+    затем по одному UPDATE на каждое различное значение прироста.
+    """
+    deltas = {key: value for key, value in deltas.items() if value}
+    if not deltas:
+        return
+    VoteCounter.objects.bulk_create(
+        [VoteCounter(poll_id=poll_id, question_id=qid, choice_id=cid) for qid, cid in deltas],
+        ignore_conflicts=True,
+    )
+    by_value: dict[int, list[CounterKey]] = {}
+    for key, value in deltas.items():
+        by_value.setdefault(value, []).append(key)
+    for value, keys in by_value.items():
+        condition = Q()
+        text_qids = [qid for qid, cid in keys if qid is not None and cid is None]
+        choice_ids = [cid for _, cid in keys if cid is not None]
+        if (None, None) in keys:
+            condition |= Q(question__isnull=True)
+        if text_qids:
+            condition |= Q(question_id__in=text_qids, choice__isnull=True)
+        if choice_ids:
+            condition |= Q(choice_id__in=choice_ids)
+        VoteCounter.objects.filter(poll_id=poll_id).filter(condition).update(value=F("value") + value)
+
+
+def forget_submission(submission: Submission) -> None:
+    """Вычитает отправку из счётчиков (вызывается до её удаления)."""
+    text_question_ids = (
+        Answer.objects
+        .filter(submission=submission)
+        .exclude(text_value="")
+        .values_list("question_id", flat=True)
+    )
+    choice_pairs = (
+        AnswerChoice.objects
+        .filter(answer__submission=submission)
+        .values_list("answer__question_id", "choice_id")
+    )
+    apply_submission_delta(submission.poll_id, text_question_ids, choice_pairs, -1)
+
+
+def submission_count(poll_id: int) -> int:
+    """Количество отправок опроса по счётчику — одна строка вместо COUNT(*)."""
+    return (
+        VoteCounter.objects
+        .filter(poll_id=poll_id, question__isnull=True)
+        .values_list("value", flat=True)
+        .first()
+    ) or 0
+
+
+def stored_counts(poll_id: int) -> dict[CounterKey, int]:
+    """Счётчики опроса из VoteCounter — один запрос, O(вариантов) строк."""
+    return {
+        (question_id, choice_id): value
+        for question_id, choice_id, value in (
+            VoteCounter.objects
+            .filter(poll_id=poll_id)
+            .values_list("question_id", "choice_id", "value")
+        )
+    }
+
+
+def raw_counts(poll_id: int) -> dict[CounterKey, int]:
+    """Те же счётчики, посчитанные заново по сырым строкам (три агрегата)."""
+    counts: dict[CounterKey, int] = {
+        (None, None): Submission.objects.filter(poll_id=poll_id).count(),
+    }
+
+    text_rows = (
+        Answer.objects
+        .filter(submission__poll_id=poll_id)
+        .exclude(text_value="")
+        .values("question_id")
+        .annotate(n=Count("id"))
+        .values_list("question_id", "n")
+    )
+    for question_id, n in text_rows:
+        counts[(question_id, None)] = n
+
+    choice_rows = (
+        AnswerChoice.objects
+        .filter(answer__submission__poll_id=poll_id)
+        .values("answer__question_id", "choice_id")
+        .annotate(n=Count("id"))
+        .values_list("answer__question_id", "choice_id", "n")
+    )
+    for question_id, choice_id, n in choice_rows:
+        counts[(question_id, choice_id)] = n
+
+    return counts
+
+
+def diff_counts(poll_id: int) -> dict[CounterKey, tuple[int, int]]:
+    """Расхождения: ключ → (в таблице счётчиков, по сырым данным). Нули не важны."""
+    stored = stored_counts(poll_id)
+    raw = raw_counts(poll_id)
+    diffs = {}
+    for key in stored.keys() | raw.keys():
+        have, want = stored.get(key, 0), raw.get(key, 0)
+        if have != want:
+            diffs[key] = (have, want)
+    return diffs
+
+
+def rebuild_counts(poll_id: int) -> int:
+    """
+    Пересобирает счётчики опроса по сырым данным. Возвращает число строк.
+    Вызывать внутри transaction.atomic(); отправки, пришедшие во время
+    пересчёта, могут потеряться — запускайте вне пиковой нагрузки.
+    """
+    raw = raw_counts(poll_id)
+    VoteCounter.objects.filter(poll_id=poll_id).delete()
+    VoteCounter.objects.bulk_create([
+        VoteCounter(poll_id=poll_id, question_id=question_id, choice_id=choice_id, value=value)
+        for (question_id, choice_id), value in raw.items()
+    ])
+    return len(raw)
@@ -0,0 +1,248 @@
+"""
+Потоковая выгрузка отправок опроса: CSV, NDJSON и XLSX.
+
+Одна строка — одна отправка, по колонке на вопрос (в порядке Question.order).
+Отправки читаются через .iterator(chunk_size=...), а ответы и выбранные варианты
+догружаются на каждую пачку двумя запросами — память постоянна при любом
+количестве отправок. XLSX пишется без сторонних библиотек: минимальный
+SpreadsheetML в zip-поток (zipfile умеет писать в поток без seek).
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import re
+import zipfile
+from itertools import islice
+from typing import Iterable, Iterator
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+
+from ..models import Answer, Question, Submission
+
+AnswerChoice = Answer.selected_choices.through
+
+EXPORT_CHUNK_SIZE = 2000
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+BASE_COLUMNS = ["submission_id", "created_at", "user", "score", "total"]
+
+
+def header(questions: list[Question]) -> list[str]:
+    return BASE_COLUMNS + [q.text for q in questions]
+
+
+def _chunks(iterable: Iterable, size: int) -> Iterator[list]:
+    it = iter(iterable)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def iter_rows(poll, questions: list[Question], *, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[list]:
+    """
+    Строки выгрузки (без заголовка). `questions` — с prefetch_related("choices").
+    На каждую пачку из chunk_size отправок — два дополнительных запроса.
+    """
+    choice_texts = {c.id: c.text for q in questions for c in q.choices.all()}
+
+    submissions = (
+        Submission.objects
+        .filter(poll=poll)
+        .select_related("user")
+        .order_by("id")
+        .iterator(chunk_size=chunk_size)
+    )
+    for chunk in _chunks(submissions, chunk_size):
+        ids = [s.id for s in chunk]
+
+        answers: dict[tuple[int, int], int] = {}
+        texts: dict[int, str] = {}
+        for answer_id, submission_id, question_id, text_value in (
+            Answer.objects
+            .filter(submission_id__in=ids)
+            .values_list("id", "submission_id", "question_id", "text_value")
+        ):
+            answers[(submission_id, question_id)] = answer_id
+            texts[answer_id] = text_value
+
+        selected: dict[int, list[str]] = {}
+        for answer_id, choice_id in (
+            AnswerChoice.objects
+            .filter(answer__submission_id__in=ids)
+            .values_list("answer_id", "choice_id")
+        ):
+            selected.setdefault(answer_id, []).append(choice_texts.get(choice_id, ""))
+
+        for sub in chunk:
+            row = [
+                sub.id,
+                timezone.localtime(sub.created_at).isoformat(),
+                sub.user.get_username() if sub.user else "",
+                sub.score,
+                sub.total,
+            ]
+            for q in questions:
+                answer_id = answers.get((sub.id, q.id))
+                if answer_id is None:
+                    row.append("")
+                elif q.kind == Question.Kind.TEXT:
+                    row.append(texts[answer_id])
+                else:
+                    row.append(", ".join(sorted(selected.get(answer_id, []))))
+            yield row
+
+
+# ───── защита от формул в ячейках ─────
+
+# С этих символов Excel/LibreOffice начинают формулу (CSV/Excel formula injection)
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def safe_cell(value):
+    """Текст участника, похожий на формулу, экранируется апострофом; числа не трогаем."""
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+# ───── CSV ─────
+
+class _Echo:
+    """Псевдо-файл для csv.writer: write() просто возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns: list[str], rows: Iterable[list]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    # BOM — чтобы Excel корректно открыл UTF-8 с кириллицей
+    yield "\ufeff" + writer.writerow([safe_cell(value) for value in columns])
+    for row in rows:
+        yield writer.writerow([safe_cell(value) for value in row])
+
+
+# ───── NDJSON ─────
+
+def stream_ndjson(questions: list[Question], rows: Iterable[list]) -> Iterator[str]:
+    keys = BASE_COLUMNS + [f"q_{q.id}" for q in questions]
+    for row in rows:
+        yield json.dumps(dict(zip(keys, row)), ensure_ascii=False) + "\n"
+
+
+# ───── XLSX ─────
+
+class _ZipStream:
+    """Файл без seek для zipfile: копит записанные байты, stream отдаёт их пачками."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._offset = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Ответы" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _xlsx_row(values: list) -> str:
+    cells = []
+    for value in values:
+        if isinstance(value, int):
+            cells.append(f"<c><v>{value}</v></c>")
+        else:
+            text = escape(_XML_ILLEGAL.sub("", str(safe_cell(value))))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return "<row>" + "".join(cells) + "</row>"
+
+
+def stream_xlsx(columns: list[str], rows: Iterable[list], *, flush_every: int = 500) -> Iterator[bytes]:
+    out = _ZipStream()
+    with zipfile.ZipFile(out, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _ROOT_RELS)
+        zf.writestr("xl/workbook.xml", _WORKBOOK)
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        yield out.drain()
+
+        with zf.open("xl/worksheets/sheet1.xml", mode="w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b"<sheetData>"
+            )
+            sheet.write(_xlsx_row(columns).encode())
+            for n, row in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(row).encode())
+                if n % flush_every == 0:
+                    yield out.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield out.drain()
+
+
+def stream_export(poll, questions: list[Question], fmt: str, *, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Генератор содержимого выгрузки в формате fmt (см. FORMATS)."""
+    rows = iter_rows(poll, questions, chunk_size=chunk_size)
+    if fmt == "csv":
+        return stream_csv(header(questions), rows)
+    if fmt == "ndjson":
+        return stream_ndjson(questions, rows)
+    if fmt == "xlsx":
+        return stream_xlsx(header(questions), rows)
+    raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
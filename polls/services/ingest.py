@@ -0,0 +1,137 @@
+"""
+Очередь приёма отправок для пиков нагрузки (POLLS_SUBMISSION_QUEUE).
+
+В этом режиме poll_public только валидирует ответы и добавляет одну строку
+в журнал PendingSubmission — воркер gunicorn сразу отвечает редиректом.
+Фоновый процесс `manage.py drain_submissions --loop` переносит журнал пачками
+в Submission/Answer/AnswerChoice (services/submissions.save_submissions)
+и удаляет перенесённые строки в той же транзакции — отправка не теряется
+и не записывается дважды.
+
+На Postgres можно запускать несколько drain-процессов (SELECT … FOR UPDATE
+SKIP LOCKED); на SQLite — один.
+
+Строка, на которой запись падает (битый payload, неожиданная ошибка), не должна
+держать очередь: пачка тогда переписывается по одной строке, а упавшие строки
+помечаются failed_at/error и дальше не берутся. Временные ошибки БД (блокировка,
+обрыв соединения) не помечают ничего — пачка откатывается и будет взята снова.
+"""
+
+from __future__ import annotations
+
+import logging
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, transaction
+from django.utils import timezone
+
+from ..models import PendingSubmission, Submission
+from .submissions import ParsedAnswer, SubmissionDraft, save_submissions
+
+logger = logging.getLogger(__name__)
+
+DRAIN_BATCH_SIZE = 200
+# Временные ошибки БД: строки не виноваты, пачку просто возьмут снова
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+
+
+def queue_enabled() -> bool:
+    return getattr(settings, "POLLS_SUBMISSION_QUEUE", False)
+
+
+def enqueue_submission(poll, answers: list[ParsedAnswer], *, user=None, session_key=None) -> PendingSubmission:
+    """Одна INSERT-строка вместо полной записи; `poll` — Poll или PollData."""
+    draft = SubmissionDraft.from_parsed(poll, answers, user=user, session_key=session_key)
+    return PendingSubmission.objects.create(
+        poll_id=poll.id,
+        user_id=draft.user_id,
+        session_key=session_key,
+        payload={
+            "single_entry": draft.single_entry,
+            "answers": [[qid, text, list(cids)] for qid, text, cids in draft.answers],
+        },
+    )
+
+
+def pending_for(poll_id: int, *, user=None, session_key=None):
+    """Ещё не записанные отправки участника в опрос."""
+    pending = PendingSubmission.objects.filter(poll_id=poll_id, failed_at__isnull=True)
+    if user is not None:
+        return pending.filter(user=user)
+    return pending.filter(user__isnull=True, session_key=session_key)
+
+
+def _to_draft(entry: PendingSubmission) -> SubmissionDraft:
+    return SubmissionDraft(
+        poll_id=entry.poll_id,
+        single_entry=entry.payload["single_entry"],
+        user_id=entry.user_id,
+        session_key=entry.session_key,
+        answers=tuple((qid, text, tuple(cids)) for qid, text, cids in entry.payload["answers"]),
+    )
+
+
+def _save_entries(entries: list[PendingSubmission]) -> tuple[list, dict[int, Exception]]:
+    """
+    Результаты save_submissions() для строк журнала и упавшие строки {id: ошибка}.
+    Сначала вся пачка разом; если она падает — по одной строке, каждая в своей точке сохранения.
+    """
+    try:
+        with transaction.atomic():
+            return save_submissions([_to_draft(entry) for entry in entries]), {}
+    except TRANSIENT_ERRORS:
+        raise
+    except Exception:  # noqa: BLE001 — ищем виноватую строку ниже
+        pass
+
+    results, failed = [], {}
+    for entry in entries:
+        try:
+            with transaction.atomic():
+                results += save_submissions([_to_draft(entry)])
+        except TRANSIENT_ERRORS:
+            raise
+        except Exception as exc:  # noqa: BLE001 — строка откладывается, очередь идёт дальше
+            logger.exception("Отправка из очереди %s не перенесена", entry.id)
+            failed[entry.id] = exc
+    return results, failed
+
+
+def drain_once(batch_size: int = DRAIN_BATCH_SIZE) -> tuple[int, int]:
+    """
+    Переносит одну пачку из журнала. Возвращает (взято из журнала, записано);
+    разница — отброшенные повторы, отправки в удалённые вопросы и строки,
+    помеченные как не перенесённые (failed_at).
+    """
+    with transaction.atomic():
+        entries = list(
+            PendingSubmission.objects
+            .select_for_update(skip_locked=True)
+            .filter(failed_at__isnull=True)
+            .order_by("id")[:batch_size]
+        )
+        if not entries:
+            return 0, 0
+        results, failed = _save_entries(entries)
+        if failed:
+            now = timezone.now()
+            PendingSubmission.objects.bulk_update(
+                [
+                    PendingSubmission(id=entry_id, failed_at=now, error=f"{type(exc).__name__}: {exc}")
+                    for entry_id, exc in failed.items()
+                ],
+                ["failed_at", "error"],
+            )
+        PendingSubmission.objects.filter(id__in=[e.id for e in entries if e.id not in failed]).delete()
+    return len(entries), sum(1 for result in results if isinstance(result, Submission))
+
+
+def drain(batch_size: int = DRAIN_BATCH_SIZE) -> tuple[int, int]:
+    """Переносит журнал до конца; возвращает суммарные (взято, записано)."""
+    taken = written = 0
+    while True:
+        batch_taken, batch_written = drain_once(batch_size)
+        if not batch_taken:
+            return taken, written
+        taken += batch_taken
+        written += batch_written
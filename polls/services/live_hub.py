@@ -0,0 +1,192 @@
+"""
+In-process хаб для live-статистики по SSE (Server-Sent Events).
+
+На каждый опрос — один «канал» с одной фоновой задачей, которая следит
+за счётчиком отправок (один дешёвый запрос раз в POLLS_LIVE_POLL_INTERVAL секунд
+или сразу после on_commit новой отправки в этом же процессе) и при изменении
+пересчитывает статистику (poll_stats) — один раз на всех подписчиков.
+
+Подписчик отправляет клиенту сначала полный снимок, затем дельты: изменившиеся
+счётчики и новый total. Дельта считается от того, что клиент уже получил,
+до последнего снимка канала, поэтому медленный клиент пропускает промежуточные
+состояния и получает сразу актуальное (коалесинг).
+
+Хаб работает внутри event loop ASGI-процесса (config.asgi); уведомления из
+синхронного кода (notify_submission) потокобезопасны.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import weakref
+from typing import AsyncIterator
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .counters import submission_count
+from .stats import poll_stats
+
+logger = logging.getLogger(__name__)
+
+CountKey = tuple[str, int]
+
+
+def poll_interval() -> float:
+    return getattr(settings, "POLLS_LIVE_POLL_INTERVAL", 1.0)
+
+
+def heartbeat_interval() -> float:
+    return getattr(settings, "POLLS_LIVE_HEARTBEAT", 15.0)
+
+
+def _flatten(stats: dict) -> dict[CountKey, int]:
+    """Счётчики из PollStats.to_dict(): ('total', 0), ('text', qid), ('choice', cid)."""
+    counts: dict[CountKey, int] = {("total", 0): stats["total_submissions"]}
+    for q in stats["questions"]:
+        if "choices" in q:
+            for c in q["choices"]:
+                counts[("choice", c["id"])] = c["count"]
+        else:
+            counts[("text", q["id"])] = q["count"]
+    return counts
+
+
+def make_delta(old: dict[CountKey, int], new: dict[CountKey, int]) -> dict:
+    delta = {"total": new[("total", 0)], "choices": {}, "text": {}}
+    for (kind, obj_id), value in new.items():
+        if kind != "total" and old.get((kind, obj_id)) != value:
+            delta["choices" if kind == "choice" else "text"][str(obj_id)] = value
+    return delta
+
+
+class PollChannel:
+    """Общий источник данных одного опроса для всех его подписчиков."""
+
+    def __init__(self, hub: "LiveHub", poll_id: int):
+        self.hub = hub
+        self.poll_id = poll_id
+        self.subscribers: set[Subscriber] = set()
+        self.stats: dict | None = None
+        self.counts: dict[CountKey, int] = {}
+        self.version = 0
+        self.ready = asyncio.Event()
+        self.wakeup = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    async def refresh(self) -> None:
+        total = await sync_to_async(submission_count)(self.poll_id)
+        if self.stats is not None and total == self.stats["total_submissions"]:
+            return
+        self.stats = (await sync_to_async(poll_stats)(self.poll_id)).to_dict()
+        self.counts = _flatten(self.stats)
+        self.version += 1
+        self.ready.set()
+        for subscriber in self.subscribers:
+            subscriber.wakeup.set()
+
+    async def run(self) -> None:
+        try:
+            while self.subscribers:
+                try:
+                    await self.refresh()
+                except Exception:
+                    # Сбой БД не должен ронять канал — попробуем на следующем тике
+                    logger.exception("live: не удалось обновить статистику опроса %s", self.poll_id)
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), poll_interval())
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+        finally:
+            self.hub.channels.pop(self.poll_id, None)
+
+
+class Subscriber:
+    def __init__(self, channel: PollChannel):
+        self.channel = channel
+        self.wakeup = asyncio.Event()
+
+    async def events(self) -> AsyncIterator[tuple[str, dict] | None]:
+        """
+        ("snapshot", stats) — при подключении и при смене структуры опроса,
+        ("delta", delta) — при новых отправках, None — heartbeat.
+        """
+        channel = self.channel
+        await channel.ready.wait()
+        sent = channel.counts
+        yield "snapshot", channel.stats
+
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), heartbeat_interval())
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            self.wakeup.clear()
+
+            current = channel.counts
+            if current is sent:
+                continue
+            if current.keys() != sent.keys():
+                yield "snapshot", channel.stats
+            else:
+                yield "delta", make_delta(sent, current)
+            sent = current
+
+
+class LiveHub:
+    """Хаб одного event loop: каналы по poll_id."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.channels: dict[int, PollChannel] = {}
+
+    def subscribe(self, poll_id: int) -> Subscriber:
+        channel = self.channels.get(poll_id)
+        if channel is None:
+            channel = self.channels[poll_id] = PollChannel(self, poll_id)
+        subscriber = Subscriber(channel)
+        channel.subscribers.add(subscriber)
+        if channel.task is None or channel.task.done():
+            channel.task = self.loop.create_task(channel.run())
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        channel = subscriber.channel
+        channel.subscribers.discard(subscriber)
+        if not channel.subscribers:
+            channel.wakeup.set()  # задача увидит пустой набор и завершится
+
+    def wake(self, poll_id: int) -> None:
+        channel = self.channels.get(poll_id)
+        if channel is not None:
+            channel.wakeup.set()
+
+
+_hubs: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, LiveHub]" = weakref.WeakKeyDictionary()
+_hubs_lock = threading.Lock()
+
+
+def get_hub() -> LiveHub:
+    """Хаб текущего event loop (вызывать из async-кода)."""
+    loop = asyncio.get_running_loop()
+    with _hubs_lock:
+        hub = _hubs.get(loop)
+        if hub is None:
+            hub = _hubs[loop] = LiveHub(loop)
+        return hub
+
+
+def notify_submission(poll_id: int) -> None:
+    """
+    Сообщает хабам процесса о новой отправке (вызывается из on_commit).
+    Потокобезопасно: будит каналы через call_soon_threadsafe.
+    """
+    with _hubs_lock:
+        hubs = list(_hubs.values())
+    for hub in hubs:
+        if poll_id in hub.channels and not hub.loop.is_closed():
+            hub.loop.call_soon_threadsafe(hub.wake, poll_id)
@@ -0,0 +1,136 @@
+"""
+Метрики запросов по имени URL (см. polls/middleware.py).
+
+Для каждого view_name ("polls:poll_public", "polls:project_stats", …) копятся
+число запросов, SQL-запросов, время в БД, в шаблонах и полное время, плюс
+гистограмма полного времени. Реестр — в памяти процесса: при нескольких
+воркерах Prometheus собирает каждый отдельно (как обычно для multi-process).
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+
+# Границы гистограммы полного времени, секунды
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_IN_LIST = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+@dataclass
+class RequestSample:
+    """Замеры одного запроса (секунды)."""
+
+    view: str
+    total: float
+    db_time: float = 0.0
+    template_time: float = 0.0
+    queries: list[str] = field(default_factory=list)
+
+    @property
+    def query_count(self) -> int:
+        return len(self.queries)
+
+    def duplicated_queries(self) -> list[tuple[str, int]]:
+        """Повторяющиеся шаблоны SQL (признак N+1), от самых частых."""
+        patterns = Counter(sql_pattern(sql) for sql in self.queries)
+        return [(pattern, n) for pattern, n in patterns.most_common() if n > 1]
+
+    def server_timing(self) -> str:
+        return ", ".join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.query_count} SQL"',
+            f"tpl;dur={self.template_time * 1000:.1f}",
+            f"total;dur={self.total * 1000:.1f}",
+        ])
+
+
+def sql_pattern(sql: str) -> str:
+    """SQL без различий в длине IN-списков и пробелах — параметры и так вынесены в %s."""
+    return _SPACES.sub(" ", _IN_LIST.sub("(%s, ...)", sql)).strip()
+
+
+@dataclass
+class _ViewStats:
+    requests: int = 0
+    queries: int = 0
+    db_seconds: float = 0.0
+    template_seconds: float = 0.0
+    total_seconds: float = 0.0
+    buckets: list[int] = field(default_factory=lambda: [0] * len(BUCKETS))
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._views: dict[str, _ViewStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, sample: RequestSample) -> None:
+        with self._lock:
+            stats = self._views.setdefault(sample.view, _ViewStats())
+            stats.requests += 1
+            stats.queries += sample.query_count
+            stats.db_seconds += sample.db_time
+            stats.template_seconds += sample.template_time
+            stats.total_seconds += sample.total
+            for i, bound in enumerate(BUCKETS):
+                if sample.total <= bound:
+                    stats.buckets[i] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._views.clear()
+
+    def render_prometheus(self) -> str:
+        """Текстовый формат экспозиции Prometheus 0.0.4."""
+        with self._lock:
+            views = {name: _copy(stats) for name, stats in sorted(self._views.items())}
+
+        lines = []
+
+        def family(name: str, kind: str, help_text: str, values) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for view, value in values:
+                lines.append(f'{name}{{view="{_escape(view)}"}} {value}')
+
+        family("polls_requests_total", "counter", "Запросов по имени URL.",
+               ((v, s.requests) for v, s in views.items()))
+        family("polls_db_queries_total", "counter", "SQL-запросов по имени URL.",
+               ((v, s.queries) for v, s in views.items()))
+        family("polls_db_seconds_total", "counter", "Время в БД, секунды.",
+               ((v, _num(s.db_seconds)) for v, s in views.items()))
+        family("polls_template_seconds_total", "counter", "Время рендеринга шаблонов, секунды.",
+               ((v, _num(s.template_seconds)) for v, s in views.items()))
+
+        lines.append("# HELP polls_request_duration_seconds Полное время обработки запроса.")
+        lines.append("# TYPE polls_request_duration_seconds histogram")
+        for view, s in views.items():
+            label = _escape(view)
+            for bound, count in zip(BUCKETS, s.buckets):
+                lines.append(f'polls_request_duration_seconds_bucket{{view="{label}",le="{bound}"}} {count}')
+            lines.append(f'polls_request_duration_seconds_bucket{{view="{label}",le="+Inf"}} {s.requests}')
+            lines.append(f'polls_request_duration_seconds_sum{{view="{label}"}} {_num(s.total_seconds)}')
+            lines.append(f'polls_request_duration_seconds_count{{view="{label}"}} {s.requests}')
+        return "\n".join(lines) + "\n"
+
+
+def _copy(stats: _ViewStats) -> _ViewStats:
+    return _ViewStats(
+        stats.requests, stats.queries, stats.db_seconds, stats.template_seconds,
+        stats.total_seconds, list(stats.buckets),
+    )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _num(value: float) -> str:
+    return f"{value:.6f}"
+
+
+registry = MetricsRegistry()
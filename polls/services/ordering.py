@@ -0,0 +1,50 @@
+"""
+Перестановка вопросов опроса одним запросом API (drag-and-drop).
+
+UniqueConstraint(poll, order) проверяется построчно (он не DEFERRABLE),
+поэтому обмен двух вопросов прямым UPDATE на полпути нарушает ограничение.
+Перестановка идёт в два UPDATE в одной транзакции, на SQLite и Postgres одинаково:
+    1) все вопросы опроса сдвигаются за пределы текущих номеров (order + offset);
+    2) один UPDATE … SET order = CASE id WHEN … THEN 1 … END ставит итоговые 1..N.
+Плюс SELECT … FOR UPDATE списка вопросов — параллельные перестановки идут по очереди.
+
+update() сигналов не шлёт — версия структуры опроса поднимается здесь же.
+"""
+
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from ..models import Poll, Question
+from .structure import bump_structure_version
+
+
+class InvalidOrder(ValueError):
+    """Список не совпадает с вопросами опроса (лишние, пропущенные или повторы)."""
+
+
+@transaction.atomic
+def reorder_questions(poll: Poll, question_ids: list[int]) -> None:
+    """Ставит вопросам порядок 1..N по `question_ids` — полному списку id вопросов опроса."""
+    rows = list(
+        Question.objects
+        .select_for_update()
+        .filter(poll=poll)
+        .values_list("id", "order")
+    )
+    current = {qid: order for qid, order in rows}
+    if len(question_ids) != len(set(question_ids)) or set(question_ids) != set(current):
+        raise InvalidOrder("Нужен полный список вопросов опроса, каждый по одному разу")
+    if [qid for qid, _ in sorted(rows, key=lambda row: row[1])] == list(question_ids):
+        return
+
+    offset = max(max(current.values()), len(question_ids)) + 1
+    questions = Question.objects.filter(poll=poll)
+    questions.update(order=F("order") + offset)
+    questions.update(order=Case(
+        *(When(id=qid, then=Value(position)) for position, qid in enumerate(question_ids, start=1)),
+        output_field=IntegerField(),
+    ))
+
+    transaction.on_commit(lambda: bump_structure_version(poll.access_code))
@@ -0,0 +1,111 @@
+"""
+Идентификация участника публичного опроса.
+
+Анонимный участник — подписанная cookie (POLLS_PARTICIPANT_COOKIE): в ней
+случайный ID участника и время старта таймера по каждому опросу. Ни одной
+записи в БД: ни строки django_session на первый GET, ни session.save()
+на старт таймера. ID пишется в Submission.session_key и по нему проверяются
+повторные прохождения.
+
+Вошедший пользователь — как и раньше, через его сессию.
+"""
+
+from __future__ import annotations
+
+import json
+import secrets
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
+
+COOKIE_SALT = "polls.participant"
+# Сколько последних таймеров держать в cookie, чтобы она не росла бесконечно
+MAX_TIMERS = 20
+
+
+def _cookie_name() -> str:
+    return getattr(settings, "POLLS_PARTICIPANT_COOKIE", "polls_participant")
+
+
+def _cookie_max_age() -> int:
+    return getattr(settings, "POLLS_PARTICIPANT_COOKIE_AGE", 365 * 24 * 60 * 60)
+
+
+class SessionParticipant:
+    """Вошедший пользователь: ключ и таймеры — в сессии, как до появления cookie-участника."""
+
+    def __init__(self, request: HttpRequest):
+        self.session = request.session
+
+    @property
+    def id(self) -> str | None:
+        return self.session.session_key
+
+    def started_at(self, poll_id: int) -> float | None:
+        return self.session.get(f"poll_start_time_{poll_id}")
+
+    def start_timer(self, poll_id: int) -> None:
+        key = f"poll_start_time_{poll_id}"
+        if key not in self.session:
+            self.session[key] = timezone.now().timestamp()
+            self.session.save()
+
+
+class CookieParticipant:
+    """Анонимный участник из подписанной cookie."""
+
+    def __init__(self, participant_id: str, timers: dict[str, float] | None = None, *, dirty: bool = False):
+        self.id = participant_id
+        self.timers = timers or {}
+        self.dirty = dirty
+
+    @classmethod
+    def from_request(cls, request: HttpRequest) -> CookieParticipant:
+        raw = request.get_signed_cookie(
+            _cookie_name(), default=None, salt=COOKIE_SALT, max_age=_cookie_max_age()
+        )
+        if raw:
+            try:
+                data = json.loads(raw)
+                return cls(str(data["id"]), {str(k): float(v) for k, v in data.get("t", {}).items()})
+            except (ValueError, KeyError, TypeError, AttributeError):
+                pass
+        return cls(secrets.token_hex(16), dirty=True)
+
+    def started_at(self, poll_id: int) -> float | None:
+        return self.timers.get(str(poll_id))
+
+    def start_timer(self, poll_id: int) -> None:
+        if str(poll_id) in self.timers:
+            return
+        self.timers[str(poll_id)] = timezone.now().timestamp()
+        if len(self.timers) > MAX_TIMERS:
+            oldest = sorted(self.timers, key=self.timers.get)[: len(self.timers) - MAX_TIMERS]
+            for key in oldest:
+                del self.timers[key]
+        self.dirty = True
+
+    def dumps(self) -> str:
+        return json.dumps({"id": self.id, "t": self.timers}, separators=(",", ":"))
+
+
+def get_participant(request: HttpRequest) -> SessionParticipant | CookieParticipant:
+    if request.user.is_authenticated:
+        return SessionParticipant(request)
+    return CookieParticipant.from_request(request)
+
+
+def remember_participant(response: HttpResponse, participant: SessionParticipant | CookieParticipant) -> HttpResponse:
+    """Ставит (обновлённую) cookie участника, если она изменилась."""
+    if isinstance(participant, CookieParticipant) and participant.dirty:
+        response.set_signed_cookie(
+            _cookie_name(),
+            participant.dumps(),
+            salt=COOKIE_SALT,
+            max_age=_cookie_max_age(),
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
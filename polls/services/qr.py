@@ -0,0 +1,192 @@
+"""
+Кэш готовых QR-кодов публичной ссылки опроса (poll_qr_png).
+
+Отрисовка через qrcode/PIL стоит десятки миллисекунд CPU, а картинка зависит
+только от ссылки, размера и формата. Поэтому кодированные байты хранятся:
+
+- в процессе — LRU, ограниченный по суммарному размеру (POLLS_QR_CACHE_BYTES);
+- опционально на диске (POLLS_QR_CACHE_DIR) — общий для всех воркеров и
+  переживает перезапуск.
+
+ETag — хэш содержимого, поэтому он одинаков во всех процессах.
+Размер — один из SIZES: произвольный ?size= не плодит файлы на диске,
+которые ничто не вытесняет (не больше len(SIZES) PNG на ссылку).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.conf import settings
+
+FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+# Допустимые размеры PNG; запрошенный округляется вверх до ближайшего
+SIZES = (128, 256, 480, 1024, 2048)
+BORDER = 4
+# Картинка для данной ссылки не меняется — браузеры и прокси могут держать её сутки
+MAX_AGE = 24 * 60 * 60
+
+
+@dataclass(frozen=True)
+class QrImage:
+    body: bytes
+    content_type: str
+    etag: str
+
+
+def parse_size(raw: str | None) -> int | None:
+    """?size= в пикселях (ValueError, если не число) → ближайший не меньший из SIZES."""
+    if raw in (None, ""):
+        return None
+    wanted = int(raw)
+    return next((size for size in SIZES if size >= wanted), SIZES[-1])
+
+
+class _ByteLRU:
+    """Потокобезопасный LRU с лимитом по сумме размеров значений."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: OrderedDict[str, QrImage] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> QrImage | None:
+        with self._lock:
+            image = self._items.get(key)
+            if image is not None:
+                self._items.move_to_end(key)
+            return image
+
+    def set(self, key: str, image: QrImage) -> None:
+        if len(image.body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old.body)
+            self._items[key] = image
+            self.size += len(image.body)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted.body)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_memory = _ByteLRU(getattr(settings, "POLLS_QR_CACHE_BYTES", 8 * 1024 * 1024))
+
+
+def _cache_key(url: str, fmt: str, size: int | None) -> str:
+    return hashlib.sha256(f"{url}\n{fmt}\n{size or ''}".encode()).hexdigest()
+
+
+def _make_image(body: bytes, fmt: str) -> QrImage:
+    return QrImage(
+        body=body,
+        content_type=FORMATS[fmt],
+        etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+    )
+
+
+def _disk_path(key: str, fmt: str) -> Path | None:
+    directory = getattr(settings, "POLLS_QR_CACHE_DIR", None)
+    if not directory:
+        return None
+    return Path(directory) / key[:2] / f"{key}.{fmt}"
+
+
+def _read_disk(path: Path | None) -> bytes | None:
+    if path is None:
+        return None
+    try:
+        return path.read_bytes()
+    except OSError:
+        return None
+
+
+def _write_disk(path: Path | None, body: bytes) -> None:
+    if path is None:
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Пишем во временный файл и переименовываем — соседний воркер не увидит половину файла
+        fd, tmp = tempfile.mkstemp(dir=path.parent)
+    except OSError:
+        return  # диск — лишь второй уровень, без него просто рендерим заново
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def render_qr(url: str, fmt: str = "png", size: int | None = None) -> bytes:
+    """Рисует QR-код. Для SVG размер не нужен — картинка векторная."""
+    import qrcode
+
+    qr = qrcode.QRCode(border=BORDER)
+    qr.add_data(url)
+    qr.make(fit=True)
+
+    if fmt == "svg":
+        from qrcode.image.svg import SvgPathImage
+
+        return qr.make_image(image_factory=SvgPathImage).to_string()
+
+    from PIL import Image
+
+    img = qr.make_image().get_image()
+    if size is not None:
+        img = img.resize((size, size), Image.NEAREST)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def get_qr_image(url: str, fmt: str = "png", size: int | None = None) -> QrImage:
+    """
+    Кодированный QR-код: из памяти, с диска или — только при промахе обоих —
+    новой отрисовкой. ImportError, если qrcode/Pillow не установлены.
+    """
+    if fmt == "svg":
+        size = None
+    key = _cache_key(url, fmt, size)
+
+    image = _memory.get(key)
+    if image is not None:
+        return image
+
+    path = _disk_path(key, fmt)
+    body = _read_disk(path)
+    if body is None:
+        body = render_qr(url, fmt, size)
+        _write_disk(path, body)
+
+    image = _make_image(body, fmt)
+    _memory.set(key, image)
+    return image
+
+
+def clear_memory_cache() -> None:
+    _memory.clear()
@@ -0,0 +1,169 @@
+"""
+Таблица ответов (project_responses) постранично, keyset-пагинацией.
+
+Страница — это N отправок, упорядоченных по (created_at, id) от новых к старым.
+На страницу уходит три запроса (отправки, ответы, выбранные варианты),
+ответы раскладываются по словарю question_id → ответ, баллы берутся
+из сохранённых Submission.score/total, а правильность ячеек — из ключа
+ответов (services/scoring.py). Память не зависит от размера опроса.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Iterator
+
+from django.conf import settings
+from django.db.models import Q
+
+from ..models import Answer, Question, Submission
+from .scoring import AnswerKey
+
+AnswerChoice = Answer.selected_choices.through
+
+MAX_PAGE_SIZE = 1000
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def default_page_size() -> int:
+    return getattr(settings, "POLLS_RESPONSES_PAGE_SIZE", 200)
+
+
+def clamp_page_size(raw) -> int:
+    """Размер страницы из GET-параметра (мусор → значение по умолчанию)."""
+    try:
+        size = int(raw)
+    except (TypeError, ValueError):
+        return default_page_size()
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(submission: Submission) -> str:
+    """Курсор «после этой отправки»: микросекунды created_at + id (без потери точности)."""
+    micros = (submission.created_at - _EPOCH) // _MICROSECOND
+    return f"{micros}-{submission.pk}"
+
+
+def decode_cursor(raw: str) -> tuple[datetime, int]:
+    """Обратное к encode_cursor. Кидает ValueError на некорректную строку."""
+    micros, _, pk = raw.partition("-")
+    return _EPOCH + timedelta(microseconds=int(micros)), int(pk)
+
+
+@dataclass(slots=True)
+class ResponsesPage:
+    rows: list[dict]
+    next_cursor: str | None
+
+
+def _empty_cell(q: Question) -> dict:
+    return {"kind": q.kind, "text": "", "is_correct": None}
+
+
+def fetch_page(
+    poll,
+    questions: list[Question],
+    answer_key: AnswerKey,
+    *,
+    page_size: int,
+    after: tuple[datetime, int] | None = None,
+    start_number: int = 1,
+) -> ResponsesPage:
+    """
+    Одна страница строк таблицы.
+    `questions` — вопросы опроса с prefetch_related("choices") (тексты вариантов берём из них).
+    """
+    qs = (
+        Submission.objects
+        .filter(poll=poll)
+        .select_related("user")
+        .order_by("-created_at", "-id")
+    )
+    if after is not None:
+        created_at, pk = after
+        qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    submissions = list(qs[:page_size])
+    if not submissions:
+        return ResponsesPage(rows=[], next_cursor=None)
+
+    submission_ids = [s.id for s in submissions]
+    answers: dict[int, dict[int, tuple[int, str]]] = {}
+    for answer_id, submission_id, question_id, text_value in (
+        Answer.objects
+        .filter(submission_id__in=submission_ids)
+        .values_list("id", "submission_id", "question_id", "text_value")
+    ):
+        answers.setdefault(submission_id, {})[question_id] = (answer_id, text_value)
+
+    selected: dict[int, list[int]] = {}
+    for answer_id, choice_id in (
+        AnswerChoice.objects
+        .filter(answer__submission_id__in=submission_ids)
+        .values_list("answer_id", "choice_id")
+    ):
+        selected.setdefault(answer_id, []).append(choice_id)
+
+    choice_texts = {c.id: c.text for q in questions for c in q.choices.all()}
+
+    rows = []
+    for number, sub in enumerate(submissions, start=start_number):
+        by_question = answers.get(sub.id, {})
+        cells = []
+        for q in questions:
+            answer = by_question.get(q.id)
+            if answer is None:
+                cells.append(_empty_cell(q))
+                continue
+            answer_id, text_value = answer
+            if q.kind == Question.Kind.TEXT:
+                cells.append({"kind": q.kind, "text": text_value.strip(), "is_correct": None})
+                continue
+            choice_ids = selected.get(answer_id, [])
+            texts = sorted(choice_texts[cid] for cid in choice_ids if cid in choice_texts)
+            cells.append({
+                "kind": q.kind,
+                "text": ", ".join(texts),
+                "is_correct": answer_key.is_correct(q.id, choice_ids) if texts else None,
+            })
+
+        if sub.total > 0:
+            score_color = "#28a745" if sub.score == sub.total else "#dc3545"
+        else:
+            score_color = "#6c757d"
+
+        rows.append({
+            "number": number,
+            "username": (sub.user.get_full_name() or sub.user.username) if sub.user else "Аноним",
+            "created_at": sub.created_at,
+            "score": sub.score,
+            "total": sub.total,
+            "score_color": score_color,
+            "cells": cells,
+        })
+
+    next_cursor = encode_cursor(submissions[-1]) if len(submissions) == page_size else None
+    return ResponsesPage(rows=rows, next_cursor=next_cursor)
+
+
+def iter_pages(
+    poll,
+    questions: list[Question],
+    answer_key: AnswerKey,
+    *,
+    page_size: int,
+) -> Iterator[ResponsesPage]:
+    """Все страницы подряд — для потоковой отдачи таблицы целиком."""
+    after = None
+    number = 1
+    while True:
+        page = fetch_page(
+            poll, questions, answer_key, page_size=page_size, after=after, start_number=number
+        )
+        if page.rows:
+            yield page
+        if page.next_cursor is None:
+            return
+        number += len(page.rows)
+        after = decode_cursor(page.next_cursor)
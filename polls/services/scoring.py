@@ -0,0 +1,115 @@
+"""
+Проверка ответов по заранее посчитанному «ключу ответов» опроса.
+
+Ключ — словарь question_id → frozenset(id правильных вариантов) только для
+проверяемых вопросов (тестовых и не TEXT). Он строится одним запросом,
+хранится в кэше Django и сбрасывается сигналами при изменении вопросов
+и вариантов (см. polls/signals.py). Сама проверка идёт в памяти, без БД.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from django.core.cache import cache
+
+from ..models import Question
+from ..routers import primary_reads
+
+ANSWER_KEY_CACHE_TIMEOUT = 60 * 60
+
+
+def answer_key_cache_key(poll_id: int) -> str:
+    return f"polls:answer_key:{poll_id}"
+
+
+@dataclass(frozen=True)
+class ScoreResult:
+    """Итог проверки одной отправки."""
+
+    score: int
+    total: int
+    # question_id → True/False (проверяемый вопрос) или None (не проверяется)
+    per_answer: dict[int, bool | None] = field(default_factory=dict)
+
+
+class AnswerKey:
+    """Ключ ответов одного опроса."""
+
+    __slots__ = ("correct",)
+
+    def __init__(self, correct: dict[int, frozenset[int]]):
+        self.correct = correct
+
+    def __contains__(self, question_id: int) -> bool:
+        return question_id in self.correct
+
+    def __len__(self) -> int:
+        return len(self.correct)
+
+    @classmethod
+    def from_questions(cls, questions: Iterable[Question]) -> "AnswerKey":
+        """Строит ключ по вопросам с prefetch_related("choices") — без запросов."""
+        return cls({
+            q.id: frozenset(c.id for c in q.choices.all() if c.is_correct)
+            for q in questions
+            if q.is_test_question and q.kind != Question.Kind.TEXT
+        })
+
+    @classmethod
+    def build(cls, poll_id: int) -> "AnswerKey":
+        """Строит ключ одним запросом (LEFT JOIN вопросов с вариантами)."""
+        rows = (
+            Question.objects
+            .filter(poll_id=poll_id, is_test_question=True)
+            .exclude(kind=Question.Kind.TEXT)
+            .values_list("id", "choices__id", "choices__is_correct")
+        )
+        correct: dict[int, set[int]] = {}
+        for question_id, choice_id, is_correct in rows:
+            ids = correct.setdefault(question_id, set())
+            if choice_id is not None and is_correct:
+                ids.add(choice_id)
+        return cls({qid: frozenset(ids) for qid, ids in correct.items()})
+
+    def is_correct(self, question_id: int, selected_ids: Iterable[int]) -> bool | None:
+        """
+        True/False — для проверяемого вопроса, None — если вопрос не проверяется.
+        Ответ верен, если выбран в точности набор правильных вариантов.
+        """
+        correct_ids = self.correct.get(question_id)
+        if correct_ids is None:
+            return None
+        return bool(correct_ids) and frozenset(selected_ids) == correct_ids
+
+    def score(self, pairs: Iterable[tuple[int, Iterable[int]]]) -> ScoreResult:
+        """Проверяет пары (question_id, selected_ids) и считает итог."""
+        score = 0
+        total = 0
+        per_answer: dict[int, bool | None] = {}
+        for question_id, selected_ids in pairs:
+            result = self.is_correct(question_id, selected_ids)
+            per_answer[question_id] = result
+            if result is None:
+                continue
+            total += 1
+            if result:
+                score += 1
+        return ScoreResult(score=score, total=total, per_answer=per_answer)
+
+
+def get_answer_key(poll_id: int) -> AnswerKey:
+    """Ключ ответов опроса из кэша (при промахе — один запрос к БД)."""
+    key = answer_key_cache_key(poll_id)
+    correct = cache.get(key)
+    if correct is None:
+        with primary_reads():
+            answer_key = AnswerKey.build(poll_id)
+        cache.set(key, answer_key.correct, ANSWER_KEY_CACHE_TIMEOUT)
+        return answer_key
+    return AnswerKey(correct)
+
+
+def invalidate_answer_key(poll_id: int) -> None:
+    cache.delete(answer_key_cache_key(poll_id))
@@ -0,0 +1,145 @@
+"""
+Общий кэшированный снимок live-статистики (live_vote_count).
+
+Снимок — готовое JSON-тело ответа и его ETag — лежит в кэше Django под ключом
+кода опроса. «Свежим» он считается POLLS_LIVE_SNAPSHOT_TTL секунд; после этого
+ровно один запрос пересобирает его (single-flight), а остальные получают
+предыдущий (слегка устаревший) снимок или, если его ещё нет, ждут пересборки.
+
+Single-flight двухуровневый: блокировка на процесс (threading.Lock) и
+блокировка на все процессы через cache.add() — работает с locmem, файловым
+кэшем, memcached и Redis. Блокировки процесса — фиксированный набор полос
+(LOCK_STRIPES), а не по блокировке на код: произвольные ?code= не копят память.
+Поток, заставший чужую пересборку при наличии старого снимка, сразу отдаёт его.
+Блокировку между процессами снимает только тот, кто её взял (сверка токена);
+не дождавшись ни снимка, ни блокировки, запрос получает SnapshotBusy (503).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ..models import Poll
+from .stats import poll_stats
+
+# Сколько живёт запись в кэше: заметно дольше TTL, чтобы было что отдать во время пересборки
+STALE_FACTOR = 30
+LOCK_TIMEOUT = 10
+WAIT_STEP = 0.02
+
+LOCK_STRIPES = 64
+
+_local_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+
+class SnapshotBusy(Exception):
+    """Снимка нет, а чужая пересборка не закончилась за LOCK_TIMEOUT."""
+
+
+def snapshot_ttl() -> float:
+    return getattr(settings, "POLLS_LIVE_SNAPSHOT_TTL", 2.0)
+
+
+@dataclass(frozen=True)
+class LiveSnapshot:
+    body: bytes
+    etag: str
+    fresh_until: float
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() < self.fresh_until
+
+
+def _cache_key(code: str) -> str:
+    return f"polls:live_snapshot:{code}"
+
+
+def _local_lock(key: str) -> threading.Lock:
+    return _local_locks[hash(key) % LOCK_STRIPES]
+
+
+def _build(code: str) -> bytes | None:
+    """Собирает JSON-тело ответа live_vote_count (None — опроса нет)."""
+    poll_id = Poll.objects.filter(access_code=code).values_list("id", flat=True).first()
+    if poll_id is None:
+        return None
+    payload = {"ok": True, **poll_stats(poll_id).to_dict()}
+    return json.dumps(payload, ensure_ascii=False).encode()
+
+
+def _store(key: str, body: bytes) -> LiveSnapshot:
+    ttl = snapshot_ttl()
+    snapshot = LiveSnapshot(
+        body=body,
+        etag='"%s"' % hashlib.sha1(body).hexdigest(),
+        fresh_until=time.time() + ttl,
+    )
+    cache.set(key, snapshot, timeout=max(ttl * STALE_FACTOR, 1))
+    return snapshot
+
+
+def get_live_snapshot(code: str) -> LiveSnapshot | None:
+    """Снимок опроса по коду доступа; None — если такого опроса нет, SnapshotBusy — см. выше."""
+    key = _cache_key(code)
+    snapshot = cache.get(key)
+    if snapshot is not None and snapshot.is_fresh:
+        return snapshot
+
+    lock = _local_lock(key)
+    if not lock.acquire(blocking=False):
+        # Пересобирает соседний поток: есть старый снимок — отдаём его, иначе ждём
+        if snapshot is not None:
+            return snapshot
+        lock.acquire()
+    try:
+        # Пока ждали блокировку, снимок мог пересобрать соседний поток
+        snapshot = cache.get(key)
+        if snapshot is not None and snapshot.is_fresh:
+            return snapshot
+
+        lock_key = f"{key}:lock"
+        token = uuid.uuid4().hex
+        if not cache.add(lock_key, token, timeout=LOCK_TIMEOUT):
+            # Пересобирает другой процесс: отдаём старый снимок или ждём новый
+            if snapshot is not None:
+                return snapshot
+            snapshot = _wait_for_rebuild(key, lock_key, token)
+            if snapshot is not None:
+                return snapshot
+
+        try:
+            body = _build(code)
+            if body is None:
+                return None
+            return _store(key, body)
+        finally:
+            # Только свою: чужая (взятая после истечения нашей) остаётся
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+    finally:
+        lock.release()
+
+
+def _wait_for_rebuild(key: str, lock_key: str, token: str) -> LiveSnapshot | None:
+    """
+    Ждёт снимок другого процесса. None — блокировка освободилась (или истекла)
+    и взята под `token`: пересобираем сами. SnapshotBusy — не дождались ни того, ни другого.
+    """
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_STEP)
+        snapshot = cache.get(key)
+        if snapshot is not None:
+            return snapshot
+        if cache.add(lock_key, token, timeout=LOCK_TIMEOUT):
+            return None
+    raise SnapshotBusy(key)
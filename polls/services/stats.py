@@ -0,0 +1,103 @@
+"""
+Статистика опроса для дашборда и live-API.
+
+Всё считается за два запроса, независимо от числа вопросов:
+    1) структура опроса — вопросы LEFT JOIN варианты одним SELECT;
+    2) значения — денормализованные счётчики VoteCounter (см. services/counters.py).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+from ..models import Question
+from .counters import stored_counts
+
+
+@dataclass(slots=True)
+class ChoiceStats:
+    id: int
+    text: str
+    is_correct: bool
+    count: int = 0
+    percent: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "text": self.text,
+            "count": self.count,
+            "percent": self.percent,
+            "is_correct": self.is_correct,
+        }
+
+
+@dataclass(slots=True)
+class QuestionStats:
+    id: int
+    kind: str
+    text: str
+    # Для TEXT — непустые текстовые ответы, для SINGLE/MULTI — сумма выборов
+    total_answers: int = 0
+    choices: list[ChoiceStats] = field(default_factory=list)
+
+    @property
+    def text_answers_count(self) -> int:
+        return self.total_answers if self.kind == Question.Kind.TEXT else 0
+
+    def to_dict(self) -> dict:
+        if self.kind == Question.Kind.TEXT:
+            return {"id": self.id, "kind": self.kind, "text": self.text, "count": self.total_answers}
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "text": self.text,
+            "total": self.total_answers,
+            "choices": [c.to_dict() for c in self.choices],
+        }
+
+
+@dataclass(slots=True)
+class PollStats:
+    total_submissions: int
+    questions: list[QuestionStats]
+
+    def to_dict(self) -> dict:
+        return {
+            "total_submissions": self.total_submissions,
+            "questions": [q.to_dict() for q in self.questions],
+        }
+
+
+def poll_stats(poll_id: int) -> PollStats:
+    """Собирает статистику опроса (два запроса к БД)."""
+    counts = stored_counts(poll_id)
+
+    rows = (
+        Question.objects
+        .filter(poll_id=poll_id)
+        .order_by("order", "id", "choices__id")
+        .values_list("id", "kind", "text", "choices__id", "choices__text", "choices__is_correct")
+    )
+
+    questions: list[QuestionStats] = []
+    by_id: dict[int, QuestionStats] = {}
+    for question_id, kind, text, choice_id, choice_text, is_correct in rows:
+        q = by_id.get(question_id)
+        if q is None:
+            q = by_id[question_id] = QuestionStats(id=question_id, kind=kind, text=text)
+            questions.append(q)
+            if kind == Question.Kind.TEXT:
+                q.total_answers = counts.get((question_id, None), 0)
+        if choice_id is None or kind == Question.Kind.TEXT:
+            continue
+        count = counts.get((question_id, choice_id), 0)
+        q.choices.append(ChoiceStats(id=choice_id, text=choice_text, is_correct=is_correct, count=count))
+        q.total_answers += count
+
+    for q in questions:
+        denom = q.total_answers or 1
+        for c in q.choices:
+            c.percent = round(c.count / denom * 100)
+
+    return PollStats(total_submissions=counts.get((None, None), 0), questions=questions)
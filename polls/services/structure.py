@@ -0,0 +1,170 @@
+"""
+Версионированный кэш структуры опроса для публичной страницы /p/<code>/.
+
+Структура — метаданные опроса, вопросы и варианты — хранится в кэше Django
+как обычные кортежи (NamedTuple) под ключом с версией опроса. Версию поднимают
+сигналы post_save/post_delete на Poll, Question и Choice (polls/signals.py),
+поэтому старые записи просто перестают читаться и вытесняются сами.
+
+Кортежи повторяют интерфейс моделей, которым пользуются публичная форма,
+collect_answers() и AnswerKey.from_questions(): question.choices.all() и т.п.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import NamedTuple
+
+from django.core.cache import cache
+
+from ..models import Poll, Question
+from ..routers import primary_reads
+
+STRUCTURE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class ChoiceList(tuple):
+    """Кортеж вариантов с .all() — как у prefetch-менеджера модели."""
+
+    def all(self):
+        return self
+
+
+class ChoiceData(NamedTuple):
+    id: int
+    text: str
+    is_correct: bool
+
+
+class QuestionData(NamedTuple):
+    id: int
+    text: str
+    kind: str
+    order: int
+    is_test_question: bool
+    choices: ChoiceList
+
+
+class PollData(NamedTuple):
+    id: int
+    title: str
+    description: str
+    access_code: str
+    allow_multiple_submissions: bool
+    time_limit_minutes: int | None
+
+    # Те же помощники, что у модели Poll — шаблоны работают без изменений
+    @property
+    def pk(self) -> int:
+        return self.id
+
+    @property
+    def has_time_limit(self) -> bool:
+        return bool(self.time_limit_minutes)
+
+    @property
+    def time_limit_in_seconds(self) -> int:
+        return self.time_limit_minutes * 60 if self.has_time_limit else 0
+
+    def get_time_limit_display(self) -> str:
+        return f"{self.time_limit_minutes} мин" if self.has_time_limit else "Без ограничения"
+
+    def __str__(self) -> str:
+        return self.title
+
+
+class PollStructure(NamedTuple):
+    version: int
+    poll: PollData
+    questions: tuple[QuestionData, ...]
+
+
+# ───── версии ─────
+
+def _version_key(access_code: str) -> str:
+    return f"polls:structure_version:{access_code}"
+
+
+def _structure_key(access_code: str, version: int) -> str:
+    return f"polls:structure:{access_code}:{version}"
+
+
+def get_structure_version(access_code: str) -> int:
+    key = _version_key(access_code)
+    version = cache.get(key)
+    if version is None:
+        # Стартуем с времени, а не с 1: после вытеснения ключа версии
+        # старые записи структуры не должны снова стать «актуальными»
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key, time.time_ns())
+    return version
+
+
+def bump_structure_version(access_code: str) -> None:
+    key = _version_key(access_code)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+# ───── сборка ─────
+
+def build_structure(access_code: str, version: int) -> PollStructure | None:
+    """Два запроса: опрос и вопросы LEFT JOIN варианты."""
+    row = (
+        Poll.objects
+        .filter(access_code=access_code)
+        .values_list(
+            "id", "title", "description", "access_code",
+            "allow_multiple_submissions", "time_limit_minutes",
+        )
+        .first()
+    )
+    if row is None:
+        return None
+    poll = PollData(*row)
+
+    rows = (
+        Question.objects
+        .filter(poll_id=poll.id)
+        .order_by("order", "id", "choices__text", "choices__id")
+        .values_list(
+            "id", "text", "kind", "order", "is_test_question",
+            "choices__id", "choices__text", "choices__is_correct",
+        )
+    )
+    questions: dict[int, tuple[tuple, list[ChoiceData]]] = {}
+    for qid, text, kind, order, is_test, choice_id, choice_text, is_correct in rows:
+        entry = questions.setdefault(qid, ((qid, text, kind, order, is_test), []))
+        if choice_id is not None:
+            entry[1].append(ChoiceData(choice_id, choice_text, is_correct))
+
+    return PollStructure(
+        version=version,
+        poll=poll,
+        questions=tuple(
+            QuestionData(*fields, choices=ChoiceList(choices))
+            for fields, choices in questions.values()
+        ),
+    )
+
+
+def get_poll_structure(access_code: str) -> PollStructure | None:
+    """Структура опроса из кэша (при промахе — два запроса). None — опроса нет."""
+    if cache.get(_version_key(access_code)) is None:
+        # Ключ версии бессрочный — заводим его только для существующего опроса,
+        # иначе запросы к /p/<случайный код>/ копили бы ключи в кэше
+        with primary_reads():
+            if not Poll.objects.filter(access_code=access_code).exists():
+                return None
+    version = get_structure_version(access_code)
+    key = _structure_key(access_code, version)
+    structure = cache.get(key)
+    if structure is None:
+        with primary_reads():
+            structure = build_structure(access_code, version)
+        if structure is None:
+            return None
+        cache.set(key, structure, STRUCTURE_CACHE_TIMEOUT)
+    return structure
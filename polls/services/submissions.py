@@ -0,0 +1,325 @@
+"""
+Запись отправок (Submission) одним пакетом.
+
+Варианты ответов проверяются по уже загруженным (prefetch) вопросам в памяти,
+а сама отправка пишется фиксированным числом запросов, независимо от длины опроса:
+    1) INSERT Submission (score/total посчитаны заранее);
+    2) bulk_create Answer;
+    3) bulk_create строк связи Answer ↔ Choice (AnswerChoice);
+    4) обновление счётчиков голосов VoteCounter (см. services/counters.py).
+
+save_submissions() пишет так же целую пачку отправок (SubmissionDraft) одной
+транзакцией — для очереди приёма (services/ingest.py).
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from ..models import Answer, Choice, Question, Submission
+from .counters import CounterKey, apply_counter_deltas, apply_submission_delta
+from .live_hub import notify_submission
+from .scoring import AnswerKey, get_answer_key
+
+logger = logging.getLogger(__name__)
+
+# Автоматическая through-модель M2M Answer.selected_choices
+AnswerChoice = Answer.selected_choices.through
+
+
+class DuplicateSubmission(Exception):
+    """Участник уже отправил ответы в опрос без повторного прохождения."""
+
+
+class StaleSubmission(Exception):
+    """Вопрос или вариант из отправки удалён, пока отправка ждала записи."""
+
+
+@dataclass(frozen=True)
+class ParsedAnswer:
+    """Провалидированный ответ на один вопрос (ещё не сохранён в БД)."""
+
+    question: Question  # или QuestionData из кэша структуры
+    text_value: str = ""
+    choice_ids: tuple[int, ...] = field(default=())
+
+
+def _parse_ids(raw_values) -> list[int]:
+    ids = []
+    for raw in raw_values:
+        raw = (raw or "").strip()
+        if raw.isdigit():
+            ids.append(int(raw))
+    return ids
+
+
+def collect_answers(questions, data) -> tuple[list[ParsedAnswer], list[dict]]:
+    """
+    Разбирает POST-данные формы опроса.
+
+    `questions` — вопросы с prefetch_related("choices") или кэшированная структура
+    опроса (services/structure.py): проверка ID вариантов идёт в памяти, без БД.
+    Возвращает (answers, errors) в формате, который ожидает шаблон poll_public.
+    """
+    answers: list[ParsedAnswer] = []
+    errors: list[dict] = []
+
+    for q in questions:
+        field_name = f"q_{q.id}"
+        valid_ids = {c.id for c in q.choices.all()}
+
+        if q.kind == Question.Kind.TEXT:
+            text_value = (data.get(field_name) or "").strip()
+            if not text_value:
+                errors.append({"question_id": q.id, "message": "Введите ответ"})
+            else:
+                answers.append(ParsedAnswer(question=q, text_value=text_value))
+
+        elif q.kind == Question.Kind.SINGLE:
+            choice_id = data.get(field_name)
+            if not choice_id or not choice_id.isdigit():
+                errors.append({"question_id": q.id, "message": "Выберите один вариант"})
+            elif int(choice_id) not in valid_ids:
+                errors.append({"question_id": q.id, "message": "Некорректный вариант"})
+            else:
+                answers.append(ParsedAnswer(question=q, choice_ids=(int(choice_id),)))
+
+        elif q.kind == Question.Kind.MULTI:
+            raw_ids = data.getlist(field_name)
+            if not raw_ids:
+                errors.append({"question_id": q.id, "message": "Выберите хотя бы один"})
+                continue
+            # dict.fromkeys — убираем дубли, сохраняя порядок
+            choice_ids = tuple(dict.fromkeys(i for i in _parse_ids(raw_ids) if i in valid_ids))
+            if not choice_ids:
+                errors.append({"question_id": q.id, "message": "Некорректные варианты"})
+            else:
+                answers.append(ParsedAnswer(question=q, choice_ids=choice_ids))
+
+    return answers, errors
+
+
+def save_submission(
+    poll,
+    answers: list[ParsedAnswer],
+    *,
+    user=None,
+    session_key: str | None = None,
+) -> Submission:
+    """
+    Сохраняет отправку целиком в одной транзакции.
+    Число запросов не зависит от количества вопросов.
+    `poll` — модель Poll или PollData из кэша структуры (нужны id и allow_multiple_submissions).
+
+    Если повторное прохождение запрещено, единственность отправки участника
+    гарантирует частичный уникальный индекс — при гонке параллельных POST
+    проигравшие получают DuplicateSubmission.
+    """
+    # Ключ строится по prefetch-вариантам тех же вопросов — без запросов к БД
+    answer_key = AnswerKey.from_questions(parsed.question for parsed in answers)
+    result = answer_key.score((parsed.question.id, parsed.choice_ids) for parsed in answers)
+
+    with transaction.atomic():
+        try:
+            submission = Submission.objects.create(
+                poll_id=poll.id,
+                user=user,
+                session_key=session_key,
+                score=result.score,
+                total=result.total,
+                single_entry=not poll.allow_multiple_submissions,
+            )
+        except IntegrityError as exc:
+            if poll.allow_multiple_submissions:
+                raise
+            raise DuplicateSubmission from exc
+
+        answer_objs = Answer.objects.bulk_create([
+            Answer(submission=submission, question_id=parsed.question.id, text_value=parsed.text_value)
+            for parsed in answers
+        ])
+
+        links = [
+            AnswerChoice(answer_id=answer.id, choice_id=choice_id)
+            for answer, parsed in zip(answer_objs, answers)
+            for choice_id in parsed.choice_ids
+        ]
+        if links:
+            AnswerChoice.objects.bulk_create(links)
+
+        apply_submission_delta(
+            poll.id,
+            text_question_ids=[p.question.id for p in answers if p.text_value],
+            choice_pairs=[(p.question.id, cid) for p in answers for cid in p.choice_ids],
+            delta=1,
+        )
+
+        # Live-подписчики этого процесса узнают о новой отправке сразу после COMMIT
+        transaction.on_commit(lambda: notify_submission(poll.id))
+
+    return submission
+
+
+@dataclass(frozen=True)
+class SubmissionDraft:
+    """Провалидированная отправка для пакетной записи: только id, без объектов моделей."""
+
+    poll_id: int
+    single_entry: bool
+    user_id: int | None
+    session_key: str | None
+    # (question_id, text_value, (choice_id, ...))
+    answers: tuple[tuple[int, str, tuple[int, ...]], ...]
+
+    @classmethod
+    def from_parsed(cls, poll, answers: list[ParsedAnswer], *, user=None, session_key=None) -> "SubmissionDraft":
+        return cls(
+            poll_id=poll.id,
+            single_entry=not poll.allow_multiple_submissions,
+            user_id=user.pk if user is not None else None,
+            session_key=session_key,
+            answers=tuple((p.question.id, p.text_value, tuple(p.choice_ids)) for p in answers),
+        )
+
+    @property
+    def participant(self) -> tuple:
+        if self.user_id is not None:
+            return (self.poll_id, "user", self.user_id)
+        return (self.poll_id, "session", self.session_key)
+
+
+def save_submissions(drafts: list[SubmissionDraft]) -> list[Submission | Exception]:
+    """
+    Пишет пачку отправок одной транзакцией: по одному bulk INSERT на Submission,
+    Answer и AnswerChoice плюс обновление счётчиков по каждому опросу пачки.
+
+    Возвращает список той же длины: Submission или причина, по которой отправка
+    не записана, — DuplicateSubmission (повтор участника в опросе без повторного
+    прохождения, в пачке или в БД), StaleSubmission (ответ на удалённый вопрос
+    или вариант) либо IntegrityError любого другого нарушения целостности.
+    """
+    drafts = list(drafts)
+    results: list[Submission | Exception] = [None] * len(drafts)
+
+    seen = _existing_single_entries(drafts)
+    alive = _alive_ids(drafts)
+    accepted = []
+    for i, draft in enumerate(drafts):
+        if not all((qid, None) in alive and all((qid, cid) in alive for cid in cids) for qid, _, cids in draft.answers):
+            # Вопрос или вариант удалили, пока отправка ждала записи. На SQLite внешние ключи
+            # проверяются только при COMMIT, так что ловить IntegrityError было бы поздно.
+            logger.warning("Отправка в опрос %s не записана: вопрос или вариант удалён", draft.poll_id)
+            results[i] = StaleSubmission()
+            continue
+        if draft.single_entry:
+            if draft.participant in seen:
+                results[i] = DuplicateSubmission()
+                continue
+            seen.add(draft.participant)
+        accepted.append(i)
+    if not accepted:
+        return results
+
+    try:
+        with transaction.atomic():
+            saved = _write_drafts([drafts[i] for i in accepted])
+    except IntegrityError:
+        # Кто-то прошёл мимо проверки (параллельная запись) — пишем по одной, чтобы не терять остальных
+        saved = []
+        for i in accepted:
+            try:
+                with transaction.atomic():
+                    saved += _write_drafts([drafts[i]])
+            except IntegrityError as exc:
+                saved.append(_rejection(drafts[i], exc))
+
+    for i, submission in zip(accepted, saved):
+        results[i] = submission
+    return results
+
+
+def _rejection(draft: SubmissionDraft, exc: IntegrityError) -> Exception:
+    """Причина отказа для отправки, не прошедшей по целостности при записи по одной."""
+    if draft.single_entry and draft.participant in _existing_single_entries([draft]):
+        # Параллельный процесс записал того же участника между проверкой и INSERT
+        return DuplicateSubmission()
+    logger.warning("Отправка в опрос %s не записана: нарушение целостности", draft.poll_id)
+    return exc
+
+
+def _existing_single_entries(drafts: list[SubmissionDraft]) -> set[tuple]:
+    singles = [d for d in drafts if d.single_entry]
+    if not singles:
+        return set()
+    rows = (
+        Submission.objects
+        .filter(single_entry=True, poll_id__in={d.poll_id for d in singles})
+        .filter(
+            Q(user_id__in={d.user_id for d in singles if d.user_id is not None})
+            | Q(user__isnull=True, session_key__in={d.session_key for d in singles if d.user_id is None})
+        )
+        .values_list("poll_id", "user_id", "session_key")
+    )
+    return {
+        (poll_id, "user", user_id) if user_id is not None else (poll_id, "session", session_key)
+        for poll_id, user_id, session_key in rows
+    }
+
+
+def _alive_ids(drafts: list[SubmissionDraft]) -> set[CounterKey]:
+    """Существующие (question_id, None) и (question_id, choice_id) опросов пачки."""
+    poll_ids = {d.poll_id for d in drafts}
+    alive: set[CounterKey] = {(qid, None) for qid in Question.objects.filter(poll_id__in=poll_ids).values_list("id", flat=True)}
+    alive.update(Choice.objects.filter(question__poll_id__in=poll_ids).values_list("question_id", "id"))
+    return alive
+
+
+def _write_drafts(drafts: list[SubmissionDraft]) -> list[Submission]:
+    answer_keys = {poll_id: get_answer_key(poll_id) for poll_id in {d.poll_id for d in drafts}}
+
+    submissions = []
+    for draft in drafts:
+        result = answer_keys[draft.poll_id].score((qid, cids) for qid, _, cids in draft.answers)
+        submissions.append(Submission(
+            poll_id=draft.poll_id,
+            user_id=draft.user_id,
+            session_key=draft.session_key,
+            score=result.score,
+            total=result.total,
+            single_entry=draft.single_entry,
+        ))
+    Submission.objects.bulk_create(submissions)
+
+    answers = Answer.objects.bulk_create([
+        Answer(submission_id=submission.id, question_id=qid, text_value=text)
+        for submission, draft in zip(submissions, drafts)
+        for qid, text, _ in draft.answers
+    ])
+    rows = [row for draft in drafts for row in draft.answers]
+    links = [
+        AnswerChoice(answer_id=answer.id, choice_id=cid)
+        for answer, (_, _, choice_ids) in zip(answers, rows)
+        for cid in choice_ids
+    ]
+    if links:
+        AnswerChoice.objects.bulk_create(links)
+
+    deltas: dict[int, Counter[CounterKey]] = {}
+    for draft in drafts:
+        poll_deltas = deltas.setdefault(draft.poll_id, Counter())
+        poll_deltas[(None, None)] += 1
+        for qid, text, choice_ids in draft.answers:
+            if text:
+                poll_deltas[(qid, None)] += 1
+            for cid in choice_ids:
+                poll_deltas[(qid, cid)] += 1
+    for poll_id, poll_deltas in deltas.items():
+        apply_counter_deltas(poll_id, poll_deltas)
+        transaction.on_commit(lambda poll_id=poll_id: notify_submission(poll_id))
+
+    return submissions
@@ -0,0 +1,179 @@
+"""
+Перенос опроса целиком: выгрузка в JSON, загрузка из JSON и копирование.
+
+Формат (FORMAT) — метаданные опроса и вопросы с вариантами, без отправок:
+    {"format": "polls/1",
+     "poll": {"title", "description", "allow_multiple_submissions", "time_limit_minutes"},
+     "questions": [{"text", "kind", "order", "is_test_question",
+                    "choices": [{"text", "is_correct"}, ...]}, ...]}
+
+Загрузка сначала проверяет весь документ в памяти (те же правила, что у форм:
+длина полей, тип вопроса, TEXT не бывает тестовым и не имеет вариантов,
+правильные варианты — только у тестовых вопросов), затем пишет фиксированным
+числом запросов, независимо от длины опроса: INSERT Poll, bulk_create Question,
+bulk_create Choice (на SQLite bulk_create режется на пачки по лимиту параметров).
+Порядок вопросов сохраняется и перенумеровывается 1..N — unique_order_per_poll
+не нарушается даже для файлов с пропусками или повторами в order.
+Выгрузка пишет то, что действует: без вариантов у TEXT и без is_correct
+у нетестовых вопросов (остатки после смены типа формой), — так копия
+такого опроса тоже проходит проверку.
+
+bulk_create сигналов не шлёт; для нового опроса сбрасывать нечего — кэши
+структуры и ключа ответов для него ещё пусты.
+"""
+
+from __future__ import annotations
+
+from django.db import transaction
+
+from ..models import Choice, Poll, Question
+from .bank import copy_links
+
+FORMAT = "polls/1"
+# Ограничения на загружаемый документ
+MAX_QUESTIONS = 1000
+MAX_CHOICES_PER_QUESTION = 100
+
+
+class PollImportError(ValueError):
+    """Документ не подходит для загрузки; текст — для показа владельцу."""
+
+
+def export_poll(poll: Poll) -> dict:
+    """Документ опроса; два запроса — вопросы и варианты (prefetch)."""
+    questions = poll.questions.prefetch_related("choices").order_by("order", "id")
+    return {
+        "format": FORMAT,
+        "poll": {
+            "title": poll.title,
+            "description": poll.description,
+            "allow_multiple_submissions": poll.allow_multiple_submissions,
+            "time_limit_minutes": poll.time_limit_minutes,
+        },
+        "questions": [
+            {
+                "text": q.text,
+                "kind": q.kind,
+                "order": q.order,
+                "is_test_question": q.is_test_question,
+                "choices": [
+                    {"text": c.text, "is_correct": c.is_correct and q.is_test_question}
+                    for c in sorted(q.choices.all(), key=lambda c: c.id)
+                ] if q.kind != Question.Kind.TEXT else [],
+            }
+            for q in questions
+        ],
+    }
+
+
+def _field(data: dict, name: str, kind, where: str, *, default=None, required: bool = False):
+    if name not in data or data[name] is None:
+        if required:
+            raise PollImportError(f"{where}: нет поля «{name}»")
+        return default
+    value = data[name]
+    if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+        raise PollImportError(f"{where}: неверный тип поля «{name}»")
+    return value
+
+
+def _text(data: dict, name: str, model, where: str, *, required: bool = True) -> str:
+    value = _field(data, name, str, where, default="", required=required).strip()
+    max_length = model._meta.get_field(name).max_length
+    if required and not value:
+        raise PollImportError(f"{where}: пустое поле «{name}»")
+    if max_length and len(value) > max_length:
+        raise PollImportError(f"{where}: «{name}» длиннее {max_length} символов")
+    return value
+
+
+def _parse(document) -> tuple[Poll, list[tuple[Question, list[Choice]]]]:
+    """Проверяет документ целиком и строит несохранённые объекты."""
+    if not isinstance(document, dict) or document.get("format") != FORMAT:
+        raise PollImportError(f"Ожидается документ формата {FORMAT}")
+    meta = _field(document, "poll", dict, "Документ", required=True)
+    time_limit = _field(meta, "time_limit_minutes", int, "Опрос")
+    if time_limit is not None and time_limit < 1:
+        raise PollImportError("Опрос: ограничение времени должно быть не меньше минуты")
+    poll = Poll(
+        title=_text(meta, "title", Poll, "Опрос"),
+        description=_text(meta, "description", Poll, "Опрос", required=False),
+        allow_multiple_submissions=_field(meta, "allow_multiple_submissions", bool, "Опрос", default=False),
+        time_limit_minutes=time_limit,
+    )
+
+    raw_questions = _field(document, "questions", list, "Документ", default=[])
+    if len(raw_questions) > MAX_QUESTIONS:
+        raise PollImportError(f"Слишком много вопросов: больше {MAX_QUESTIONS}")
+
+    parsed = []
+    for index, raw in enumerate(raw_questions):
+        where = f"Вопрос {index + 1}"
+        if not isinstance(raw, dict):
+            raise PollImportError(f"{where}: ожидается объект")
+        kind = _field(raw, "kind", str, where, default=Question.Kind.TEXT)
+        if kind not in Question.Kind.values:
+            raise PollImportError(f"{where}: неизвестный тип «{kind}»")
+        is_test = _field(raw, "is_test_question", bool, where, default=False)
+        if kind == Question.Kind.TEXT and is_test:
+            raise PollImportError(f"{where}: текстовый вопрос не может быть тестовым")
+        order = _field(raw, "order", int, where, default=index + 1)
+
+        raw_choices = _field(raw, "choices", list, where, default=[])
+        if kind == Question.Kind.TEXT and raw_choices:
+            raise PollImportError(f"{where}: у текстового вопроса не бывает вариантов")
+        if len(raw_choices) > MAX_CHOICES_PER_QUESTION:
+            raise PollImportError(f"{where}: больше {MAX_CHOICES_PER_QUESTION} вариантов")
+        choices = []
+        for choice_index, raw_choice in enumerate(raw_choices):
+            choice_where = f"{where}, вариант {choice_index + 1}"
+            if not isinstance(raw_choice, dict):
+                raise PollImportError(f"{choice_where}: ожидается объект")
+            is_correct = _field(raw_choice, "is_correct", bool, choice_where, default=False)
+            if is_correct and not is_test:
+                raise PollImportError(f"{choice_where}: правильный вариант бывает только у тестового вопроса")
+            choices.append(Choice(text=_text(raw_choice, "text", Choice, choice_where), is_correct=is_correct))
+
+        question = Question(text=_text(raw, "text", Question, where), kind=kind, is_test_question=is_test)
+        parsed.append(((order, index), question, choices))
+
+    # Порядок из файла, но без пропусков и повторов — иначе unique_order_per_poll
+    parsed.sort(key=lambda item: item[0])
+    result = []
+    for position, (_, question, choices) in enumerate(parsed, start=1):
+        question.order = position
+        result.append((question, choices))
+    return poll, result
+
+
+@transaction.atomic
+def import_poll(document, *, owner, title: str | None = None) -> Poll:
+    """Создаёт опрос из документа export_poll(); PollImportError — документ не годится."""
+    poll, questions = _parse(document)
+    poll.owner = owner
+    if title:
+        poll.title = title[:Poll._meta.get_field("title").max_length]
+    poll.save()
+
+    for question, _ in questions:
+        question.poll = poll
+    Question.objects.bulk_create([question for question, _ in questions])
+
+    choices = []
+    for question, question_choices in questions:
+        for choice in question_choices:
+            choice.question = question
+            choices.append(choice)
+    Choice.objects.bulk_create(choices)
+    return poll
+
+
+@transaction.atomic
+def clone_poll(poll: Poll, *, owner, title: str | None = None) -> Poll:
+    """
+    Копия опроса без отправок — через тот же документ, что и выгрузка.
+    Вопросы из банка остаются связаны с банком (в документ ссылки не попадают).
+    """
+    clone = import_poll(export_poll(poll), owner=owner, title=title or f"{poll.title} (копия)")
+    copy_links(poll, clone)
+    return clone
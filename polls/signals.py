@@ -0,0 +1,92 @@
+"""
+Сигналы приложения опросов: сброс производных данных (кэшей)
+при изменении опросов, вопросов и вариантов ответов.
+
+Сброс идёт дважды: сразу — чтобы своя транзакция (и откатываемые TestCase)
+не читала устаревший кэш, — и ещё раз в transaction.on_commit, после фиксации:
+иначе параллельный запрос успеет собрать старую структуру под новой версией.
+Важно: bulk_create/update() сигналы не отправляют — код, который
+меняет вопросы/варианты пакетно, должен сбрасывать кэши сам.
+"""
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Choice, Poll, Question, Submission
+from .services.bank import invalidate_definition
+from .services.counters import forget_submission
+from .services.scoring import invalidate_answer_key
+from .services.structure import bump_structure_version
+
+
+def _poll_ref_for_question(question: Question) -> tuple[int | None, str | None]:
+    if question.poll_id is None:
+        # Запись банка вопросов
+        return None, None
+    if Question.poll.is_cached(question):
+        return question.poll_id, question.poll.access_code
+    access_code = Poll.objects.filter(pk=question.poll_id).values_list("access_code", flat=True).first()
+    return question.poll_id, access_code
+
+
+def _poll_ref_for_choice(choice: Choice) -> tuple[int, str | None] | None:
+    if Choice.question.is_cached(choice):
+        return _poll_ref_for_question(choice.question)
+    return (
+        Question.objects
+        .filter(pk=choice.question_id)
+        .values_list("poll_id", "poll__access_code")
+        .first()
+    )
+
+
+def _poll_structure_changed(poll_ref: tuple[int, str | None] | None) -> None:
+    if poll_ref is None:
+        return
+    poll_id, access_code = poll_ref
+
+    def reset():
+        invalidate_answer_key(poll_id)
+        if access_code:
+            bump_structure_version(access_code)
+
+    reset()
+    transaction.on_commit(reset)
+
+
+@receiver(post_save, sender=Poll)
+@receiver(post_delete, sender=Poll)
+def poll_changed(sender, instance: Poll, **kwargs):
+    access_code = instance.access_code
+    bump_structure_version(access_code)
+    transaction.on_commit(lambda: bump_structure_version(access_code))
+
+
+def _question_changed(question_id: int, poll_ref: tuple[int | None, str | None] | None) -> None:
+    if poll_ref is not None and poll_ref[0] is None:
+        # Изменилась запись банка: общее определение; копии обновляет services/bank.sync_copies
+        invalidate_definition(question_id)
+        return
+    _poll_structure_changed(poll_ref)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance: Question, **kwargs):
+    _question_changed(instance.id, _poll_ref_for_question(instance))
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def choice_changed(sender, instance: Choice, **kwargs):
+    _question_changed(instance.question_id, _poll_ref_for_choice(instance))
+
+
+@receiver(pre_delete, sender=Submission)
+def submission_deleting(sender, instance: Submission, origin=None, **kwargs):
+    # При удалении всего опроса счётчики удалятся каскадом — пересчитывать нечего
+    if isinstance(origin, Poll) or (isinstance(origin, QuerySet) and origin.model is Poll):
+        return
+    forget_submission(instance)
@@ -1,23 +1,129 @@
 from __future__ import annotations
 
+import asyncio
+import csv
+import dataclasses
+import io
+import json
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, IntegrityError, connection, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.http import QueryDict, StreamingHttpResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    ACCESS_CODE_LENGTH,
+    Answer,
+    Choice,
+    PendingSubmission,
+    Poll,
+    Question,
+    Submission,
+    VoteCounter,
+)
+from .services.bank import BankError, add_to_poll, get_definitions, item_stats, save_to_bank, sync_copies
+from .services.counters import diff_counts, stored_counts
+from .services.export import iter_rows
+from .routers import ReadReplicaRouter, primary_reads, reads_from_replica, replica_reads
+from .services.access_codes import bulk_create_polls, reserve_access_codes
+from .services.batcher import SubmissionBatcher, get_batcher, write_submission
+from .services.ingest import drain_once, enqueue_submission, pending_for
+from .services.live_hub import get_hub
+from .services.metrics import RequestSample, registry as metrics_registry
+from .services import snapshots as snapshots_module
+from .services.snapshots import (
+    SnapshotBusy,
+    _cache_key as _snapshot_key,
+    _local_lock as _snapshot_lock,
+    get_live_snapshot,
+)
+from .services.qr import SIZES as QR_SIZES, QrImage, _ByteLRU, clear_memory_cache, render_qr
+from .services.responses import decode_cursor, fetch_page
+from .services.scoring import get_answer_key
+from .services.stats import poll_stats
+from .services.structure import get_poll_structure
+from .services.transfer import PollImportError, clone_poll, import_poll
+from .services.submissions import (
+    DuplicateSubmission,
+    StaleSubmission,
+    SubmissionDraft,
+    collect_answers,
+    save_submission,
+    save_submissions,
+)
+
+
+def make_quiz(title: str, n_questions: int, access_code: str | None = None) -> Poll:
+    """Тестовый опрос: чередуются SINGLE (тестовые), MULTI и TEXT вопросы."""
+    poll = Poll.objects.create(title=title, access_code=access_code or title[:8].upper())
+    kinds = [Question.Kind.SINGLE, Question.Kind.MULTI, Question.Kind.TEXT]
+    for i in range(n_questions):
+        kind = kinds[i % len(kinds)]
+        q = Question.objects.create(
+            poll=poll,
+            text=f"Q{i}",
+            kind=kind,
+            order=i + 1,
+            is_test_question=kind != Question.Kind.TEXT,
+        )
+        if kind != Question.Kind.TEXT:
+            Choice.objects.create(question=q, text="A", is_correct=True)
+            Choice.objects.create(question=q, text="B")
+    return poll
 
-from .models import Choice, Poll, Question, Submission
+
+def quiz_post_data(poll: Poll, correct: bool = True) -> dict:
+    """POST-данные, отвечающие на все вопросы make_quiz (правильно или нет)."""
+    data = {}
+    for q in poll.questions.prefetch_related("choices"):
+        if q.kind == Question.Kind.TEXT:
+            data[f"q_{q.id}"] = "answer"
+            continue
+        wanted = [c.id for c in q.choices.all() if c.is_correct == correct]
+        data[f"q_{q.id}"] = [str(i) for i in wanted] if q.kind == Question.Kind.MULTI else str(wanted[0])
+    return data
+
+
+def parsed_answers(poll: Poll) -> list:
+    """Провалидированные ответы quiz_post_data — как их передаёт вьюха в запись."""
+    data = QueryDict(mutable=True)
+    for key, value in quiz_post_data(poll).items():
+        data.setlist(key, value if isinstance(value, list) else [value])
+    answers, _ = collect_answers(list(poll.questions.prefetch_related("choices")), data)
+    return answers
 
 
 class PollAccessCodeTests(TestCase):
     def test_access_code_is_generated_on_save(self):
         poll = Poll.objects.create(title="Test poll")
         self.assertTrue(poll.access_code)
-        self.assertEqual(len(poll.access_code), 6)
+        self.assertEqual(len(poll.access_code), ACCESS_CODE_LENGTH)
         self.assertTrue(poll.access_code.isalnum())
         self.assertEqual(poll.access_code, poll.access_code.upper())
 
 
 class PublicPollFlowTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.poll = Poll.objects.create(title="My poll", access_code="ABC123")
 
     def test_code_redirect_works(self):
@@ -42,7 +148,7 @@ class PublicPollFlowTests(TestCase):
             data={f"q_{q.id}": "Alice"},
         )
         self.assertEqual(resp.status_code, 302)
-        self.assertTrue(resp["Location"].endswith("/thanks"))
+        self.assertEqual(resp["Location"], reverse("polls:poll_thanks", args=[self.poll.access_code]))
         self.assertEqual(Submission.objects.filter(poll=self.poll).count(), 1)
 
     def test_single_choice_requires_one(self):
@@ -95,7 +201,7 @@ class DashboardPermissionTests(TestCase):
         self.poll = Poll.objects.create(title="Owner poll", owner=self.owner)
 
     def test_dashboard_requires_login(self):
-        resp = self.client.get(reverse("dashboard_project_list"))
+        resp = self.client.get(reverse("polls:project_list"))
         self.assertEqual(resp.status_code, 302)
         self.assertIn("/accounts/login/", resp["Location"])
 
@@ -105,3 +211,1922 @@ class DashboardPermissionTests(TestCase):
             reverse("polls:project_detail", kwargs={"poll_id": self.poll.id})
         )
         self.assertEqual(resp.status_code, 404)
+
+
+class SubmissionWriterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _questions(self, poll):
+        return poll.questions.prefetch_related("choices").order_by("order", "id")
+
+    def _write(self, poll, correct=True):
+        data = QueryDict(mutable=True)
+        for key, value in quiz_post_data(poll, correct=correct).items():
+            data.setlist(key, value if isinstance(value, list) else [value])
+        questions = self._questions(poll)
+        answers, errors = collect_answers(questions, data)
+        self.assertEqual(errors, [])
+        session_key = f"s{poll.submissions.count()}"  # опрос без повторов: каждый раз новый участник
+        with CaptureQueriesContext(connection) as ctx:
+            submission = save_submission(poll, answers, session_key=session_key)
+        return submission, len(ctx.captured_queries)
+
+    def test_query_count_does_not_depend_on_question_count(self):
+        small, small_queries = self._write(make_quiz("small", 3))
+        big, big_queries = self._write(make_quiz("big", 40))
+
+        self.assertEqual(small_queries, big_queries)
+        self.assertEqual(Answer.objects.filter(submission=big).count(), 40)
+
+    def test_score_is_computed_before_insert(self):
+        poll = make_quiz("score", 6)
+        submission, _ = self._write(poll, correct=True)
+        submission.refresh_from_db()
+        self.assertEqual((submission.score, submission.total), (4, 4))
+
+        wrong, _ = self._write(poll, correct=False)
+        wrong.refresh_from_db()
+        self.assertEqual((wrong.score, wrong.total), (0, 4))
+
+    def test_selected_choices_are_linked(self):
+        poll = make_quiz("links", 2)
+        submission, _ = self._write(poll)
+        multi = Answer.objects.get(submission=submission, question__kind=Question.Kind.MULTI)
+        self.assertEqual(
+            set(multi.selected_choices.values_list("id", flat=True)),
+            set(Choice.objects.filter(question=multi.question, is_correct=True).values_list("id", flat=True)),
+        )
+
+    def test_foreign_choice_id_is_rejected_in_memory(self):
+        poll = make_quiz("foreign", 1)
+        other = make_quiz("other", 1)
+        q = poll.questions.get()
+        foreign = Choice.objects.filter(question__poll=other).first()
+
+        questions = list(self._questions(poll))
+        data = QueryDict(mutable=True)
+        data[f"q_{q.id}"] = str(foreign.id)
+        with self.assertNumQueries(0):
+            answers, errors = collect_answers(questions, data)
+        self.assertEqual(answers, [])
+        self.assertEqual(errors[0]["question_id"], q.id)
+
+    def test_public_post_query_count_is_constant(self):
+        counts = []
+        for title, size in (("postsm", 3), ("postbig", 30)):
+            poll = make_quiz(title, size)
+            client = self.client_class()
+            with CaptureQueriesContext(connection) as ctx:
+                resp = client.post(f"/p/{poll.access_code}/", data=quiz_post_data(poll))
+            self.assertEqual(resp.status_code, 302)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class AnswerKeyScoringTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.poll = make_quiz("keyed", 6)
+        self.single = self.poll.questions.filter(kind=Question.Kind.SINGLE).first()
+        self.multi = self.poll.questions.filter(kind=Question.Kind.MULTI).first()
+        self.text = self.poll.questions.filter(kind=Question.Kind.TEXT).first()
+
+    def _correct_ids(self, question):
+        return set(question.choices.filter(is_correct=True).values_list("id", flat=True))
+
+    def test_key_is_built_once_and_cached(self):
+        with self.assertNumQueries(1):
+            key = get_answer_key(self.poll.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(get_answer_key(self.poll.id)), 4)
+        self.assertNotIn(self.text.id, key)
+
+    def test_scoring_does_not_touch_db(self):
+        key = get_answer_key(self.poll.id)
+        pairs = [
+            (self.single.id, self._correct_ids(self.single)),
+            (self.multi.id, set()),
+            (self.text.id, []),
+        ]
+        with self.assertNumQueries(0):
+            result = key.score(pairs)
+        self.assertEqual((result.score, result.total), (1, 2))
+        self.assertEqual(
+            result.per_answer,
+            {self.single.id: True, self.multi.id: False, self.text.id: None},
+        )
+
+    def test_key_invalidated_when_choice_correctness_changes(self):
+        get_answer_key(self.poll.id)
+        wrong = self.single.choices.get(is_correct=False)
+        right = self.single.choices.get(is_correct=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            right.is_correct = False
+            right.save()
+            wrong.is_correct = True
+            wrong.save()
+
+        key = get_answer_key(self.poll.id)
+        self.assertTrue(key.is_correct(self.single.id, [wrong.id]))
+        self.assertFalse(key.is_correct(self.single.id, [right.id]))
+
+    def test_key_invalidated_when_question_stops_being_test(self):
+        get_answer_key(self.poll.id)
+        Choice.objects.filter(question=self.multi).update(is_correct=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.multi.is_test_question = False
+            self.multi.save()
+
+        self.assertNotIn(self.multi.id, get_answer_key(self.poll.id))
+
+    def test_calculate_score_uses_answer_key(self):
+        submission = Submission.objects.create(poll=self.poll)
+        answer = Answer.objects.create(submission=submission, question=self.multi)
+        answer.selected_choices.set(self._correct_ids(self.multi))
+        Answer.objects.create(submission=submission, question=self.single).selected_choices.set(
+            self.single.choices.filter(is_correct=False)
+        )
+
+        submission.calculate_score()
+        self.assertEqual((submission.score, submission.total), (1, 2))
+        self.assertTrue(answer.is_correct)
+
+
+class VoteCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.poll = make_quiz("counted", 3)
+        self.single, self.multi, self.text = self.poll.questions.order_by("order")
+
+    def _submit(self, correct=True):
+        resp = self.client_class().post(
+            f"/p/{self.poll.access_code}/", data=quiz_post_data(self.poll, correct=correct)
+        )
+        self.assertEqual(resp.status_code, 302)
+
+    def test_counters_follow_submissions(self):
+        self._submit(correct=True)
+        self._submit(correct=False)
+        self._submit(correct=True)
+
+        counts = stored_counts(self.poll.id)
+        right = self.single.choices.get(is_correct=True)
+        wrong = self.single.choices.get(is_correct=False)
+        self.assertEqual(counts[(None, None)], 3)
+        self.assertEqual(counts[(self.text.id, None)], 3)
+        self.assertEqual(counts[(self.single.id, right.id)], 2)
+        self.assertEqual(counts[(self.single.id, wrong.id)], 1)
+        self.assertEqual(diff_counts(self.poll.id), {})
+
+    def test_counters_decremented_on_delete(self):
+        self._submit()
+        self._submit()
+        Submission.objects.filter(poll=self.poll).first().delete()
+
+        self.assertEqual(stored_counts(self.poll.id)[(None, None)], 1)
+        self.assertEqual(diff_counts(self.poll.id), {})
+
+        Submission.objects.filter(poll=self.poll).delete()
+        self.assertEqual(stored_counts(self.poll.id)[(None, None)], 0)
+        self.assertEqual(diff_counts(self.poll.id), {})
+
+    def test_poll_delete_cascades_counters(self):
+        self._submit()
+        self.poll.delete()
+        self.assertFalse(VoteCounter.objects.exists())
+
+    def test_rebuild_command_repairs_drift(self):
+        self._submit()
+        VoteCounter.objects.filter(poll=self.poll, question__isnull=True).update(value=42)
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_vote_counters", "--check", "--poll", str(self.poll.id), stdout=io.StringIO())
+
+        call_command("rebuild_vote_counters", "--poll", str(self.poll.id), stdout=io.StringIO())
+        self.assertEqual(stored_counts(self.poll.id)[(None, None)], 1)
+        call_command("rebuild_vote_counters", "--check", stdout=io.StringIO())
+
+    def test_live_vote_count_reads_counters(self):
+        self._submit()
+        resp = self.client.get(reverse("polls:live_vote_count"), {"code": self.poll.access_code})
+        data = resp.json()
+        self.assertEqual(data["total_submissions"], 1)
+        self.assertEqual(
+            data["questions"][2],
+            {"id": self.text.id, "kind": "TEXT", "text": "Q2", "count": 1},
+        )
+        self.assertEqual(sum(c["count"] for c in data["questions"][0]["choices"]), 1)
+
+
+class PollStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.owner = User.objects.create_user(username="stats", password="pass12345")
+
+    def _quiz(self, title, size, submissions=2):
+        poll = make_quiz(title, size)
+        poll.owner = self.owner
+        poll.save()
+        for i in range(submissions):
+            self.client_class().post(f"/p/{poll.access_code}/", data=quiz_post_data(poll, correct=i % 2 == 0))
+        return poll
+
+    def test_stats_values(self):
+        poll = self._quiz("values", 3, submissions=3)
+        stats = poll_stats(poll.id)
+
+        self.assertEqual(stats.total_submissions, 3)
+        single, multi, text = stats.questions
+        self.assertEqual([(c.text, c.count, c.percent) for c in single.choices], [("A", 2, 67), ("B", 1, 33)])
+        self.assertEqual(single.total_answers, 3)
+        self.assertEqual(text.text_answers_count, 3)
+        self.assertEqual(text.choices, [])
+
+    def test_stats_query_count_is_constant(self):
+        for title, size in (("statsm", 3), ("statbig", 60)):
+            poll = self._quiz(title, size)
+            with self.assertNumQueries(2):
+                stats = poll_stats(poll.id)
+            self.assertEqual(len(stats.questions), size)
+
+    def test_project_stats_view_query_count_is_constant(self):
+        self.client.login(username="stats", password="pass12345")
+        counts = []
+        for title, size in (("viewsm", 3), ("viewbig", 60)):
+            poll = self._quiz(title, size)
+            url = reverse("polls:project_stats", kwargs={"poll_id": poll.id})
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class ProjectResponsesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.owner = User.objects.create_user(username="resp", password="pass12345")
+        self.poll = make_quiz("responses", 3)
+        self.poll.owner = self.owner
+        self.poll.save()
+        for i in range(7):
+            data = quiz_post_data(self.poll, correct=i % 2 == 0)
+            data[f"q_{self.poll.questions.get(kind=Question.Kind.TEXT).id}"] = f"<b>row {i}</b>"
+            self.client_class().post(f"/p/{self.poll.access_code}/", data=data)
+        self.client.login(username="resp", password="pass12345")
+        self.url = reverse("polls:project_responses", kwargs={"poll_id": self.poll.id})
+
+    def test_full_table_is_streamed_in_pages(self):
+        resp = self.client.get(self.url, {"page_size": 3})
+        self.assertTrue(resp.streaming)
+        html = b"".join(resp.streaming_content).decode()
+        for i in range(7):
+            self.assertIn(f"&lt;b&gt;row {i}&lt;/b&gt;", html)
+        self.assertNotIn("<b>row", html)
+        self.assertIn("Q0", html)  # заголовки вопросов
+
+    def test_rows_stay_inside_the_page_when_counter_lags(self):
+        VoteCounter.objects.filter(poll=self.poll).delete()  # счётчик отстал: 0 отправок
+        cache.clear()
+        html = b"".join(self.client.get(self.url).streaming_content).decode()
+        self.assertLess(html.index("row 6"), html.index("</tbody>"))
+        self.assertTrue(html.rstrip().endswith("</html>"))
+        self.assertNotIn("Нет ответов", html)
+
+    def test_empty_state_comes_from_rows_not_counter(self):
+        Submission.objects.filter(poll=self.poll).update(poll=make_quiz("elsewhere", 1))
+        html = b"".join(self.client.get(self.url).streaming_content).decode()
+        self.assertIn("Нет ответов", html)
+        self.assertNotIn("&lt;b&gt;row", html)
+
+    def test_keyset_pages_cover_all_submissions_once(self):
+        # Одинаковый created_at — порядок должен держаться на id
+        Submission.objects.filter(poll=self.poll).update(created_at=timezone.now())
+        questions = list(self.poll.questions.prefetch_related("choices"))
+        key = get_answer_key(self.poll.id)
+
+        seen = []
+        after = None
+        while True:
+            with self.assertNumQueries(3):
+                page = fetch_page(self.poll, questions, key, page_size=2, after=after)
+            seen += [row["cells"][2]["text"] for row in page.rows]
+            if page.next_cursor is None:
+                break
+            after = decode_cursor(page.next_cursor)
+        self.assertEqual(sorted(seen), sorted(f"<b>row {i}</b>" for i in range(7)))
+
+    def test_rows_reuse_stored_scores(self):
+        Submission.objects.filter(poll=self.poll).update(score=5, total=9)
+        questions = list(self.poll.questions.prefetch_related("choices"))
+        page = fetch_page(self.poll, questions, get_answer_key(self.poll.id), page_size=50)
+        self.assertEqual({(r["score"], r["total"]) for r in page.rows}, {(5, 9)})
+
+    def test_partial_page_with_cursor(self):
+        resp = self.client.get(self.url, {"partial": 1, "page_size": 5})
+        self.assertEqual(resp.content.count(b"<tr"), 5)
+        cursor = resp["X-Next-Cursor"]
+        self.assertTrue(cursor)
+
+        resp = self.client.get(self.url, {"partial": 1, "page_size": 5, "after": cursor})
+        self.assertEqual(resp.content.count(b"<tr"), 2)
+        self.assertEqual(resp["X-Next-Cursor"], "")
+
+        resp = self.client.get(self.url, {"partial": 1, "after": "garbage"})
+        self.assertEqual(resp.status_code, 400)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.owner = User.objects.create_user(username="export", password="pass12345")
+        self.poll = make_quiz("exported", 3)
+        self.poll.owner = self.owner
+        self.poll.save()
+        for i in range(5):
+            self.client_class().post(f"/p/{self.poll.access_code}/", data=quiz_post_data(self.poll, i % 2 == 0))
+        self.client.login(username="export", password="pass12345")
+
+    def _get(self, fmt):
+        resp = self.client.get(reverse("polls:project_export", kwargs={"poll_id": self.poll.id, "fmt": fmt}))
+        self.assertEqual(resp.status_code, 200)
+        return b"".join(resp.streaming_content)
+
+    def test_csv(self):
+        rows = list(csv.reader(io.StringIO(self._get("csv").decode("utf-8-sig"))))
+        self.assertEqual(rows[0][5:], ["Q0", "Q1", "Q2"])
+        self.assertEqual(len(rows), 6)
+        self.assertEqual({r[7] for r in rows[1:]}, {"answer"})
+
+    def test_ndjson(self):
+        lines = self._get("ndjson").decode().splitlines()
+        self.assertEqual(len(lines), 5)
+        first = json.loads(lines[0])
+        q0 = self.poll.questions.get(order=1)
+        self.assertEqual(first[f"q_{q0.id}"], "A")
+
+    def test_xlsx_is_a_valid_workbook(self):
+        with zipfile.ZipFile(io.BytesIO(self._get("xlsx"))) as zf:
+            self.assertIn("xl/workbook.xml", zf.namelist())
+            sheet = zf.read("xl/worksheets/sheet1.xml").decode()
+        self.assertEqual(sheet.count("<row>"), 6)
+        self.assertIn(">Q2<", sheet)
+
+    def test_formula_like_answers_are_neutralised(self):
+        q_text = self.poll.questions.get(kind=Question.Kind.TEXT)
+        data = quiz_post_data(self.poll)
+        data[f"q_{q_text.id}"] = '=HYPERLINK("http://evil","x")'
+        self.client_class().post(f"/p/{self.poll.access_code}/", data=data)
+
+        rows = list(csv.reader(io.StringIO(self._get("csv").decode("utf-8-sig"))))
+        self.assertEqual(rows[-1][7], '\'=HYPERLINK("http://evil","x")')
+        with zipfile.ZipFile(io.BytesIO(self._get("xlsx"))) as zf:
+            sheet = zf.read("xl/worksheets/sheet1.xml").decode()
+        self.assertIn("'=HYPERLINK", sheet)
+        self.assertNotIn(">=HYPERLINK", sheet)
+
+    def test_queries_are_bounded_per_chunk(self):
+        questions = list(self.poll.questions.prefetch_related("choices"))
+        # 5 отправок пачками по 2 → 3 пачки × (отправки + ответы + варианты)
+        with CaptureQueriesContext(connection) as ctx:
+            rows = list(iter_rows(self.poll, questions, chunk_size=2))
+        self.assertEqual(len(rows), 5)
+        self.assertLessEqual(len(ctx.captured_queries), 3 * 3)
+
+    def test_unknown_format_is_404(self):
+        resp = self.client.get(f"/dashboard/project/{self.poll.id}/export.pdf")
+        self.assertEqual(resp.status_code, 404)
+
+
+@override_settings(POLLS_LIVE_POLL_INTERVAL=0.05)
+class LiveStreamTests(TestCase):
+    def _submit(self, poll, correct=True):
+        questions = list(poll.questions.prefetch_related("choices"))
+        data = QueryDict(mutable=True)
+        for key, value in quiz_post_data(poll, correct=correct).items():
+            data.setlist(key, value if isinstance(value, list) else [value])
+        answers, _ = collect_answers(questions, data)
+        save_submission(poll, answers)
+
+    async def _next_event(self, it):
+        while True:
+            chunk = await asyncio.wait_for(anext(it), timeout=5)
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if chunk.startswith("event:"):
+                event, data = chunk.split("\n")[:2]
+                return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+    async def test_stream_sends_snapshot_then_delta(self):
+        poll = await sync_to_async(make_quiz)("livesse", 2)
+        resp = await self.async_client.get("/api/live/stream/", {"code": poll.access_code})
+        self.assertEqual(resp["Content-Type"], "text/event-stream")
+        it = aiter(resp.streaming_content)
+
+        event, data = await self._next_event(it)
+        self.assertEqual(event, "snapshot")
+        self.assertEqual(data["total_submissions"], 0)
+
+        await sync_to_async(self._submit)(poll)
+        event, data = await self._next_event(it)
+        self.assertEqual(event, "delta")
+        self.assertEqual(data["total"], 1)
+        right = await Choice.objects.filter(question__poll=poll, question__order=1, is_correct=True).afirst()
+        self.assertEqual(data["choices"][str(right.id)], 1)
+        self.assertEqual(len(data["choices"]), 2)  # SINGLE + один верный вариант MULTI
+        await it.aclose()
+
+    async def test_subscribers_share_channel_and_slow_ones_are_coalesced(self):
+        poll = await sync_to_async(make_quiz)("livehub", 1)
+        hub = get_hub()
+        fast, slow = hub.subscribe(poll.id), hub.subscribe(poll.id)
+        self.assertIs(fast.channel, slow.channel)
+        fast_events, slow_events = fast.events(), slow.events()
+        self.assertEqual((await anext(fast_events))[0], "snapshot")
+        self.assertEqual((await anext(slow_events))[0], "snapshot")
+
+        for expected_total in (1, 2, 3):
+            await sync_to_async(self._submit)(poll)
+            event, delta = await asyncio.wait_for(anext(fast_events), timeout=5)
+            self.assertEqual((event, delta["total"]), ("delta", expected_total))
+
+        # Медленный подписчик получает одну дельту сразу до актуального состояния
+        event, delta = await asyncio.wait_for(anext(slow_events), timeout=5)
+        self.assertEqual((event, delta["total"]), ("delta", 3))
+        self.assertEqual(list(delta["choices"].values()), [3])
+
+        await fast_events.aclose()
+        await slow_events.aclose()
+        hub.unsubscribe(fast)
+        hub.unsubscribe(slow)
+
+    def test_wsgi_falls_back_to_single_snapshot(self):
+        poll = make_quiz("livewsgi", 1)
+        resp = self.client.get("/api/live/stream/", {"code": poll.access_code})
+        body = b"".join(resp.streaming_content).decode()
+        self.assertIn("retry:", body)
+        self.assertIn("event: snapshot", body)
+
+
+class LiveSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.poll = make_quiz("snapshot", 2)
+        self.url = reverse("polls:live_vote_count")
+
+    def test_etag_and_not_modified(self):
+        resp = self.client.get(self.url, {"code": self.poll.access_code})
+        self.assertEqual(resp.status_code, 200)
+        etag = resp["ETag"]
+
+        with self.assertNumQueries(0):
+            resp = self.client.get(self.url, {"code": self.poll.access_code}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp["ETag"], etag)
+
+    @override_settings(POLLS_LIVE_SNAPSHOT_TTL=0)
+    def test_new_submission_changes_etag_after_ttl(self):
+        etag = self.client.get(self.url, {"code": self.poll.access_code})["ETag"]
+        self.client_class().post(f"/p/{self.poll.access_code}/", data=quiz_post_data(self.poll))
+
+        resp = self.client.get(self.url, {"code": self.poll.access_code}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+        self.assertEqual(resp.json()["total_submissions"], 1)
+
+    def test_unknown_code_is_404(self):
+        self.assertEqual(self.client.get(self.url, {"code": "NOPE"}).status_code, 404)
+
+    def _concurrent_builds(self):
+        calls = []
+
+        def slow_build(code):
+            calls.append(code)
+            time.sleep(0.2)
+            return b'{"ok": true}'
+
+        with mock.patch("polls.services.snapshots._build", slow_build):
+            threads = [threading.Thread(target=get_live_snapshot, args=("STAMPEDE",)) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        return calls
+
+    def test_concurrent_requests_share_one_rebuild(self):
+        self.assertEqual(len(self._concurrent_builds()), 1)
+
+    def test_waiter_gets_stale_snapshot_while_neighbour_rebuilds(self):
+        stale = get_live_snapshot(self.poll.access_code)
+        cache.set(_snapshot_key(self.poll.access_code), dataclasses.replace(stale, fresh_until=0))
+        lock = _snapshot_lock(_snapshot_key(self.poll.access_code))
+        with lock, mock.patch("polls.services.snapshots._build") as build:
+            self.assertEqual(get_live_snapshot(self.poll.access_code).etag, stale.etag)
+        build.assert_not_called()
+
+    def test_foreign_lock_is_never_released_by_a_waiter(self):
+        lock_key = f"{_snapshot_key(self.poll.access_code)}:lock"
+        cache.add(lock_key, "other-process", timeout=60)
+        with mock.patch.object(snapshots_module, "LOCK_TIMEOUT", 0.1), \
+                mock.patch("polls.services.snapshots._build") as build:
+            with self.assertRaises(SnapshotBusy):
+                get_live_snapshot(self.poll.access_code)
+            resp = self.client.get(self.url, {"code": self.poll.access_code})
+        build.assert_not_called()
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(cache.get(lock_key), "other-process")
+
+    def test_waiter_takes_over_expired_lock(self):
+        lock_key = f"{_snapshot_key(self.poll.access_code)}:lock"
+        cache.add(lock_key, "crashed-process", timeout=0.05)
+
+        def build(code):
+            # Пока пересобираем, нашу блокировку перехватили — снимать её нельзя
+            cache.set(lock_key, "next-process")
+            return b'{"ok": true}'
+
+        with mock.patch("polls.services.snapshots._build", build):
+            self.assertEqual(get_live_snapshot(self.poll.access_code).body, b'{"ok": true}')
+        self.assertEqual(cache.get(lock_key), "next-process")
+
+    def test_unknown_codes_do_not_grow_lock_table(self):
+        for i in range(200):
+            get_live_snapshot(f"NOPE{i}")
+        self.assertEqual(len(snapshots_module._local_locks), snapshots_module.LOCK_STRIPES)
+
+    def test_single_flight_with_file_based_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            caches_conf = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": tmp}}
+            with override_settings(CACHES=caches_conf):
+                self.assertEqual(len(self._concurrent_builds()), 1)
+                self.assertIsNotNone(get_live_snapshot("STAMPEDE"))
+
+
+class PollStructureCacheTests(TestCase):
+    STRUCTURE_TABLES = ("polls_poll", "polls_question", "polls_choice")
+
+    def setUp(self):
+        cache.clear()
+        self.poll = make_quiz("cached", 3)
+        self.url = f"/p/{self.poll.access_code}/"
+
+    def _structure_queries(self, ctx):
+        return [
+            q["sql"] for q in ctx.captured_queries
+            if any(f'FROM "{table}"' in q["sql"] for table in self.STRUCTURE_TABLES)
+        ]
+
+    def test_public_get_and_post_make_no_structure_queries_when_warm(self):
+        self.client.get(self.url)  # прогрев
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client_class().get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "Q2")
+        self.assertEqual(self._structure_queries(ctx), [])
+
+        data = quiz_post_data(self.poll)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client_class().post(self.url, data=data)
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(self._structure_queries(ctx), [])
+
+    def test_version_bumped_on_choice_and_question_changes(self):
+        before = get_poll_structure(self.poll.access_code)
+        choice = Choice.objects.filter(question__poll=self.poll).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            choice.text = "Renamed"
+            choice.save()
+
+        after = get_poll_structure(self.poll.access_code)
+        self.assertNotEqual(before.version, after.version)
+        self.assertIn("Renamed", [c.text for q in after.questions for c in q.choices])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Question.objects.create(poll=self.poll, text="Added", kind=Question.Kind.TEXT, order=99)
+        self.assertEqual(len(get_poll_structure(self.poll.access_code).questions), 4)
+
+    def test_poll_edit_and_delete_bump_version(self):
+        get_poll_structure(self.poll.access_code)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.poll.title = "New title"
+            self.poll.save()
+        self.assertEqual(get_poll_structure(self.poll.access_code).poll.title, "New title")
+
+        code = self.poll.access_code
+        with self.captureOnCommitCallbacks(execute=True):
+            self.poll.delete()
+        self.assertIsNone(get_poll_structure(code))
+        self.assertEqual(self.client.get(f"/p/{code}/").status_code, 404)
+
+    def test_unknown_code_writes_nothing_to_cache(self):
+        self.assertIsNone(get_poll_structure("NOSUCH01"))
+        self.assertEqual(self.client.get("/p/NOSUCH02/").status_code, 404)
+        self.assertIsNone(cache.get("polls:structure_version:NOSUCH01"))
+        self.assertIsNone(cache.get("polls:structure_version:NOSUCH02"))
+
+    def test_version_is_bumped_now_and_again_on_commit(self):
+        before = get_poll_structure(self.poll.access_code)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.poll.title = "Uncommitted"
+                self.poll.save()
+                # Своя транзакция сразу видит правку…
+                during = get_poll_structure(self.poll.access_code)
+                self.assertNotEqual(during.version, before.version)
+                self.assertEqual(during.poll.title, "Uncommitted")
+        # …а собранное до фиксации (в т.ч. параллельным читателем) после COMMIT не читается
+        after = get_poll_structure(self.poll.access_code)
+        self.assertNotEqual(after.version, during.version)
+        self.assertEqual(after.poll.title, "Uncommitted")
+
+    def test_reused_access_code_does_not_see_old_structure(self):
+        code = self.poll.access_code
+        self.assertTrue(get_poll_structure(code).questions)
+        self.poll.delete()
+        Poll.objects.create(title="Reused", access_code=code)
+        structure = get_poll_structure(code)
+        self.assertEqual((structure.poll.title, structure.questions), ("Reused", ()))
+
+    def test_structure_is_plain_tuples(self):
+        structure = get_poll_structure(self.poll.access_code)
+        self.assertIsInstance(structure.questions[0], tuple)
+        self.assertIsInstance(structure.questions[0].choices[0], tuple)
+
+
+class PublicFragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.poll = make_quiz("fragment", 3)
+        self.url = f"/p/{self.poll.access_code}/"
+
+    def _fragment_key(self):
+        version = get_poll_structure(self.poll.access_code).version
+        return make_template_fragment_key("poll_questions", [self.poll.access_code, version])
+
+    def test_questions_markup_served_from_cache(self):
+        self.client.get(self.url)
+        key = self._fragment_key()
+        self.assertIn('id="question-', cache.get(key))
+
+        cache.set(key, "<p>из кэша</p>")
+        self.assertContains(self.client_class().get(self.url), "<p>из кэша</p>")
+
+    def test_fragment_invalidated_by_structure_change(self):
+        question = self.poll.questions.order_by("order").first()
+        self.assertContains(self.client.get(self.url), f">{question.text}<")
+        old_text, question.text = question.text, "Переименован"
+        with self.captureOnCommitCallbacks(execute=True):
+            question.save()
+        resp = self.client_class().get(self.url)
+        self.assertContains(resp, ">Переименован<")
+        self.assertNotContains(resp, f">{old_text}<")
+
+    def test_csrf_token_and_errors_stay_per_request(self):
+        first = self.client_class(enforce_csrf_checks=True).get(self.url)
+        second = self.client_class(enforce_csrf_checks=True).get(self.url)
+        self.assertNotEqual(first.context["csrf_token"], second.context["csrf_token"])
+        self.assertContains(second, str(second.context["csrf_token"]))
+
+        resp = self.client_class().post(self.url, data={})
+        self.assertEqual(resp.status_code, 200)
+        failing = resp.context["errors"][0]["question_id"]
+        self.assertContains(resp, f"#question-{failing}")
+
+    @override_settings(POLLS_PUBLIC_FRAGMENT_CACHE_TIMEOUT=0)
+    def test_zero_timeout_disables_fragment_cache(self):
+        self.assertContains(self.client.get(self.url), 'id="question-')
+        self.assertIsNone(cache.get(self._fragment_key()))
+
+
+class QrCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_memory_cache()
+        self.poll = make_quiz("qrcache", 1)
+        self.url = reverse("polls:poll_qr_png", kwargs={"access_code": self.poll.access_code})
+
+    def test_repeated_requests_render_once_and_honour_etag(self):
+        with mock.patch("polls.services.qr.render_qr", wraps=render_qr) as render:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url)
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first["Content-Type"], "image/png")
+        self.assertIn("max-age", first["Cache-Control"])
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["ETag"], first["ETag"])
+
+    def test_size_and_svg_variants(self):
+        from PIL import Image
+
+        resp = self.client.get(self.url, {"size": "300"})
+        self.assertEqual(Image.open(io.BytesIO(resp.content)).size, (480, 480))  # вверх до SIZES
+        self.assertEqual(self.client.get(self.url, {"size": "5"}).status_code, 200)
+        self.assertEqual(self.client.get(self.url, {"size": "big"}).status_code, 400)
+
+        svg = self.client.get(self.url, {"format": "svg"})
+        self.assertEqual(svg["Content-Type"], "image/svg+xml")
+        self.assertIn(b"<svg", svg.content)
+        self.assertNotEqual(svg["ETag"], resp["ETag"])
+        self.assertEqual(self.client.get(self.url, {"format": "gif"}).status_code, 400)
+
+    def test_disk_tier_is_shared_between_processes(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(POLLS_QR_CACHE_DIR=tmp):
+            first = self.client.get(self.url)
+            clear_memory_cache()  # как будто другой воркер
+            with mock.patch("polls.services.qr.render_qr") as render:
+                second = self.client.get(self.url)
+            render.assert_not_called()
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first["ETag"], second["ETag"])
+
+    def test_disk_tier_holds_only_bucketed_sizes(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(POLLS_QR_CACHE_DIR=tmp):
+            for size in range(60, 2200, 37):
+                self.client.get(self.url, {"size": str(size)})
+            files = list(Path(tmp).rglob("*.png"))
+        self.assertEqual(len(files), len(QR_SIZES))
+
+    def test_failed_disk_write_leaves_no_temp_file(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(POLLS_QR_CACHE_DIR=tmp):
+            with mock.patch("polls.services.qr.os.replace", side_effect=OSError("disk full")):
+                self.assertEqual(self.client.get(self.url).status_code, 200)
+            self.assertEqual([p for p in Path(tmp).rglob("*") if p.is_file()], [])
+
+    def test_unknown_poll_is_404(self):
+        resp = self.client.get(reverse("polls:poll_qr_png", kwargs={"access_code": "NOPE0000"}))
+        self.assertEqual(resp.status_code, 404)
+
+    def test_memory_tier_is_bounded(self):
+        lru = _ByteLRU(max_bytes=10)
+        for i in range(5):
+            lru.set(str(i), QrImage(body=b"1234", content_type="image/png", etag=str(i)))
+        self.assertEqual(len(lru), 2)
+        self.assertLessEqual(lru.size, 10)
+        self.assertIsNone(lru.get("0"))
+        self.assertIsNotNone(lru.get("4"))
+
+
+class ParticipantIdentityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.poll = make_quiz("identity", 3)
+        self.poll.time_limit_minutes = 10
+        self.poll.save()
+        self.url = f"/p/{self.poll.access_code}/"
+
+    def _writes(self, ctx):
+        return [q["sql"] for q in ctx.captured_queries if not q["sql"].lstrip().upper().startswith("SELECT")]
+
+    def test_anonymous_visit_writes_nothing_and_sets_signed_cookie(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self._writes(ctx), [])
+        self.assertEqual(Session.objects.count(), 0)
+        self.assertIn(settings.POLLS_PARTICIPANT_COOKIE, resp.cookies)
+        self.assertIsNotNone(resp.context["time_left"])
+
+        # Повторный GET: таймер уже в cookie, cookie не переустанавливается
+        resp = self.client.get(self.url)
+        self.assertNotIn(settings.POLLS_PARTICIPANT_COOKIE, resp.cookies)
+
+    def test_duplicate_check_and_thanks_use_participant_token(self):
+        self.client.get(self.url)
+        self.assertEqual(self.client.post(self.url, data=quiz_post_data(self.poll)).status_code, 302)
+        submission = Submission.objects.get(poll=self.poll)
+        self.assertEqual(len(submission.session_key), 32)
+
+        resp = self.client.get(self.url)
+        self.assertTemplateUsed(resp, "polls/poll_already_submitted.html")
+        thanks = reverse("polls:poll_thanks", kwargs={"access_code": self.poll.access_code})
+        self.assertEqual(self.client.get(thanks).status_code, 200)
+
+        # Чужой анонимный участник не видит чужих результатов и может пройти опрос сам
+        other = self.client_class()
+        self.assertEqual(other.get(thanks).status_code, 302)
+        self.assertTemplateUsed(other.get(self.url), "polls/poll_public.html")
+
+    def test_tampered_cookie_starts_new_participant(self):
+        self.client.get(self.url)
+        self.client.post(self.url, data=quiz_post_data(self.poll))
+        self.client.cookies[settings.POLLS_PARTICIPANT_COOKIE] = "forged:value"
+        resp = self.client.get(self.url)
+        self.assertTemplateUsed(resp, "polls/poll_public.html")
+        self.assertIn(settings.POLLS_PARTICIPANT_COOKIE, resp.cookies)
+
+    def test_expired_timer_from_cookie(self):
+        self.client.get(self.url)
+        later = timezone.now() + timezone.timedelta(minutes=11)
+        with mock.patch("polls.views.public.timezone.now", return_value=later):
+            resp = self.client.post(self.url, data=quiz_post_data(self.poll))
+        self.assertTemplateUsed(resp, "polls/poll_timeout.html")
+        self.assertEqual(Submission.objects.count(), 0)
+
+    def test_logged_in_user_keeps_session_behaviour(self):
+        user = get_user_model().objects.create_user("member", password="pw")
+        self.client.force_login(user)
+        resp = self.client.get(self.url)
+        self.assertNotIn(settings.POLLS_PARTICIPANT_COOKIE, resp.cookies)
+        self.assertIn(f"poll_start_time_{self.poll.id}", self.client.session)
+
+        self.client.post(self.url, data=quiz_post_data(self.poll))
+        submission = Submission.objects.get(poll=self.poll)
+        self.assertEqual(submission.user, user)
+        self.assertEqual(submission.session_key, self.client.session.session_key)
+        self.assertTemplateUsed(self.client.get(self.url), "polls/poll_already_submitted.html")
+
+
+class SingleEntryConstraintTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.poll = make_quiz("single", 3)
+        self.url = f"/p/{self.poll.access_code}/"
+
+    def test_racing_posts_that_both_pass_the_precheck_store_one_submission(self):
+        self.client.get(self.url)
+        data = quiz_post_data(self.poll)
+        # Оба запроса «успели» проверить отсутствие отправки до INSERT
+        with mock.patch("django.db.models.query.QuerySet.exists", return_value=False):
+            first = self.client.post(self.url, data=data)
+            second = self.client.post(self.url, data=data)
+        self.assertEqual(first.status_code, 302)
+        self.assertTemplateUsed(second, "polls/poll_already_submitted.html")
+        self.assertEqual(Submission.objects.filter(poll=self.poll).count(), 1)
+        self.assertEqual(stored_counts(self.poll.id)[(None, None)], 1)
+
+    def test_parallel_posts_of_one_participant_store_one_submission(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("in-memory SQLite блокирует таблицу целиком — параллельной записи не бывает")
+        client = self.client_class()
+        client.get(self.url)
+        cookies = client.cookies
+        data = quiz_post_data(self.poll)
+        barrier = threading.Barrier(6)
+        statuses, failures = [], []
+
+        def post():
+            worker = self.client_class()
+            worker.cookies = cookies
+            barrier.wait()
+            try:
+                statuses.append(worker.post(self.url, data=data).status_code)
+            except Exception as exc:  # noqa: BLE001 — всё, кроме штатных ответов, — провал теста
+                failures.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=post) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(failures, [])
+        self.assertEqual(Submission.objects.filter(poll=self.poll).count(), 1)
+        self.assertEqual(statuses.count(302), 1)
+        self.assertEqual(stored_counts(self.poll.id)[(None, None)], 1)
+
+    def test_constraint_rejects_duplicate_even_without_view_check(self):
+        answers, _ = collect_answers(list(self.poll.questions.prefetch_related("choices")), QueryDict())
+        save_submission(self.poll, answers, session_key="same")
+        with self.assertRaises(DuplicateSubmission):
+            save_submission(self.poll, answers, session_key="same")
+        save_submission(self.poll, answers, session_key="other")
+
+        self.poll.allow_multiple_submissions = True
+        self.poll.save()
+        save_submission(self.poll, answers, session_key="same")
+        self.assertEqual(Submission.objects.filter(poll=self.poll, session_key="same").count(), 2)
+
+
+class PollThanksQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _submit(self, poll):
+        url = f"/p/{poll.access_code}/"
+        self.client.get(url)
+        self.client.post(url, data=quiz_post_data(poll, correct=False))
+        return reverse("polls:poll_thanks", kwargs={"access_code": poll.access_code})
+
+    def test_constant_queries_for_any_quiz_length(self):
+        for n_questions in (3, 30):
+            with self.subTest(n_questions=n_questions):
+                thanks = self._submit(make_quiz(f"thanks{n_questions}", n_questions))
+                self.client.get(thanks)  # прогрев кэша структуры и ключа ответов
+                # отправка участника, её ответы, выбранные варианты
+                with self.assertNumQueries(3):
+                    resp = self.client.get(thanks)
+                self.assertEqual(resp.status_code, 200)
+                self.assertEqual(len(resp.context["answers_data"]), n_questions)
+
+    def test_results_match_submission(self):
+        poll = make_quiz("results", 3)
+        resp = self.client.get(self._submit(poll))
+        single, multi, text = resp.context["answers_data"]
+        self.assertEqual([c.text for c in single["given_choices"]], ["B"])
+        self.assertEqual([c.text for c in single["correct_choices"]], ["A"])
+        self.assertIs(single["is_correct"], False)
+        self.assertIs(multi["is_correct"], False)
+        self.assertEqual(text["given_text"], "answer")
+        self.assertEqual(text["correct_choices"], [])
+        self.assertEqual(resp.context["submission"].score, 0)
+
+
+class BenchmarkSubmitCommandTests(TestCase):
+    def test_writes_json_report_and_cleans_up(self):
+        cache.clear()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = f"{tmp}/bench.json"
+            call_command(
+                "benchmark_submit", questions=4, choices=3, participants=6, concurrency=1,
+                read_every=3, output=path, stdout=io.StringIO(),
+            )
+            with open(path, encoding="utf-8") as f:
+                report = json.load(f)
+
+        endpoints = report["endpoints"]
+        self.assertEqual(endpoints["POST /p/<code>/"]["requests"], 6)
+        self.assertEqual(endpoints["project_stats"]["requests"], 2)
+        self.assertTrue(all(row["errors"] == 0 for row in endpoints.values()))
+        self.assertLessEqual(
+            endpoints["GET /p/<code>/"]["p50_ms"], endpoints["GET /p/<code>/"]["p99_ms"]
+        )
+        self.assertEqual(report["meta"]["database"], connection.vendor)
+        self.assertFalse(Poll.objects.exists())
+        self.assertFalse(get_user_model().objects.exists())
+
+
+class SeedPollsCommandTests(TestCase):
+    def _seed(self, seed):
+        call_command("seed_polls", polls=2, questions=6, choices=3, submissions=25, batch_size=10,
+                     seed=seed, stdout=io.StringIO())
+        polls = list(Poll.objects.order_by("id"))
+        return [
+            (
+                poll.access_code,
+                list(poll.questions.order_by("order").values_list("kind", "is_test_question")),
+                list(poll.submissions.order_by("id").values_list("score", "total")),
+                list(Answer.objects.filter(submission__poll=poll).order_by("id").values_list("text_value", flat=True)),
+                sorted(
+                    (choice.question.order, choice.text, choice.is_correct, choice.answers.count())
+                    for choice in Choice.objects.filter(question__poll=poll).select_related("question")
+                ),
+            )
+            for poll in polls
+        ]
+
+    def test_generates_consistent_rows(self):
+        self._seed(5)
+        self.assertEqual(Poll.objects.count(), 2)
+        self.assertEqual(Submission.objects.count(), 50)
+        self.assertEqual(Answer.objects.count(), 50 * 6)
+        for poll in Poll.objects.all():
+            self.assertEqual(diff_counts(poll.id), {})
+            for answer in Answer.objects.filter(submission__poll=poll).select_related("question"):
+                n_choices = answer.selected_choices.count()
+                if answer.question.kind == Question.Kind.TEXT:
+                    self.assertTrue(answer.text_value)
+                    self.assertEqual(n_choices, 0)
+                elif answer.question.kind == Question.Kind.SINGLE:
+                    self.assertEqual(n_choices, 1)
+                else:
+                    self.assertGreaterEqual(n_choices, 1)
+            submission = poll.submissions.first()
+            seeded = (submission.score, submission.total)
+            submission.calculate_score()
+            self.assertEqual((submission.score, submission.total), seeded)
+
+    def test_deterministic_under_seed(self):
+        first = self._seed(11)
+        Poll.objects.all().delete()
+        self.assertEqual(self._seed(11), first)
+        Poll.objects.all().delete()
+        self.assertNotEqual(self._seed(12), first)
+
+
+@override_settings(POLLS_METRICS_ENABLED=True, POLLS_METRICS_SERVER_TIMING=True, POLLS_METRICS_QUERY_THRESHOLD=0)
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics_registry.reset()
+        self.poll = make_quiz("metrics", 3)
+        self.staff = get_user_model().objects.create_user("ops", password="pw", is_staff=True)
+
+    def test_server_timing_and_prometheus_aggregation(self):
+        client = self.client_class()
+        resp = client.get(f"/p/{self.poll.access_code}/")
+        self.assertRegex(resp["Server-Timing"], r'db;dur=[\d.]+;desc="\d+ SQL", tpl;dur=[\d.]+, total;dur=[\d.]+')
+        client.get(f"/p/{self.poll.access_code}/")
+
+        client.force_login(self.staff)
+        body = client.get("/dashboard/metrics").content.decode()
+        self.assertIn('polls_requests_total{view="polls:poll_public"} 2', body)
+        self.assertIn('polls_request_duration_seconds_bucket{view="polls:poll_public",le="+Inf"} 2', body)
+        self.assertIn("# TYPE polls_db_queries_total counter", body)
+
+    def test_metrics_endpoint_access(self):
+        self.assertEqual(self.client.get("/dashboard/metrics").status_code, 404)
+        with override_settings(POLLS_METRICS_TOKEN="secret"):
+            self.assertEqual(self.client.get("/dashboard/metrics", HTTP_AUTHORIZATION="Bearer nope").status_code, 404)
+            self.assertEqual(self.client.get("/dashboard/metrics", HTTP_AUTHORIZATION="Bearer secret").status_code, 200)
+        with override_settings(POLLS_METRICS_ENABLED=False):
+            self.client.force_login(self.staff)
+            self.assertEqual(self.client_class().get("/dashboard/metrics").status_code, 404)
+
+    def test_heavy_request_is_logged_with_duplicated_sql(self):
+        with override_settings(POLLS_METRICS_QUERY_THRESHOLD=1), self.assertLogs("polls.metrics", "WARNING") as logs:
+            self.client_class().get(f"/p/{self.poll.access_code}/")
+        self.assertIn("polls:poll_public", logs.output[0])
+
+        sample = RequestSample(view="x", total=0.1, queries=[
+            'SELECT * FROM "polls_choice" WHERE "question_id" IN (%s, %s)',
+            'SELECT * FROM "polls_choice" WHERE "question_id" IN (%s, %s, %s)',
+            'SELECT * FROM "polls_poll" WHERE "id" = %s',
+        ])
+        self.assertEqual(
+            sample.duplicated_queries(),
+            [('SELECT * FROM "polls_choice" WHERE "question_id" IN (%s, ...)', 2)],
+        )
+
+    @override_settings(POLLS_METRICS_ENABLED=False)
+    def test_disabled_by_default(self):
+        resp = self.client_class().get(f"/p/{self.poll.access_code}/")
+        self.assertNotIn("Server-Timing", resp)
+
+
+@override_settings(POLLS_SUBMISSION_QUEUE=True)
+class SubmissionQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.poll = make_quiz("queued", 3)
+        self.url = f"/p/{self.poll.access_code}/"
+        self.thanks = reverse("polls:poll_thanks", kwargs={"access_code": self.poll.access_code})
+
+    def test_post_enqueues_and_drain_writes(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post(self.url, data=quiz_post_data(self.poll))
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual([q["sql"].split()[0] for q in ctx.captured_queries].count("INSERT"), 1)
+        self.assertEqual(Submission.objects.count(), 0)
+        self.assertEqual(PendingSubmission.objects.count(), 1)
+
+        processing = self.client.get(self.thanks)
+        self.assertTrue(processing.context["processing"])
+        self.assertContains(processing, 'http-equiv="refresh"')
+        self.assertTemplateUsed(self.client.get(self.url), "polls/poll_already_submitted.html")
+
+        out = io.StringIO()
+        call_command("drain_submissions", stdout=out)
+        self.assertIn("записано: 1", out.getvalue())
+        self.assertFalse(PendingSubmission.objects.exists())
+        submission = Submission.objects.get()
+        self.assertEqual((submission.score, submission.total), (2, 2))
+        self.assertEqual(diff_counts(self.poll.id), {})
+
+        resp = self.client.get(self.thanks)
+        self.assertNotIn("processing", resp.context)
+        self.assertEqual(resp.context["submission"], submission)
+
+    def test_drain_drops_repeats_and_orphans_but_keeps_the_rest(self):
+        answers = parsed_answers(self.poll)
+        for key in ("a", "a", "b", "c"):
+            enqueue_submission(self.poll, answers, session_key=key)
+        save_submission(self.poll, answers, session_key="c")  # «c» уже записан прямым путём
+
+        other = make_quiz("orphan", 2)
+        enqueue_submission(other, parsed_answers(other), session_key="z")
+        other.questions.first().delete()
+
+        self.assertEqual(drain_once(batch_size=10), (5, 2))
+        self.assertEqual(
+            sorted(Submission.objects.filter(poll=self.poll).values_list("session_key", flat=True)),
+            ["a", "b", "c"],
+        )
+        self.assertFalse(Submission.objects.filter(poll=other).exists())
+        self.assertEqual(diff_counts(self.poll.id), {})
+
+    def test_broken_entry_is_marked_and_the_rest_drains(self):
+        answers = parsed_answers(self.poll)
+        enqueue_submission(self.poll, answers, session_key="a")
+        broken = enqueue_submission(self.poll, answers, session_key="broken")
+        PendingSubmission.objects.filter(pk=broken.pk).update(payload={})
+        enqueue_submission(self.poll, answers, session_key="b")
+
+        with self.assertLogs("polls.services.ingest", level="ERROR"):
+            self.assertEqual(drain_once(batch_size=10), (3, 2))
+        self.assertEqual(
+            sorted(Submission.objects.values_list("session_key", flat=True)), ["a", "b"]
+        )
+        broken = PendingSubmission.objects.get()
+        self.assertIsNotNone(broken.failed_at)
+        self.assertIn("KeyError", broken.error)
+
+        # Помеченная строка больше не берётся и не держит участника в «обработке»
+        enqueue_submission(self.poll, answers, session_key="c")
+        self.assertEqual(drain_once(batch_size=10), (1, 1))
+        self.assertEqual(drain_once(batch_size=10), (0, 0))
+        self.assertFalse(pending_for(self.poll.id, session_key="broken").exists())
+
+    def test_batch_write_query_count_is_constant(self):
+        def drafts(n, prefix):
+            return [
+                SubmissionDraft(self.poll.id, True, None, f"{prefix}{i}", ())
+                for i in range(n)
+            ]
+
+        get_answer_key(self.poll.id)
+        with CaptureQueriesContext(connection) as small:
+            save_submissions(drafts(2, "s"))
+        with CaptureQueriesContext(connection) as big:
+            save_submissions(drafts(50, "b"))
+        self.assertEqual(len(small), len(big))
+        self.assertEqual(stored_counts(self.poll.id)[(None, None)], 52)
+
+
+class SubmissionBatcherTests(SimpleTestCase):
+    """Согласование потоков без БД: запись подменена функцией-регистратором."""
+
+    def run_concurrently(self, batcher, drafts):
+        results = {}
+
+        def submit(draft):
+            try:
+                results[draft.session_key] = batcher.submit(draft)
+            except Exception as exc:
+                results[draft.session_key] = exc
+
+        threads = [threading.Thread(target=submit, args=(draft,)) for draft in drafts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    @staticmethod
+    def drafts(n):
+        return [SubmissionDraft(1, True, None, f"k{i}", ()) for i in range(n)]
+
+    def test_concurrent_submissions_share_one_write(self):
+        batches = []
+
+        def write(drafts):
+            batches.append([d.session_key for d in drafts])
+            return [f"saved-{d.session_key}" for d in drafts]
+
+        # Окно большое: пачку закрывает набранный размер, а не таймер
+        batcher = SubmissionBatcher(window=5.0, max_size=3, write=write)
+        started = time.monotonic()
+        results = self.run_concurrently(batcher, self.drafts(3))
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(results, {f"k{i}": f"saved-k{i}" for i in range(3)})
+
+    def test_overflow_goes_to_next_batch(self):
+        batches = []
+
+        def write(drafts):
+            batches.append(len(drafts))
+            time.sleep(0.01)
+            return [d.session_key for d in drafts]
+
+        batcher = SubmissionBatcher(window=0.02, max_size=2, write=write)
+        results = self.run_concurrently(batcher, self.drafts(7))
+        self.assertEqual(results, {f"k{i}": f"k{i}" for i in range(7)})
+        self.assertEqual(sum(batches), 7)
+        self.assertLessEqual(max(batches), 2)
+
+    def test_write_error_reaches_every_request(self):
+        def write(drafts):
+            raise DatabaseError("locked")
+
+        batcher = SubmissionBatcher(window=5.0, max_size=2, write=write)
+        results = self.run_concurrently(batcher, self.drafts(2))
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all(isinstance(r, DatabaseError) for r in results.values()))
+
+
+@override_settings(POLLS_SUBMISSION_BATCH_WINDOW_MS=1)
+class BatchedSubmissionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.poll = make_quiz("batched", 3)
+
+    def test_public_post_goes_through_batcher(self):
+        url = f"/p/{self.poll.access_code}/"
+        with mock.patch("polls.services.batcher.save_submission") as single:
+            resp = self.client.post(url, data=quiz_post_data(self.poll))
+        self.assertEqual(resp.status_code, 302)
+        single.assert_not_called()
+        submission = Submission.objects.get()
+        self.assertEqual((submission.score, submission.total), (2, 2))
+        self.assertEqual(diff_counts(self.poll.id), {})
+
+    def test_repeat_is_reported_as_duplicate(self):
+        answers = parsed_answers(self.poll)
+        write_submission(self.poll, answers, session_key="p")
+        with self.assertRaises(DuplicateSubmission):
+            write_submission(self.poll, answers, session_key="p")
+        self.assertEqual(Submission.objects.count(), 1)
+
+    def test_deleted_question_is_not_reported_as_duplicate(self):
+        answers = parsed_answers(self.poll)
+        self.poll.questions.first().delete()
+        with self.assertRaises(StaleSubmission):
+            write_submission(self.poll, answers, session_key="p")
+        self.assertFalse(Submission.objects.exists())
+
+    def test_batch_reports_reason_per_draft(self):
+        answers = parsed_answers(self.poll)
+        save_submission(self.poll, answers, session_key="done")
+        drafts = [
+            SubmissionDraft.from_parsed(self.poll, answers, session_key=key)
+            for key in ("done", "fresh", "fresh")
+        ]
+        first, *rest = save_submissions(drafts)
+        self.assertIsInstance(first, DuplicateSubmission)
+        self.assertIsInstance(rest[0], Submission)
+        self.assertIsInstance(rest[1], DuplicateSubmission)
+
+        # Прочие нарушения целостности — не повтор участника
+        with mock.patch("polls.services.submissions._write_drafts", side_effect=IntegrityError("fk")):
+            [result] = save_submissions([SubmissionDraft.from_parsed(self.poll, answers, session_key="new")])
+        self.assertIsInstance(result, IntegrityError)
+
+    @override_settings(POLLS_SUBMISSION_BATCH_WINDOW_MS=0)
+    def test_window_zero_writes_directly(self):
+        self.assertIsNone(get_batcher())
+
+
+class SqliteTunedProfileTests(SimpleTestCase):
+    def test_pragmas_and_immediate_transactions(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = f"{tmp}/tuned.sqlite3"
+            wrapper = SQLiteDatabaseWrapper(
+                {**connection.settings_dict, "NAME": path, "OPTIONS": settings.SQLITE_TUNED_OPTIONS},
+                alias="tuned",
+            )
+            try:
+                with wrapper.cursor() as cursor:
+                    pragmas = {}
+                    for name in ("journal_mode", "synchronous", "temp_store", "cache_size"):
+                        cursor.execute(f"PRAGMA {name}")
+                        pragmas[name] = cursor.fetchone()[0]
+                    cursor.execute("CREATE TABLE t (x integer)")
+                self.assertEqual(pragmas["journal_mode"], "wal")
+                self.assertEqual(pragmas["synchronous"], 1)  # NORMAL
+                self.assertEqual(pragmas["temp_store"], 2)  # MEMORY
+                self.assertLess(pragmas["cache_size"], 0)  # в КиБ, а не в страницах
+
+                # BEGIN IMMEDIATE: блокировка записи взята сразу, ещё до первого INSERT
+                # (так же начинает транзакцию transaction.atomic() на SQLite)
+                wrapper._start_transaction_under_autocommit()
+                wrapper.autocommit = False
+                other = sqlite3.connect(path, timeout=0)
+                try:
+                    with self.assertRaisesMessage(sqlite3.OperationalError, "locked"):
+                        other.execute("BEGIN IMMEDIATE")
+                finally:
+                    other.close()
+                wrapper.rollback()
+            finally:
+                wrapper.close()
+
+
+    def test_replica_profile_only_reads(self):
+        options = settings.SQLITE_REPLICA_OPTIONS
+        self.assertNotIn("transaction_mode", options)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = f"{tmp}/replica.sqlite3"
+            sqlite3.connect(path).close()
+            # Копия, доступная только на чтение: профиль не пытается переключать журнал
+            wrapper = SQLiteDatabaseWrapper(
+                {**connection.settings_dict, "NAME": f"file:{path}?mode=ro", "OPTIONS": {**options, "uri": True}},
+                alias="replica-profile",
+            )
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute("PRAGMA journal_mode")
+                    self.assertEqual(cursor.fetchone()[0], "delete")
+                    cursor.execute("PRAGMA temp_store")
+                    self.assertEqual(cursor.fetchone()[0], 2)
+            finally:
+                wrapper.close()
+
+
+class ReadReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch("polls.routers.read_alias", return_value="replica")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = ReadReplicaRouter()
+
+    def test_reads_go_to_replica_only_inside_scope(self):
+        self.assertIsNone(self.router.db_for_read(Submission))
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Submission), "replica")
+            self.assertEqual(self.router.db_for_write(Submission), "default")
+            with primary_reads():
+                self.assertIsNone(self.router.db_for_read(Submission))
+        self.assertIsNone(self.router.db_for_read(Submission))
+
+    def test_streaming_body_is_read_inside_scope(self):
+        seen = []
+
+        def body():
+            for _ in range(2):
+                seen.append(self.router.db_for_read(Submission))
+                yield "x"
+
+        @reads_from_replica
+        def view(request):
+            return StreamingHttpResponse(body())
+
+        response = view(None)
+        self.assertEqual(seen, [])
+        self.assertEqual(b"".join(response.streaming_content), b"xx")
+        self.assertEqual(seen, ["replica", "replica"])
+        self.assertIsNone(self.router.db_for_read(Submission))
+
+    def test_unknown_alias_falls_back_to_primary(self):
+        mock.patch.stopall()
+        with override_settings(POLLS_READ_DATABASE="nope"), replica_reads():
+            self.assertIsNone(self.router.db_for_read(Submission))
+
+
+# config/test_settings.py добавляет зеркало, если настоящей реплики нет
+REPLICA = settings.DATABASES.get("replica")
+REPLICA_IS_MIRROR = bool(REPLICA and REPLICA["TEST"].get("MIRROR"))
+
+
+@skipUnless(REPLICA_IS_MIRROR, "нужно зеркало replica из config/test_settings.py")
+@override_settings(POLLS_READ_DATABASE="replica")
+class ReadReplicaRoutingTests(TransactionTestCase):
+    """
+    Алиас replica — зеркало основной тестовой БД (config/settings.py). TransactionTestCase:
+    зеркало — отдельное соединение и видит только зафиксированные данные.
+    Проверяется, какое соединение обслуживает чтения.
+    """
+
+    databases = {"default", "replica"} & set(settings.DATABASES)
+
+    def setUp(self):
+        cache.clear()
+        self.owner = get_user_model().objects.create_user(username="routing", password="pass12345")
+        self.poll = make_quiz("routing", 3)
+        self.poll.owner = self.owner
+        self.poll.save()
+
+    def test_reads_are_routed_by_page(self):
+        url = f"/p/{self.poll.access_code}/"
+        self.client.get(url)  # структура опроса — в кэше до замера
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            resp = self.client.post(url, data=quiz_post_data(self.poll))
+            self.assertEqual(resp.status_code, 302)
+            thanks = self.client.get(reverse("polls:poll_thanks", kwargs={"access_code": self.poll.access_code}))
+            self.assertEqual(thanks.context["submission"].score, 2)
+        self.assertEqual(len(replica), 0)
+
+        self.client.force_login(self.owner)
+        heavy = [
+            reverse("polls:project_stats", args=[self.poll.id]),
+            reverse("polls:project_export", args=[self.poll.id, "ndjson"]),
+            f"{reverse('polls:live_vote_count')}?code={self.poll.access_code}",
+        ]
+        for url in heavy:
+            with self.subTest(url=url), CaptureQueriesContext(connections["replica"]) as replica:
+                resp = self.client.get(url)
+                if resp.streaming:
+                    b"".join(resp.streaming_content)
+                self.assertEqual(resp.status_code, 200)
+                self.assertGreater(len(replica), 0)
+
+    @override_settings(POLLS_READ_DATABASE=None)
+    def test_without_read_database_everything_reads_primary(self):
+        self.client.force_login(self.owner)
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            self.client.get(reverse("polls:project_stats", args=[self.poll.id]))
+        self.assertEqual(len(replica), 0)
+
+
+@skipUnless(REPLICA and not REPLICA_IS_MIRROR, "нужна отдельная реплика (DATABASE_REPLICA_URL / DJANGO_SQLITE_REPLICA_PATH)")
+@override_settings(POLLS_READ_DATABASE="replica")
+class ReadReplicaDatabaseTests(TestCase):
+    """
+    Две отдельные тестовые БД: отправка пишется только на основную, реплика «отстаёт».
+    Запуск: DJANGO_SQLITE_REPLICA_PATH=/tmp/replica.sqlite3 python manage.py test polls.tests.ReadReplicaDatabaseTests
+    """
+
+    databases = {"default", "replica"} & set(settings.DATABASES)
+
+    def setUp(self):
+        cache.clear()
+        self.owner = get_user_model().objects.create_user(username="replica", password="pass12345")
+        self.poll = make_quiz("replica", 3)
+        self.poll.owner = self.owner
+        self.poll.save()
+        data = quiz_post_data(self.poll)
+        # Реплика знает опрос и владельца, но ещё не получила отправку
+        get_user_model().objects.using("replica").bulk_create([self.owner])
+        Poll.objects.using("replica").bulk_create([self.poll])
+        resp = self.client.post(f"/p/{self.poll.access_code}/", data=data)
+        self.assertEqual(resp.status_code, 302)
+
+    def test_thanks_reads_own_write_from_primary(self):
+        resp = self.client.get(reverse("polls:poll_thanks", kwargs={"access_code": self.poll.access_code}))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context["submission"].score, 2)
+
+    def test_heavy_reads_come_from_replica(self):
+        self.client.force_login(self.owner)
+        stats = self.client.get(reverse("polls:project_stats", args=[self.poll.id]))
+        self.assertEqual(stats.context["total_submissions"], 0)
+
+        export = self.client.get(reverse("polls:project_export", args=[self.poll.id, "ndjson"]))
+        self.assertEqual(b"".join(export.streaming_content), b"")
+
+        live = self.client.get(reverse("polls:live_vote_count"), {"code": self.poll.access_code})
+        self.assertEqual(live.json()["total_submissions"], 0)
+        self.assertEqual(Submission.objects.count(), 1)
+
+
+class AccessCodeReservationTests(TestCase):
+    def test_default_code_needs_no_lookup(self):
+        with CaptureQueriesContext(connection) as ctx:
+            poll = Poll.objects.create(title="no lookup")
+        self.assertEqual([q["sql"].split()[0] for q in ctx.captured_queries if "polls_poll" in q["sql"]], ["INSERT"])
+        self.assertEqual(len(poll.access_code), ACCESS_CODE_LENGTH)
+
+    def test_collision_with_generated_code_is_retried(self):
+        Poll.objects.create(title="taken", access_code="TAKEN001")
+        codes = iter(["TAKEN001", "FREE0001"])
+        with mock.patch("polls.models.random_access_code", side_effect=lambda rng=None: next(codes)):
+            poll = Poll.objects.create(title="retry")
+        self.assertEqual(poll.access_code, "FREE0001")
+
+    def test_explicit_duplicate_code_still_fails(self):
+        Poll.objects.create(title="taken", access_code="TAKEN001")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Poll.objects.create(title="dup", access_code="TAKEN001")
+
+    def test_reserve_skips_taken_codes_in_one_query(self):
+        Poll.objects.create(title="taken", access_code="TAKEN001")
+        codes = iter(["TAKEN001"] + [f"C{i:07d}" for i in range(100)])
+        with mock.patch("polls.services.access_codes.random_access_code", side_effect=lambda rng=None: next(codes)):
+            with self.assertNumQueries(1):
+                reserved = reserve_access_codes(5)
+        self.assertEqual(len(set(reserved)), 5)
+        self.assertNotIn("TAKEN001", reserved)
+
+    def test_reserve_is_reproducible_with_rng(self):
+        self.assertEqual(
+            reserve_access_codes(3, rng=random.Random(7)),
+            reserve_access_codes(3, rng=random.Random(7)),
+        )
+
+    def test_bulk_create_polls_in_fixed_queries(self):
+        polls = [Poll(title=f"bulk {i}") for i in range(50)] + [Poll(title="explicit", access_code="EXPLICIT")]
+        with self.assertNumQueries(4):  # SELECT … IN, SAVEPOINT, INSERT, RELEASE
+            created = bulk_create_polls(polls)
+        codes = [poll.access_code for poll in created]
+        self.assertEqual(len(set(codes)), 51)
+        self.assertIn("EXPLICIT", codes)
+        self.assertEqual(Poll.objects.count(), 51)
+
+    def test_bulk_create_retries_when_reserved_code_is_taken_meanwhile(self):
+        Poll.objects.create(title="taken", access_code="TAKEN001")
+        batches = iter([["TAKEN001", "FRESH001"], ["FRESH002", "FRESH003"]])
+        with mock.patch(
+            "polls.services.access_codes.reserve_access_codes",
+            side_effect=lambda count, **kwargs: next(batches),
+        ):
+            created = bulk_create_polls([Poll(title="a"), Poll(title="b")])
+        self.assertEqual(sorted(p.access_code for p in created), ["FRESH002", "FRESH003"])
+
+
+class PollTransferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = get_user_model().objects.create_user(username="transfer", password="pass12345")
+        self.poll = make_quiz("transfer", 6)
+        self.poll.owner = self.owner
+        self.poll.description = "описание"
+        self.poll.time_limit_minutes = 10
+        self.poll.save()
+
+    def structure(self, poll):
+        return [
+            (q.order, q.text, q.kind, q.is_test_question, [(c.text, c.is_correct) for c in q.choices.order_by("id")])
+            for q in poll.questions.order_by("order")
+        ]
+
+    def test_clone_copies_structure_but_not_submissions(self):
+        save_submission(self.poll, parsed_answers(self.poll), session_key="s")
+        copy = clone_poll(self.poll, owner=self.owner)
+        self.assertNotEqual(copy.access_code, self.poll.access_code)
+        self.assertEqual(copy.title, "transfer (копия)")
+        self.assertEqual((copy.description, copy.time_limit_minutes), ("описание", 10))
+        self.assertEqual(self.structure(copy), self.structure(self.poll))
+        self.assertFalse(copy.submissions.exists())
+        # Копию можно сразу проходить: структура и ключ ответов собираются с нуля
+        self.assertEqual(get_answer_key(copy.id).score([]).total, 0)
+        self.assertEqual(len(get_poll_structure(copy.access_code).questions), 6)
+
+    def test_import_of_large_bank_takes_fixed_handful_of_queries(self):
+        document = {
+            "format": "polls/1",
+            "poll": {"title": "Банк"},
+            "questions": [
+                {
+                    "text": f"Вопрос {i}",
+                    "kind": "SINGLE",
+                    "is_test_question": True,
+                    "choices": [{"text": f"{i}-{j}", "is_correct": j == 0} for j in range(4)],
+                }
+                for i in range(500)
+            ],
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            poll = import_poll(document, owner=self.owner)
+        # Poll + пачки bulk_create (на SQLite режутся по лимиту параметров) + SAVEPOINT'ы
+        self.assertLess(len(ctx), 20)
+        self.assertEqual(poll.questions.count(), 500)
+        self.assertEqual(Choice.objects.filter(question__poll=poll, is_correct=True).count(), 500)
+        self.assertEqual(list(poll.questions.values_list("order", flat=True)), list(range(1, 501)))
+
+    def test_orders_are_renumbered_keeping_file_order(self):
+        document = {
+            "format": "polls/1",
+            "poll": {"title": "Порядок"},
+            "questions": [
+                {"text": "b", "order": 5},
+                {"text": "c", "order": 5},
+                {"text": "a", "order": 2},
+            ],
+        }
+        poll = import_poll(document, owner=self.owner)
+        self.assertEqual(list(poll.questions.values_list("order", "text")), [(1, "a"), (2, "b"), (3, "c")])
+
+    def test_invalid_document_creates_nothing(self):
+        before = Poll.objects.count()
+        bad_documents = [
+            {"format": "other"},
+            {"format": "polls/1", "poll": {"title": ""}},
+            {"format": "polls/1", "poll": {"title": "x"}, "questions": [{"text": "t", "kind": "TEXT", "is_test_question": True}]},
+            {"format": "polls/1", "poll": {"title": "x"}, "questions": [{"text": "t", "kind": "NOPE"}]},
+            {"format": "polls/1", "poll": {"title": "x"}, "questions": [{"text": "t", "kind": "SINGLE", "choices": [{"text": "x" * 201}]}]},
+            # Правила форм: варианты у TEXT, правильный вариант у нетестового вопроса
+            {"format": "polls/1", "poll": {"title": "x"}, "questions": [{"text": "t", "kind": "TEXT", "choices": [{"text": "a"}]}]},
+            {"format": "polls/1", "poll": {"title": "x"}, "questions": [
+                {"text": "t", "kind": "SINGLE", "choices": [{"text": "a", "is_correct": True}]},
+            ]},
+        ]
+        for document in bad_documents:
+            with self.subTest(document=document), self.assertRaises(PollImportError):
+                import_poll(document, owner=self.owner)
+        self.assertEqual(Poll.objects.count(), before)
+
+    def test_clone_drops_leftovers_the_forms_would_reject(self):
+        # Тип сменили формой: у вопросов остались варианты и отметки правильных
+        self.poll.questions.filter(kind=Question.Kind.SINGLE).update(is_test_question=False)
+        self.poll.questions.filter(kind=Question.Kind.MULTI).update(kind=Question.Kind.TEXT, is_test_question=False)
+        clone = clone_poll(self.poll, owner=self.owner)
+        self.assertFalse(Choice.objects.filter(question__poll=clone, is_correct=True).exists())
+        self.assertFalse(Choice.objects.filter(question__poll=clone, question__kind=Question.Kind.TEXT).exists())
+        self.assertEqual(clone.questions.count(), self.poll.questions.count())
+
+    def test_export_import_and_clone_views(self):
+        self.client.force_login(self.owner)
+        exported = self.client.get(reverse("polls:project_export_json", args=[self.poll.id]))
+        self.assertIn("attachment", exported["Content-Disposition"])
+
+        upload = SimpleUploadedFile("poll.json", exported.content, content_type="application/json")
+        resp = self.client.post(reverse("polls:project_import"), {"file": upload})
+        imported = Poll.objects.exclude(pk=self.poll.pk).get()
+        self.assertRedirects(resp, reverse("polls:project_detail", args=[imported.id]))
+        self.assertEqual(imported.owner, self.owner)
+        self.assertEqual(self.structure(imported), self.structure(self.poll))
+
+        broken = SimpleUploadedFile("poll.json", b"{not json", content_type="application/json")
+        resp = self.client.post(reverse("polls:project_import"), {"file": broken})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.context["form"].errors)
+
+        clone_url = reverse("polls:project_clone", args=[self.poll.id])
+        self.assertEqual(self.client.get(clone_url).status_code, 405)
+        resp = self.client.post(clone_url)
+        self.assertEqual(Poll.objects.filter(owner=self.owner).count(), 3)
+
+        stranger = get_user_model().objects.create_user(username="stranger", password="pass12345")
+        self.client.force_login(stranger)
+        self.assertEqual(self.client.post(clone_url).status_code, 404)
+        self.assertEqual(self.client.get(reverse("polls:project_export_json", args=[self.poll.id])).status_code, 404)
+
+
+class QuestionReorderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = get_user_model().objects.create_user(username="reorder", password="pass12345")
+        self.client.force_login(self.owner)
+
+    def make_poll(self, title, n):
+        poll = make_quiz(title, n)
+        poll.owner = self.owner
+        poll.save()
+        return poll
+
+    def post(self, poll, payload):
+        return self.client.post(
+            reverse("polls:question_reorder", args=[poll.id]),
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+
+    def ids(self, poll):
+        return list(poll.questions.order_by("order").values_list("id", flat=True))
+
+    def test_reverse_order_in_constant_queries(self):
+        counts = []
+        for title, n in (("small", 3), ("large", 40)):
+            poll = self.make_poll(title, n)
+            get_poll_structure(poll.access_code)
+            wanted = self.ids(poll)[::-1]
+            with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+                resp = self.post(poll, {"order": wanted})
+            self.assertEqual(resp.json(), {"ok": True, "order": wanted})
+            counts.append(len(ctx))
+            self.assertEqual(self.ids(poll), wanted)
+            self.assertEqual(list(poll.questions.order_by("order").values_list("order", flat=True)), list(range(1, n + 1)))
+            # Кэш структуры публичной страницы видит новый порядок
+            self.assertEqual([q.id for q in get_poll_structure(poll.access_code).questions], wanted)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_rejects_incomplete_or_foreign_lists(self):
+        poll = self.make_poll("strict", 3)
+        other = self.make_poll("other", 1)
+        before = self.ids(poll)
+        for order in (before[:2], before + before[:1], before[:2] + self.ids(other), [True, 2, 3]):
+            with self.subTest(order=order):
+                resp = self.post(poll, {"order": order})
+                self.assertEqual(resp.status_code, 400)
+                self.assertFalse(resp.json()["ok"])
+        self.assertEqual(self.post(poll, ["not", "an", "object"]).status_code, 400)
+        self.assertEqual(self.ids(poll), before)
+
+    def test_only_owner_and_only_post(self):
+        poll = self.make_poll("owned", 2)
+        url = reverse("polls:question_reorder", args=[poll.id])
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.client.force_login(get_user_model().objects.create_user(username="intruder", password="pass12345"))
+        self.assertEqual(self.post(poll, {"order": self.ids(poll)[::-1]}).status_code, 404)
+
+
+class QuestionBankTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = get_user_model().objects.create_user(username="bank", password="pass12345")
+        self.client.force_login(self.owner)
+        self.entry = Question.objects.create(
+            bank_owner=self.owner, text="Столица Франции?", kind=Question.Kind.SINGLE, is_test_question=True,
+        )
+        self.paris = Choice.objects.create(question=self.entry, text="Париж", is_correct=True)
+        self.lyon = Choice.objects.create(question=self.entry, text="Лион")
+
+    def make_polls(self, n):
+        polls = []
+        start = Poll.objects.count()
+        for i in range(start, start + n):
+            poll = make_quiz(f"bank{i}", 2)
+            poll.owner = self.owner
+            poll.save()
+            add_to_poll(poll, [self.entry.id], owner=self.owner)
+            polls.append(poll)
+        return polls
+
+    def copy_in(self, poll):
+        return poll.questions.prefetch_related("choices").get(source=self.entry)
+
+    def test_add_to_poll_appends_linked_copy(self):
+        poll = make_quiz("target", 2)
+        poll.owner = self.owner
+        poll.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(
+                reverse("polls:bank_add_to_poll", args=[poll.id]), {"questions": [self.entry.id]},
+            )
+        self.assertRedirects(resp, reverse("polls:project_detail", args=[poll.id]))
+
+        copy = self.copy_in(poll)
+        self.assertEqual((copy.order, copy.text, copy.kind), (3, "Столица Франции?", Question.Kind.SINGLE))
+        self.assertEqual(
+            {(c.source_id, c.text, c.is_correct) for c in copy.choices.all()},
+            {(self.paris.id, "Париж", True), (self.lyon.id, "Лион", False)},
+        )
+        self.assertIn(copy.id, get_answer_key(poll.id))
+        self.assertEqual(get_poll_structure(poll.access_code).questions[-1].text, "Столица Франции?")
+        # Повторное добавление той же записи ничего не делает
+        self.assertEqual(add_to_poll(poll, [self.entry.id], owner=self.owner), [])
+
+    def test_bank_edit_reaches_every_copy_in_constant_queries(self):
+        counts = []
+        for n in (2, 6):
+            for poll in self.make_polls(n):
+                get_poll_structure(poll.access_code)
+                get_answer_key(poll.id)
+            self.entry.text = f"Столица Франции ({n})?"
+            self.entry.save()
+            self.lyon.is_correct = True
+            self.lyon.save()
+            Choice.objects.filter(pk=self.paris.pk).update(text=f"Париж {n}")
+            Choice.objects.create(question=self.entry, text=f"Марсель {n}")
+            with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(sync_copies(self.entry.id), Question.objects.filter(source=self.entry).count())
+            counts.append(len(ctx))
+            self.lyon.is_correct = False
+            self.lyon.save()
+
+            expected = {(c.text, c.is_correct) for c in self.entry.choices.all()} | {("Лион", True)}
+            expected.discard(("Лион", False))
+            for poll in Poll.objects.filter(questions__source=self.entry):
+                copy = self.copy_in(poll)
+                self.assertEqual(copy.text, f"Столица Франции ({n})?")
+                self.assertEqual({(c.text, c.is_correct) for c in copy.choices.all()}, expected)
+                # Кэши опросов сброшены: публичная страница и проверка видят правку
+                cached = next(q for q in get_poll_structure(poll.access_code).questions if q.id == copy.id)
+                self.assertEqual(cached.text, copy.text)
+                self.assertEqual(len(get_answer_key(poll.id).correct[copy.id]), 2)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_removed_bank_choice_is_removed_from_copies(self):
+        (poll,) = self.make_polls(1)
+        self.client.post(reverse("polls:bank_choice_delete", args=[self.entry.id, self.lyon.id]))
+        self.assertEqual([c.text for c in self.copy_in(poll).choices.all()], ["Париж"])
+
+    def test_item_stats_combine_polls_in_grouped_queries(self):
+        polls = self.make_polls(3)
+        for poll, pick in zip(polls, (self.paris, self.paris, self.lyon)):
+            data = quiz_post_data(poll)
+            copy = self.copy_in(poll)
+            data[f"q_{copy.id}"] = str(next(c.id for c in copy.choices.all() if c.source_id == pick.id))
+            self.client.post(reverse("polls:poll_public", args=[poll.access_code]), data)
+        # Отправки опроса, сделанные до добавления вопроса, на копию не отвечали
+        late = make_quiz("late", 2)
+        save_submission(late, parsed_answers(late), session_key="before")
+        add_to_poll(late, [self.entry.id], owner=self.owner)
+        unused = Question.objects.create(bank_owner=self.owner, text="Свободный", kind=Question.Kind.TEXT)
+
+        get_definitions([self.entry.id, unused.id])
+        with self.assertNumQueries(3):
+            stats = item_stats([self.entry.id, unused.id])
+        item = stats[self.entry.id]
+        self.assertEqual((item.polls, item.submissions, item.question.total_answers), (4, 3, 3))
+        self.assertEqual(
+            [(c.id, c.count, c.percent) for c in item.question.choices],
+            [(self.lyon.id, 1, 33), (self.paris.id, 2, 67)],
+        )
+        self.assertEqual((stats[unused.id].polls, stats[unused.id].question.total_answers), (0, 0))
+
+        resp = self.client.get(reverse("polls:bank_list"))
+        self.assertContains(resp, "67% (2)")
+
+    def test_copies_are_edited_only_through_bank(self):
+        (poll,) = self.make_polls(1)
+        copy = self.copy_in(poll)
+        resp = self.client.get(reverse("polls:question_edit", args=[poll.id, copy.id]))
+        self.assertRedirects(resp, reverse("polls:bank_question_edit", args=[self.entry.id]))
+
+        resp = self.client.post(
+            reverse("polls:bank_question_edit", args=[self.entry.id]),
+            {"text": "Главный город Франции?", "kind": Question.Kind.SINGLE, "is_test_question": "on"},
+        )
+        self.assertRedirects(resp, reverse("polls:bank_list"))
+        copy.refresh_from_db()
+        self.assertEqual(copy.text, "Главный город Франции?")
+
+        # Удаление записи банка оставляет копию обычным вопросом опроса
+        self.client.post(reverse("polls:bank_question_delete", args=[self.entry.id]))
+        copy.refresh_from_db()
+        self.assertIsNone(copy.source_id)
+        self.assertEqual(copy.choices.filter(source__isnull=False).count(), 0)
+
+    def test_kind_change_is_rejected_once_copies_have_answers(self):
+        (poll,) = self.make_polls(1)
+        url = reverse("polls:bank_question_edit", args=[self.entry.id])
+        multi = {"text": "Столица Франции?", "kind": Question.Kind.MULTI, "is_test_question": "on"}
+        resp = self.client.post(url, {**multi, "is_test_question": ""})
+        self.assertRedirects(resp, reverse("polls:bank_list"))
+        self.assertEqual(self.copy_in(poll).kind, Question.Kind.MULTI)
+
+        data = quiz_post_data(poll)
+        data[f"q_{self.copy_in(poll).id}"] = str(self.copy_in(poll).choices.get(source=self.paris).id)
+        self.client.post(reverse("polls:poll_public", args=[poll.access_code]), data)
+
+        for change in ({**multi, "kind": Question.Kind.SINGLE, "is_test_question": ""}, multi):
+            with self.subTest(change=change):
+                resp = self.client.post(url, change)
+                self.assertEqual(resp.status_code, 200)
+                self.assertContains(resp, "тип и признак тестового вопроса менять нельзя")
+                self.entry.refresh_from_db()
+                self.assertEqual((self.entry.kind, self.entry.is_test_question), (Question.Kind.MULTI, False))
+                self.assertEqual(self.copy_in(poll).kind, Question.Kind.MULTI)
+        # Текст по-прежнему правится
+        resp = self.client.post(url, {**multi, "text": "Город Франции?", "is_test_question": ""})
+        self.assertRedirects(resp, reverse("polls:bank_list"))
+        self.assertEqual(self.copy_in(poll).text, "Город Франции?")
+
+    def test_kind_change_is_rejected_for_answered_poll_question(self):
+        poll = make_quiz("answered", 2)
+        poll.owner = self.owner
+        poll.save()
+        question = poll.questions.get(order=1)
+        url = reverse("polls:question_edit", args=[poll.id, question.id])
+        save_submission(poll, parsed_answers(poll), session_key="s")
+
+        resp = self.client.post(url, {"text": question.text, "kind": Question.Kind.MULTI, "is_test_question": "on"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "тип и признак тестового вопроса менять нельзя")
+        question.refresh_from_db()
+        self.assertEqual(question.kind, Question.Kind.SINGLE)
+
+        resp = self.client.post(url, {"text": "Новый текст", "kind": question.kind, "is_test_question": "on"})
+        self.assertRedirects(resp, reverse("polls:project_detail", args=[poll.id]))
+
+    def test_answered_bank_choice_cannot_be_removed(self):
+        (poll,) = self.make_polls(1)
+        copy = self.copy_in(poll)
+        data = quiz_post_data(poll)
+        data[f"q_{copy.id}"] = str(copy.choices.get(source=self.lyon).id)
+        self.client.post(reverse("polls:poll_public", args=[poll.access_code]), data)
+        answer = Answer.objects.get(question=copy)
+
+        resp = self.client.post(
+            reverse("polls:bank_choice_delete", args=[self.entry.id, self.lyon.id]), follow=True,
+        )
+        self.assertContains(resp, "удалить его нельзя")
+        self.assertTrue(Choice.objects.filter(pk=self.lyon.pk).exists())
+        self.assertEqual([c.source_id for c in answer.selected_choices.all()], [self.lyon.id])
+
+        # Даже мимо формы: sync_copies не удаляет выбранный вариант из копий
+        Choice.objects.filter(pk=self.lyon.pk).delete()
+        with self.assertRaises(BankError):
+            sync_copies(self.entry.id)
+        self.assertEqual(answer.selected_choices.count(), 1)
+
+    def test_save_to_bank_and_clone_keep_links(self):
+        poll = make_quiz("adopt", 2)
+        poll.owner = self.owner
+        poll.save()
+        question = poll.questions.get(order=1)
+        resp = self.client.post(reverse("polls:question_to_bank", args=[poll.id, question.id]))
+        self.assertRedirects(resp, reverse("polls:project_detail", args=[poll.id]))
+        question.refresh_from_db()
+        entry = question.source
+        self.assertEqual((entry.poll_id, entry.bank_owner, entry.text), (None, self.owner, question.text))
+        self.assertEqual(
+            sorted(c.source.text for c in question.choices.all()),
+            sorted(c.text for c in entry.choices.all()),
+        )
+
+        clone = clone_poll(poll, owner=self.owner)
+        cloned = clone.questions.get(order=1)
+        self.assertEqual(cloned.source_id, entry.id)
+        self.assertEqual(
+            sorted(c.source_id for c in cloned.choices.all()),
+            sorted(entry.choices.values_list("id", flat=True)),
+        )
+        self.assertIsNone(clone.questions.get(order=2).source_id)
+
+    def test_bank_pages_reuse_question_and_choice_templates(self):
+        (poll,) = self.make_polls(1)
+        for url in (
+            reverse("polls:bank_question_new"),
+            reverse("polls:bank_question_edit", args=[self.entry.id]),
+            reverse("polls:bank_question_delete", args=[self.entry.id]),
+            reverse("polls:bank_choice_new", args=[self.entry.id]),
+            reverse("polls:bank_choice_edit", args=[self.entry.id, self.paris.id]),
+            reverse("polls:bank_choice_delete", args=[self.entry.id, self.paris.id]),
+        ):
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), "Назад к банку вопросов")
+        detail = self.client.get(reverse("polls:project_detail", args=[poll.id]))
+        self.assertContains(detail, reverse("polls:bank_question_edit", args=[self.entry.id]))
+
+    def test_bank_is_private(self):
+        poll = make_quiz("private", 1)
+        poll.owner = get_user_model().objects.create_user(username="other", password="pass12345")
+        poll.save()
+        self.client.force_login(poll.owner)
+        self.assertEqual(self.client.get(reverse("polls:bank_question_edit", args=[self.entry.id])).status_code, 404)
+        own = make_quiz("own", 1)
+        own.owner = poll.owner
+        own.save()
+        self.client.post(reverse("polls:bank_add_to_poll", args=[own.id]), {"questions": [self.entry.id]})
+        self.assertFalse(own.questions.filter(source=self.entry).exists())
+        self.assertNotContains(self.client.get(reverse("polls:project_detail", args=[own.id])), "Столица Франции?")
@@ -20,22 +20,39 @@ from .views.dashboard import (
     project_detail,
     project_edit,
     project_delete,
+    project_export_json,
+    project_import,
+    project_clone,
 )
 from .views.questions import (
     question_new,
     question_edit,
     question_delete,
+    question_reorder,
 )
 from .views.choices import (
     choice_new,
     choice_edit,
     choice_delete,
 )
+from .views.bank import (
+    bank_list,
+    bank_question_new,
+    bank_question_edit,
+    bank_question_delete,
+    bank_choice_new,
+    bank_choice_edit,
+    bank_choice_delete,
+    bank_add_to_poll,
+    question_to_bank,
+)
 from .views.analytics import (
     project_stats,
     project_responses,
+    project_export,
 )
-from .views.live import live_vote_count
+from .views.live import live_vote_count, live_vote_stream
+from .views.metrics import metrics
 
 app_name = "polls"
 
@@ -57,13 +74,19 @@ urlpatterns = [
     path("dashboard/project/<int:poll_id>/", project_detail, name="project_detail"),  # ✅ poll_id
     path("dashboard/project/<int:poll_id>/edit/", project_edit, name="project_edit"),  # ✅ poll_id
     path('poll/<int:pk>/delete/', project_delete, name="project_delete"),  # ✅ poll_id
+    path("dashboard/project/import/", project_import, name="project_import"),
+    path("dashboard/project/<int:poll_id>/poll.json", project_export_json, name="project_export_json"),
+    path("dashboard/project/<int:poll_id>/clone/", project_clone, name="project_clone"),
 
     # ANALYTICS: Статистика и ответы
     path("dashboard/project/<int:poll_id>/stats/", project_stats, name="project_stats"),  # ✅ poll_id
     path("dashboard/project/<int:poll_id>/responses/", project_responses, name="project_responses"),  # ✅ poll_id
+    path("dashboard/project/<int:poll_id>/export.<str:fmt>", project_export, name="project_export"),
+    path("dashboard/metrics", metrics, name="metrics"),
 
     # QUESTIONS: Управление вопросами
     path("dashboard/project/<int:poll_id>/question/new/", question_new, name="question_new"),  # ✅ poll_id
+    path("dashboard/project/<int:poll_id>/question/reorder/", question_reorder, name="question_reorder"),
     path("dashboard/project/<int:poll_id>/question/<int:question_id>/edit/", question_edit, name="question_edit"),
     path("dashboard/project/<int:poll_id>/question/<int:question_id>/delete/", question_delete, name="question_delete"),
 
@@ -72,6 +95,18 @@ urlpatterns = [
     path("dashboard/project/<int:poll_id>/question/<int:question_id>/choice/<int:choice_id>/edit/", choice_edit, name="choice_edit"),
     path("dashboard/project/<int:poll_id>/question/<int:question_id>/choice/<int:choice_id>/delete/", choice_delete, name="choice_delete"),
 
+    # BANK: Банк вопросов (общие вопросы для нескольких опросов)
+    path("dashboard/bank/", bank_list, name="bank_list"),
+    path("dashboard/bank/question/new/", bank_question_new, name="bank_question_new"),
+    path("dashboard/bank/question/<int:question_id>/edit/", bank_question_edit, name="bank_question_edit"),
+    path("dashboard/bank/question/<int:question_id>/delete/", bank_question_delete, name="bank_question_delete"),
+    path("dashboard/bank/question/<int:question_id>/choice/new/", bank_choice_new, name="bank_choice_new"),
+    path("dashboard/bank/question/<int:question_id>/choice/<int:choice_id>/edit/", bank_choice_edit, name="bank_choice_edit"),
+    path("dashboard/bank/question/<int:question_id>/choice/<int:choice_id>/delete/", bank_choice_delete, name="bank_choice_delete"),
+    path("dashboard/project/<int:poll_id>/bank/add/", bank_add_to_poll, name="bank_add_to_poll"),
+    path("dashboard/project/<int:poll_id>/question/<int:question_id>/to-bank/", question_to_bank, name="question_to_bank"),
+
     # PRESENT: Live-статистика (для презентаций)
     path("api/live/vote-count/", live_vote_count, name="live_vote_count"),
+    path("api/live/stream/", live_vote_stream, name="live_vote_stream"),
 ]
\ No newline at end of file
@@ -3,12 +3,15 @@ from .public import *
 from .dashboard import *
 from .questions import *
 from .choices import *
+from .bank import *
 from .analytics import *
 from .live import *
+from .metrics import *
 from .auth import *
 
 # Специально для AJAX вьюхи
 from .choices import choice_new, choice_edit, choice_delete
-from .analytics import project_stats, project_responses
-from .live import live_vote_count
+from .analytics import project_stats, project_responses, project_export
+from .live import live_vote_count, live_vote_stream
+from .metrics import metrics
 from .auth import signup
\ No newline at end of file
@@ -0,0 +1,166 @@
+# polls/views/bank.py
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import HttpRequest, HttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+
+from ..forms import ChoiceForm, QuestionForm
+from ..models import Choice, Poll, Question
+from ..services.bank import (
+    BankError, add_to_poll, check_choice_removal, item_stats, save_to_bank, sync_copies,
+)
+
+
+def _bank_question(request: HttpRequest, question_id: int) -> Question:
+    return get_object_or_404(Question, id=question_id, poll__isnull=True, bank_owner=request.user)
+
+
+def _synced(request: HttpRequest, question: Question) -> None:
+    copies = sync_copies(question.id)
+    if copies:
+        messages.success(request, f"Изменения применены во всех опросах с этим вопросом ({copies}).")
+
+
+@login_required
+def bank_list(request: HttpRequest) -> HttpResponse:
+    """Банк вопросов владельца со сводной статистикой по всем опросам."""
+    ids = list(
+        Question.objects
+        .filter(poll__isnull=True, bank_owner=request.user)
+        .order_by("text", "id")
+        .values_list("id", flat=True)
+    )
+    stats = item_stats(ids)
+    return render(request, "dashboard/bank_list.html", {
+        "items": [stats[qid] for qid in ids if qid in stats],
+    })
+
+
+@login_required
+def bank_question_new(request: HttpRequest) -> HttpResponse:
+    if request.method == "POST":
+        form = QuestionForm(request.POST)
+        if form.is_valid():
+            question = form.save(commit=False)
+            question.bank_owner = request.user
+            question.save()
+            return redirect("polls:bank_list")
+    else:
+        form = QuestionForm()
+    return render(request, "dashboard/question_form.html", {
+        "form": form, "back_url": reverse("polls:bank_list"), "title": "Новый вопрос банка",
+    })
+
+
+@login_required
+def bank_question_edit(request: HttpRequest, question_id: int) -> HttpResponse:
+    question = _bank_question(request, question_id)
+    if request.method == "POST":
+        form = QuestionForm(request.POST, instance=question)
+        # Смену типа у вопроса с ответами отклоняет сама форма (check_kind_change)
+        if form.is_valid():
+            form.save()
+            _synced(request, question)
+            return redirect("polls:bank_list")
+    else:
+        form = QuestionForm(instance=question)
+    return render(request, "dashboard/question_form.html", {
+        "form": form, "question": question, "back_url": reverse("polls:bank_list"),
+        "title": "Редактировать вопрос банка",
+    })
+
+
+@login_required
+def bank_question_delete(request: HttpRequest, question_id: int) -> HttpResponse:
+    question = _bank_question(request, question_id)
+    if request.method == "POST":
+        # Копии в опросах остаются обычными вопросами — вместе с ответами на них
+        question.delete()
+        return redirect("polls:bank_list")
+    return render(request, "dashboard/question_delete.html", {
+        "question": question, "back_url": reverse("polls:bank_list"),
+    })
+
+
+@login_required
+def bank_choice_new(request: HttpRequest, question_id: int) -> HttpResponse:
+    question = _bank_question(request, question_id)
+    if request.method == "POST":
+        form = ChoiceForm(request.POST, question=question)
+        if form.is_valid():
+            form.save()
+            _synced(request, question)
+            return redirect("polls:bank_list")
+    else:
+        form = ChoiceForm(question=question)
+    return render(request, "dashboard/choice_form.html", {
+        "form": form, "question": question, "back_url": reverse("polls:bank_list"), "title": "Новый вариант",
+    })
+
+
+@login_required
+def bank_choice_edit(request: HttpRequest, question_id: int, choice_id: int) -> HttpResponse:
+    question = _bank_question(request, question_id)
+    choice = get_object_or_404(Choice, id=choice_id, question=question)
+    if request.method == "POST":
+        form = ChoiceForm(request.POST, instance=choice, question=question)
+        if form.is_valid():
+            form.save()
+            _synced(request, question)
+            return redirect("polls:bank_list")
+    else:
+        form = ChoiceForm(instance=choice, question=question)
+    return render(request, "dashboard/choice_form.html", {
+        "form": form, "question": question, "choice": choice, "back_url": reverse("polls:bank_list"),
+        "title": "Редактировать вариант",
+    })
+
+
+@login_required
+def bank_choice_delete(request: HttpRequest, question_id: int, choice_id: int) -> HttpResponse:
+    question = _bank_question(request, question_id)
+    choice = get_object_or_404(Choice, id=choice_id, question=question)
+    if request.method == "POST":
+        try:
+            with transaction.atomic():
+                check_choice_removal(choice)
+                choice.delete()
+                _synced(request, question)
+        except BankError as exc:
+            messages.error(request, str(exc))
+        return redirect("polls:bank_list")
+    return render(request, "dashboard/choice_delete.html", {
+        "question": question, "choice": choice, "back_url": reverse("polls:bank_list"),
+    })
+
+
+@login_required
+@require_POST
+def bank_add_to_poll(request: HttpRequest, poll_id: int) -> HttpResponse:
+    poll = get_object_or_404(Poll, id=poll_id, owner=request.user)
+    try:
+        question_ids = [int(qid) for qid in request.POST.getlist("questions")]
+        copies = add_to_poll(poll, question_ids, owner=request.user)
+    except ValueError:  # не число или не запись банка владельца (BankError)
+        messages.error(request, "Выберите вопросы из своего банка.")
+    else:
+        if copies:
+            messages.success(request, f"Добавлено вопросов из банка: {len(copies)}.")
+    return redirect("polls:project_detail", poll_id=poll.id)
+
+
+@login_required
+@require_POST
+def question_to_bank(request: HttpRequest, poll_id: int, question_id: int) -> HttpResponse:
+    poll = get_object_or_404(Poll, id=poll_id, owner=request.user)
+    question = get_object_or_404(Question, id=question_id, poll=poll)
+    try:
+        save_to_bank(question, owner=request.user)
+    except BankError as exc:
+        messages.error(request, str(exc))
+    else:
+        messages.success(request, "Вопрос сохранён в банк — его можно добавлять в другие опросы.")
+    return redirect("polls:project_detail", poll_id=poll.id)
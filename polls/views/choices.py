@@ -1,4 +1,5 @@
 # polls/views/choices.py
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
@@ -11,6 +12,9 @@ from ..models import Choice, Poll, Question
 def choice_new(request: HttpRequest, poll_id: int, question_id: int) -> HttpResponse:
     poll = get_object_or_404(Poll, id=poll_id, owner=request.user)
     question = get_object_or_404(Question, id=question_id, poll=poll)
+    if question.source_id:
+        messages.info(request, "Вопрос взят из банка — правьте его в банке вопросов.")
+        return redirect("polls:bank_question_edit", question_id=question.source_id)
 
     if request.method == "POST":
         form = ChoiceForm(request.POST, question=question)  # ✅ ВАЖНО
@@ -36,6 +40,9 @@ def choice_new(request: HttpRequest, poll_id: int, question_id: int) -> HttpResp
 def choice_edit(request: HttpRequest, poll_id: int, question_id: int, choice_id: int) -> HttpResponse:
     poll = get_object_or_404(Poll, id=poll_id, owner=request.user)
     question = get_object_or_404(Question, id=question_id, poll=poll)
+    if question.source_id:
+        messages.info(request, "Вопрос взят из банка — правьте его в банке вопросов.")
+        return redirect("polls:bank_question_edit", question_id=question.source_id)
     choice = get_object_or_404(Choice, id=choice_id, question=question)
     if request.method == "POST":
         form = ChoiceForm(request.POST, instance=choice, question=question)
@@ -53,6 +60,9 @@ def choice_edit(request: HttpRequest, poll_id: int, question_id: int, choice_id:
 def choice_delete(request: HttpRequest, poll_id: int, question_id: int, choice_id: int) -> HttpResponse:
     poll = get_object_or_404(Poll, id=poll_id, owner=request.user)
     question = get_object_or_404(Question, id=question_id, poll=poll)
+    if question.source_id:
+        messages.info(request, "Вопрос взят из банка — правьте его в банке вопросов.")
+        return redirect("polls:bank_question_edit", question_id=question.source_id)
     choice = get_object_or_404(Choice, id=choice_id, question=question)
     if request.method == "POST":
         choice.delete()
@@ -1,11 +1,15 @@
 # polls/views/dashboard.py
+import json
+
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpRequest, HttpResponse
+from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import require_POST
 
-from ..forms import PollForm
-from ..models import Poll
+from ..forms import PollForm, PollImportForm
+from ..models import Poll, Question
+from ..services.transfer import PollImportError, clone_poll, export_poll, import_poll
 
 
 @login_required
@@ -37,9 +41,19 @@ def project_detail(request: HttpRequest, poll_id: int) -> HttpResponse:
         .prefetch_related("choices")
     )
 
+    # Записи банка владельца, которых ещё нет в опросе
+    bank_questions = (
+        Question.objects
+        .filter(poll__isnull=True, bank_owner=request.user)
+        .exclude(copies__poll=poll)
+        .order_by("text", "id")
+        .only("id", "text")
+    )
+
     return render(request, "dashboard/project_detail.html", {
         "poll": poll,
         "questions": questions,
+        "bank_questions": bank_questions,
     })
 @login_required
 def project_edit(request: HttpRequest, poll_id: int) -> HttpResponse:
@@ -54,6 +68,44 @@ def project_edit(request: HttpRequest, poll_id: int) -> HttpResponse:
     return render(request, "dashboard/poll_form.html", {"form": form, "title": "Редактировать", "poll": poll})
 
 
+@login_required
+def project_export_json(request: HttpRequest, poll_id: int) -> JsonResponse:
+    """Опрос целиком (вопросы, варианты, правильные ответы) одним JSON-файлом."""
+    poll = get_object_or_404(Poll, pk=poll_id, owner=request.user)
+    response = JsonResponse(export_poll(poll), json_dumps_params={"ensure_ascii": False, "indent": 2})
+    response["Content-Disposition"] = f'attachment; filename="poll-{poll.id}.json"'
+    return response
+
+
+@login_required
+def project_import(request: HttpRequest) -> HttpResponse:
+    if request.method == "POST":
+        form = PollImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                document = json.loads(form.cleaned_data["file"].read())
+                poll = import_poll(document, owner=request.user)
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                form.add_error("file", "Файл не является корректным JSON")
+            except PollImportError as exc:
+                form.add_error("file", str(exc))
+            else:
+                messages.success(request, f'Опрос "{poll.title}" загружен.')
+                return redirect("polls:project_detail", poll_id=poll.id)
+    else:
+        form = PollImportForm()
+    return render(request, "dashboard/poll_import.html", {"form": form})
+
+
+@login_required
+@require_POST
+def project_clone(request: HttpRequest, poll_id: int) -> HttpResponse:
+    poll = get_object_or_404(Poll, pk=poll_id, owner=request.user)
+    copy = clone_poll(poll, owner=request.user)
+    messages.success(request, f'Создана копия опроса "{poll.title}".')
+    return redirect("polls:project_detail", poll_id=copy.id)
+
+
 def project_delete(request, pk):
     poll = get_object_or_404(Poll, pk=pk)
 
@@ -1,65 +1,90 @@
 # polls/views/live.py
-from django.http import HttpRequest, JsonResponse
-from django.shortcuts import get_object_or_404
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import (
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils.http import parse_etags
 from django.views.decorators.http import require_http_methods
-from django.db.models import Count, Q
 
-from ..models import Answer, Poll, Question
+from ..models import Poll
+from ..routers import reads_from_replica
+from ..services.live_hub import get_hub
+from ..services.snapshots import SnapshotBusy, get_live_snapshot
+from ..services.stats import poll_stats
 
 @require_http_methods(["GET"])
-def live_vote_count(request: HttpRequest) -> JsonResponse:
+@reads_from_replica
+def live_vote_count(request: HttpRequest) -> HttpResponse:
     code = request.GET.get("code", "").strip().upper()
     if not code:
         return JsonResponse({"ok": False, "error": "code required"}, status=400)
 
-    poll = get_object_or_404(Poll, access_code=code)
-    total = poll.submissions.count()
+    # Общий для всех запросов снимок из кэша (см. services/snapshots.py)
+    try:
+        snapshot = get_live_snapshot(code)
+    except SnapshotBusy:
+        response = JsonResponse({"ok": False, "error": "busy"}, status=503)
+        response["Retry-After"] = "1"
+        return response
+    if snapshot is None:
+        raise Http404("Опрос не найден")
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and (if_none_match.strip() == "*" or snapshot.etag in parse_etags(if_none_match)):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(snapshot.body, content_type="application/json")
+    response["ETag"] = snapshot.etag
+    response["Cache-Control"] = "no-cache"
+    return response
 
-    questions_data = []
 
-    questions = (
-        poll.questions
-        .prefetch_related("choices", "answers")
-        .order_by("order")
-    )
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-    for q in questions:
-        if q.kind == Question.Kind.TEXT:
-            count = q.answers.exclude(text_value="").count()
-            questions_data.append({
-                "kind": "TEXT",
-                "text": q.text,
-                "count": count,
-            })
-            continue
 
-        choices = (
-            q.choices
-            .annotate(
-                count=Count(
-                    "answers",
-                    filter=Q(answers__submission__poll=poll)
-                )
-            )
-            .order_by("id")
-        )
+@require_http_methods(["GET"])
+async def live_vote_stream(request: HttpRequest) -> StreamingHttpResponse | JsonResponse:
+    """
+    SSE-поток live-статистики: сначала событие snapshot (как live_vote_count),
+    затем delta при каждой новой отправке. Работает под ASGI (config.asgi);
+    под WSGI отдаёт один snapshot и просит клиента переподключиться (retry).
+    """
+    code = request.GET.get("code", "").strip().upper()
+    if not code:
+        return JsonResponse({"ok": False, "error": "code required"}, status=400)
+
+    poll_id = await Poll.objects.filter(access_code=code).values_list("id", flat=True).afirst()
+    if poll_id is None:
+        raise Http404("Опрос не найден")
 
-        questions_data.append({
-            "kind": q.kind,
-            "text": q.text,
-            "choices": [
-                {
-                    "text": c.text,
-                    "count": c.count,
-                    "is_correct": c.is_correct,
-                }
-                for c in choices
-            ],
-        })
+    if not hasattr(request, "scope"):
+        # WSGI: держать воркер бесконечным потоком нельзя — деградируем до опроса
+        stats = await sync_to_async(poll_stats)(poll_id)
+        body = "retry: 5000\n" + _sse("snapshot", stats.to_dict())
+        return StreamingHttpResponse(iter([body]), content_type="text/event-stream")
 
-    return JsonResponse({
-        "ok": True,
-        "total_submissions": total,
-        "questions": questions_data,
-    })
+    async def stream():
+        hub = get_hub()
+        subscriber = hub.subscribe(poll_id)
+        try:
+            yield "retry: 3000\n\n"
+            async for item in subscriber.events():
+                if item is None:
+                    yield ": ping\n\n"
+                else:
+                    yield _sse(*item)
+        finally:
+            hub.unsubscribe(subscriber)
 
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx: не буферизовать поток
+    return response
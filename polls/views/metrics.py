@@ -0,0 +1,27 @@
+# polls/views/metrics.py
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpRequest, HttpResponse
+from django.views.decorators.http import require_http_methods
+
+from ..services.metrics import registry
+
+
+def _can_scrape(request: HttpRequest) -> bool:
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    token = getattr(settings, "POLLS_METRICS_TOKEN", "")
+    auth = request.headers.get("Authorization", "")
+    return bool(token) and hmac.compare_digest(auth, f"Bearer {token}")
+
+
+@require_http_methods(["GET"])
+def metrics(request: HttpRequest) -> HttpResponse:
+    """Метрики RequestMetricsMiddleware в формате Prometheus (staff или Bearer POLLS_METRICS_TOKEN)."""
+    if not getattr(settings, "POLLS_METRICS_ENABLED", False) or not _can_scrape(request):
+        raise Http404
+    return HttpResponse(
+        registry.render_prometheus(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -1,12 +1,19 @@
-from django.db import transaction
-from django.http import HttpRequest, HttpResponse
+from django.conf import settings
+from django.http import Http404, HttpRequest, HttpResponse, HttpResponseBadRequest, HttpResponseNotModified
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.http import parse_etags
 from django.views.decorators.http import require_http_methods
 
-import io
-from ..models import Answer, Choice, Poll, Question, Submission
+from ..models import Poll, Submission
+from ..services.batcher import write_submission
+from ..services.ingest import enqueue_submission, pending_for, queue_enabled
+from ..services.participants import get_participant, remember_participant
+from ..services.qr import FORMATS as QR_FORMATS, MAX_AGE as QR_MAX_AGE, get_qr_image, parse_size as parse_qr_size
+from ..services.scoring import get_answer_key
+from ..services.structure import get_poll_structure
+from ..services.submissions import DuplicateSubmission, StaleSubmission, collect_answers
 
 
 @require_http_methods(["GET"])
@@ -23,28 +30,46 @@ def poll_code_redirect(request: HttpRequest) -> HttpResponse:
     return redirect(reverse("polls:poll_public", kwargs={"access_code": code}))
 
 
+def _fragment_context(structure) -> dict:
+    """Параметры кэша разметки вопросов ({% cache %} в polls/poll_public.html)."""
+    return {
+        "structure_version": structure.version,
+        "fragment_timeout": getattr(settings, "POLLS_PUBLIC_FRAGMENT_CACHE_TIMEOUT", 3600),
+    }
+
+
 @require_http_methods(["GET", "POST"])
 def poll_public(request: HttpRequest, access_code: str) -> HttpResponse:
-    poll = get_object_or_404(Poll, access_code=access_code)
-    questions = poll.questions.prefetch_related("choices").order_by("order", "id")
+    # Структура опроса (метаданные, вопросы, варианты) — из кэша, без запросов к БД
+    structure = get_poll_structure(access_code)
+    if structure is None:
+        raise Http404("Опрос не найден")
+
+    # Анонимный участник — подписанная cookie, вошедший — его сессия (services/participants.py)
+    participant = get_participant(request)
+    response = _poll_public(request, structure, participant)
+    return remember_participant(response, participant)
+
+
+def _poll_public(request: HttpRequest, structure, participant) -> HttpResponse:
+    poll = structure.poll
+    questions = structure.questions
 
     # ───── идентификация ─────
     user = request.user if request.user.is_authenticated else None
 
-    if not request.session.session_key:
-        request.session.create()
-    session_key = request.session.session_key
-
     # ───── ограничение повторного прохождения (GET + POST) ─────
     if not poll.allow_multiple_submissions:
         if user:
-            exists = Submission.objects.filter(poll=poll, user=user).exists()
+            exists = Submission.objects.filter(poll_id=poll.id, user=user).exists()
         else:
             exists = Submission.objects.filter(
-                poll=poll,
+                poll_id=poll.id,
                 user__isnull=True,
-                session_key=session_key,
+                session_key=participant.id,
             ).exists()
+        if not exists and queue_enabled():
+            exists = pending_for(poll.id, user=user, session_key=participant.id).exists()
 
         if exists:
             return render(
@@ -55,17 +80,13 @@ def poll_public(request: HttpRequest, access_code: str) -> HttpResponse:
 
     # ✅ Стартуем таймер, если есть ограничение
     if poll.has_time_limit:
-        timer_key = f"poll_start_time_{poll.id}"
-        if timer_key not in request.session:
-            request.session[timer_key] = timezone.now().timestamp()
-            request.session.save()
+        participant.start_timer(poll.id)
 
     # ───── POST ─────
     if request.method == "POST":
         # ✅ Проверка времени (если ограничение есть)
         if poll.has_time_limit:
-            timer_key = f"poll_start_time_{poll.id}"
-            start_time = request.session.get(timer_key)
+            start_time = participant.started_at(poll.id)
             if not start_time:
                 return render(request, "polls/poll_timeout.html", {
                     "poll": poll,
@@ -80,40 +101,8 @@ def poll_public(request: HttpRequest, access_code: str) -> HttpResponse:
                     "limit": poll.time_limit_minutes,
                 })
 
-        # Валидация ответов
-        answers_data = []
-        errors = []
-
-        for q in questions:
-            field_name = f"q_{q.id}"
-            if q.kind == Question.Kind.TEXT:
-                text_value = (request.POST.get(field_name) or "").strip()
-                if not text_value:
-                    errors.append({"question_id": q.id, "message": "Введите ответ"})
-                else:
-                    answers_data.append(("TEXT", q, text_value))
-
-            elif q.kind == Question.Kind.SINGLE:
-                choice_id = request.POST.get(field_name)
-                if not choice_id or not choice_id.isdigit():
-                    errors.append({"question_id": q.id, "message": "Выберите один вариант"})
-                else:
-                    try:
-                        choice = Choice.objects.get(id=int(choice_id), question=q)
-                        answers_data.append(("SINGLE", q, choice))
-                    except Choice.DoesNotExist:
-                        errors.append({"question_id": q.id, "message": "Некорректный вариант"})
-
-            elif q.kind == Question.Kind.MULTI:
-                choice_ids = request.POST.getlist(field_name)
-                if not choice_ids:
-                    errors.append({"question_id": q.id, "message": "Выберите хотя бы один"})
-                else:
-                    choices = list(Choice.objects.filter(id__in=choice_ids, question=q))
-                    if not choices:
-                        errors.append({"question_id": q.id, "message": "Некорректные варианты"})
-                    else:
-                        answers_data.append(("MULTI", q, choices))
+        # Валидация ответов (по кэшированной структуре, без запросов к БД)
+        answers_data, errors = collect_answers(questions, request.POST)
 
         if errors:
             return render(
@@ -123,40 +112,32 @@ def poll_public(request: HttpRequest, access_code: str) -> HttpResponse:
                     "poll": poll,
                     "questions": questions,
                     "errors": errors,
+                    **_fragment_context(structure),
                 },
             )
 
-        # Сохранение
-        with transaction.atomic():
-            submission = Submission.objects.create(
-                poll=poll,
-                user=user,
-                session_key=session_key,
-            )
-
-            for kind, q, value in answers_data:
-                if kind == "TEXT":
-                    Answer.objects.create(
-                        submission=submission,
-                        question=q,
-                        text_value=value,
-                    )
-                elif kind == "SINGLE":
-                    answer = Answer.objects.create(submission=submission, question=q)
-                    answer.selected_choices.add(value)
-                elif kind == "MULTI":
-                    answer = Answer.objects.create(submission=submission, question=q)
-                    answer.selected_choices.set(value)
+        # Режим очереди: одна строка в журнал, запись — фоновым drain_submissions
+        if queue_enabled():
+            enqueue_submission(poll, answers_data, user=user, session_key=participant.id)
+            return redirect("polls:poll_thanks", access_code=poll.access_code)
 
-            submission.calculate_score()
+        # Сохранение: фиксированное число запросов на любую длину опроса,
+        # при POLLS_SUBMISSION_BATCH_WINDOW_MS — в общей транзакции с параллельными запросами
+        try:
+            write_submission(poll, answers_data, user=user, session_key=participant.id)
+        except DuplicateSubmission:
+            # Параллельный POST того же участника успел первым
+            return render(request, "polls/poll_already_submitted.html", {"poll": poll})
+        except StaleSubmission:
+            # Опрос изменили, пока ответы ждали записи, — форма по новой структуре
+            return redirect("polls:poll_public", access_code=poll.access_code)
 
-        return redirect("polls:poll_thanks", access_code=access_code)
+        return redirect("polls:poll_thanks", access_code=poll.access_code)
 
     # ───── GET: отображение формы ─────
-    timer_key = f"poll_start_time_{poll.id}"
     time_left = None
-    if poll.has_time_limit and timer_key in request.session:
-        start_time = request.session[timer_key]
+    start_time = participant.started_at(poll.id) if poll.has_time_limit else None
+    if start_time:
         elapsed = timezone.now().timestamp() - start_time
         time_left = max(0, poll.time_limit_in_seconds - int(elapsed))
 
@@ -167,35 +148,53 @@ def poll_public(request: HttpRequest, access_code: str) -> HttpResponse:
             "poll": poll,
             "questions": questions,
             "time_left": time_left,
+            **_fragment_context(structure),
         },
     )
 
 
 @require_http_methods(["GET"])
 def poll_thanks(request: HttpRequest, access_code: str) -> HttpResponse:
-    poll = get_object_or_404(Poll, access_code=access_code)
+    # Вопросы и варианты — из кэша структуры, правильные ответы — из кэша ключа;
+    # из БД читаются только отправка и её ответы: 3 запроса при любой длине опроса
+    structure = get_poll_structure(access_code)
+    if structure is None:
+        raise Http404("Опрос не найден")
+    poll = structure.poll
+
     user = request.user if request.user.is_authenticated else None
-    submission = Submission.objects.filter(poll=poll, user=user).order_by("-created_at").first()
+    session_key = None if user else get_participant(request).id
+    submissions = Submission.objects.filter(poll_id=poll.id)
+    if user:
+        submissions = submissions.filter(user=user)
+    else:
+        submissions = submissions.filter(user__isnull=True, session_key=session_key)
+    submission = submissions.order_by("-created_at").first()
 
     if not submission:
+        # Отправка принята в очередь, но ещё не записана — страница обновится сама
+        if queue_enabled() and pending_for(poll.id, user=user, session_key=session_key).exists():
+            return render(request, "polls/poll_thanks.html", {"poll": poll, "processing": True})
         return redirect("polls:poll_public", access_code=access_code)
 
-    has_test_questions = poll.questions.filter(is_test_question=True).exists()
+    has_test_questions = any(q.is_test_question for q in structure.questions)
     answers_data = []
 
     if has_test_questions:
-        for q in poll.questions.order_by("order"):
-            answer = submission.answers.filter(question=q).first()
-            given_text = answer.text_value if answer else ""
+        answer_key = get_answer_key(poll.id)
+        answers = {
+            answer.question_id: answer
+            for answer in submission.answers.prefetch_related("selected_choices")
+        }
+        for q in structure.questions:
+            answer = answers.get(q.id)
             given_choices = list(answer.selected_choices.all()) if answer else []
-            correct_choices = list(q.choices.filter(is_correct=True)) if q.is_test_question else []
-
             answers_data.append({
                 "question": q,
-                "given_text": given_text,
+                "given_text": answer.text_value if answer else "",
                 "given_choices": given_choices,
-                "correct_choices": correct_choices,
-                "is_correct": answer.is_correct if answer else None,
+                "correct_choices": [c for c in q.choices if c.is_correct] if q.is_test_question else [],
+                "is_correct": answer_key.is_correct(q.id, [c.id for c in given_choices]) if answer else None,
             })
 
     return render(request, "polls/poll_thanks.html", {
@@ -215,14 +214,28 @@ def poll_qr_page(request: HttpRequest, access_code: str) -> HttpResponse:
 
 @require_http_methods(["GET"])
 def poll_qr_png(request: HttpRequest, access_code: str) -> HttpResponse:
+    fmt = request.GET.get("format", "png")
+    if fmt not in QR_FORMATS:
+        return HttpResponseBadRequest("format: png или svg")
     try:
-        import qrcode
+        size = parse_qr_size(request.GET.get("size"))
+    except ValueError:
+        return HttpResponseBadRequest("size: целое число пикселей")
+
+    if get_poll_structure(access_code) is None:
+        raise Http404("Опрос не найден")
+
+    url = request.build_absolute_uri(reverse("polls:poll_public", kwargs={"access_code": access_code}))
+    try:
+        image = get_qr_image(url, fmt=fmt, size=size)
     except ImportError:
         return HttpResponse("qrcode не установлен. Выполните: pip install qrcode[pil]", status=500)
 
-    poll = get_object_or_404(Poll, access_code=access_code)
-    url = request.build_absolute_uri(reverse("polls:poll_public", kwargs={"access_code": access_code}))
-    img = qrcode.make(url)
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    return HttpResponse(buf.getvalue(), content_type="image/png")
\ No newline at end of file
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and (if_none_match.strip() == "*" or image.etag in parse_etags(if_none_match)):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(image.body, content_type=image.content_type)
+    response["ETag"] = image.etag
+    response["Cache-Control"] = f"public, max-age={QR_MAX_AGE}"
+    return response
@@ -1,10 +1,15 @@
 # polls/views/questions.py
+import json
+
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpRequest, HttpResponse
+from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import require_POST
 
 from ..forms import QuestionForm
 from ..models import Poll, Question
+from ..services.ordering import InvalidOrder, reorder_questions
 
 
 @login_required
@@ -36,6 +41,9 @@ def question_new(request: HttpRequest, poll_id: int) -> HttpResponse:
 def question_edit(request: HttpRequest, poll_id: int, question_id: int) -> HttpResponse:
     poll = get_object_or_404(Poll, id=poll_id, owner=request.user)
     question = get_object_or_404(Question, id=question_id, poll=poll)
+    if question.source_id:
+        messages.info(request, "Вопрос взят из банка — правьте его в банке вопросов.")
+        return redirect("polls:bank_question_edit", question_id=question.source_id)
     if request.method == "POST":
         form = QuestionForm(request.POST, instance=question)
         if form.is_valid():
@@ -55,4 +63,28 @@ def question_delete(request: HttpRequest, poll_id: int, question_id: int) -> Htt
     if request.method == "POST":
         question.delete()
         return redirect("polls:project_detail", poll_id=poll.id)
-    return render(request, "dashboard/question_delete.html", {"poll": poll, "question": question})
\ No newline at end of file
+    return render(request, "dashboard/question_delete.html", {"poll": poll, "question": question})
+
+
+@login_required
+@require_POST
+def question_reorder(request: HttpRequest, poll_id: int) -> JsonResponse:
+    """
+    Новый порядок вопросов (drag-and-drop): тело {"order": [question_id, ...]} —
+    все вопросы опроса сверху вниз. Применяется целиком одной транзакцией.
+    """
+    poll = get_object_or_404(Poll, id=poll_id, owner=request.user)
+    try:
+        question_ids = json.loads(request.body)["order"]
+        if not isinstance(question_ids, list) or not all(
+            isinstance(qid, int) and not isinstance(qid, bool) for qid in question_ids
+        ):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"ok": False, "error": 'Ожидается {"order": [id, ...]}'}, status=400)
+
+    try:
+        reorder_questions(poll, question_ids)
+    except InvalidOrder as exc:
+        return JsonResponse({"ok": False, "error": str(exc)}, status=400)
+    return JsonResponse({"ok": True, "order": question_ids})